@@ -0,0 +1,49 @@
+"""
+Management command to refresh the local SQLite read replica from the primary
+Usage: python manage.py sync_replica [--interval SECONDS]
+
+Run it once per host, e.g. `sync_replica --interval 30` under the process
+supervisor or `sync_replica` from cron. A run that finds another copy in
+progress skips it.
+"""
+
+import sqlite3
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from freshmart_project.replica import is_local_replica, sync_sqlite_replica
+
+
+class Command(BaseCommand):
+    help = 'Copy the primary database into the local read replica'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--interval', type=float, default=0,
+            help='Keep syncing every INTERVAL seconds (default: sync once and exit)'
+        )
+
+    def handle(self, *args, **options):
+        if not is_local_replica():
+            raise CommandError('No local SQLite replica is configured (see REPLICA_DATABASE_ALIAS)')
+        
+        while True:
+            try:
+                elapsed = sync_sqlite_replica()
+            except sqlite3.Error as e:
+                if not options['interval']:
+                    raise CommandError(f'Replica sync failed: {e}')
+                # Keep the long-running syncer alive through transient errors
+                self.stderr.write(f'Replica sync failed: {e}')
+            else:
+                self.report(elapsed)
+            if not options['interval']:
+                return
+            time.sleep(options['interval'])
+
+    def report(self, elapsed):
+        if elapsed is None:
+            self.stdout.write(self.style.WARNING('Another process is syncing the replica; skipped'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'Replica synced in {elapsed:.3f}s'))
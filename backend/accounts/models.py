@@ -27,6 +27,7 @@ class Customer(AbstractUser):
     total_cashback_earned = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)  # Lifetime cashback
     orders_over_minimum = models.IntegerField(default=0)  # Track $45+ orders for retention
     profile_picture = models.ImageField(upload_to='profiles/', null=True, blank=True)
+    profile_picture_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True, db_index=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -37,6 +38,7 @@ class Customer(AbstractUser):
             models.Index(fields=['email']),
             models.Index(fields=['city', 'store_branch']),
             models.Index(fields=['-created_at']),
+            models.Index(fields=['-created_at', '-id']),
         ]
     
     def __str__(self):
@@ -1,5 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
+from imaging.fields import ImageVariantsField
 from .models import Customer, CustomerPreference
 
 class CustomerPreferenceSerializer(serializers.ModelSerializer):
@@ -11,6 +12,7 @@ class CustomerPreferenceSerializer(serializers.ModelSerializer):
 
 class CustomerSerializer(serializers.ModelSerializer):
     preferences = CustomerPreferenceSerializer(many=True, read_only=True)
+    profile_picture_variants = ImageVariantsField()
     
     class Meta:
         model = Customer
@@ -19,7 +21,7 @@ class CustomerSerializer(serializers.ModelSerializer):
             'age', 'gender', 'phone', 'city', 'store_branch',
             'role', 'loyalty_card', 'loyalty_points', 'cashback_balance',
             'total_cashback_earned', 'orders_over_minimum', 'profile_picture',
-            'preferences', 'is_staff', 'created_at', 'updated_at'
+            'profile_picture_variants', 'preferences', 'is_staff', 'created_at', 'updated_at'
         ]
         read_only_fields = ['id', 'loyalty_points', 'cashback_balance', 
                            'total_cashback_earned', 'orders_over_minimum',
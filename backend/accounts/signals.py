@@ -0,0 +1,22 @@
+"""
+Signal handlers for the accounts app
+"""
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from freshmart_project.authentication import invalidate_cached_user
+from imaging.signals import variants_generated
+from .models import Customer
+
+
+@receiver(post_save, sender=Customer)
+@receiver(post_delete, sender=Customer)
+def invalidate_authenticated_user_cache(sender, instance, **kwargs):
+    """Profile updates, deactivation and deletion must not be served from the auth cache"""
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(variants_generated, sender=Customer)
+def invalidate_cached_user_on_image_variants(sender, pk, **kwargs):
+    """Variants are saved with queryset.update(), which skips post_save"""
+    invalidate_cached_user(pk)
@@ -1,3 +1,72 @@
+from unittest import mock
+
 from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from freshmart_project.authentication import user_cache
+from .models import Customer
+
+
+class CachedUserTests(TestCase):
+    """Users cached by CachedJWTAuthentication follow changes to the account"""
+
+    def setUp(self):
+        user_cache.clear()
+        self.addCleanup(user_cache.clear)
+        self.customer = Customer.objects.create_user(username='shopper', email='shopper@example.com',
+                                                     password='password123', first_name='Ann')
+        self.refresh = RefreshToken.for_user(self.customer)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.refresh.access_token}')
+
+    def profile(self):
+        return self.client.get('/api/accounts/profile/')
+
+    def test_repeat_requests_use_cache(self):
+        self.assertEqual(self.profile().status_code, 200)
+        hits = user_cache.hits
+        # Only the profile's preferences; the user comes from the cache
+        with self.assertNumQueries(1):
+            self.assertEqual(self.profile().status_code, 200)
+        self.assertEqual(user_cache.hits, hits + 1)
+
+    def test_deactivated_user_rejected(self):
+        self.assertEqual(self.profile().status_code, 200)
+        self.customer.is_active = False
+        self.customer.save()
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_deleted_user_rejected(self):
+        self.assertEqual(self.profile().status_code, 200)
+        self.customer.delete()
+        self.assertEqual(self.profile().status_code, 401)
+
+    def test_profile_change_seen_on_next_request(self):
+        self.assertEqual(self.profile().json()['first_name'], 'Ann')
+        self.customer.first_name = 'Anna'
+        self.customer.save()
+        self.assertEqual(self.profile().json()['first_name'], 'Anna')
+
+    def test_profile_update_through_api(self):
+        self.assertEqual(self.profile().status_code, 200)
+        response = self.client.patch('/api/accounts/profile/', {'first_name': 'Anna'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.profile().json()['first_name'], 'Anna')
+
+    def test_logout_drops_cached_user(self):
+        self.assertEqual(self.profile().status_code, 200)
+        response = self.client.post('/api/accounts/logout/', {'refresh': str(self.refresh)}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(user_cache), 0)
 
-# Create your tests here.
+    def test_change_without_signal_seen_after_ttl(self):
+        # queryset.update() skips post_save, as a save in another worker
+        # process does for this one
+        now = 1000.0
+        with mock.patch('freshmart_project.authentication.time.monotonic', side_effect=lambda: now):
+            self.assertEqual(self.profile().status_code, 200)
+            Customer.objects.filter(pk=self.customer.pk).update(is_active=False)
+            self.assertEqual(self.profile().status_code, 200)
+            now += user_cache.ttl
+            self.assertEqual(self.profile().status_code, 401)
@@ -2,7 +2,8 @@ from django.urls import path
 from .views import (
     RegisterView, LoginView, LogoutView, ProfileView,
     CustomerPreferenceListCreateView, CustomerPreferenceDetailView,
-    LoyaltyCardLookupView, AdminCustomerListView, AdminCustomerDetailView
+    LoyaltyCardLookupView, AdminCustomerListView, AdminCustomerDetailView,
+    AdminCustomerExportView
 )
 
 app_name = 'accounts'
@@ -24,4 +25,5 @@ urlpatterns = [
     # Admin routes
     path('admin/customers/', AdminCustomerListView.as_view(), name='admin-customer-list'),
     path('admin/customers/<int:pk>/', AdminCustomerDetailView.as_view(), name='admin-customer-detail'),
+    path('admin/customers/export/<str:export_format>/', AdminCustomerExportView.as_view(), name='admin-customer-export'),
 ]
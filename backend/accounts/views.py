@@ -2,17 +2,21 @@ from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
-from rest_framework.throttling import AnonRateThrottle
 from django.contrib.auth import authenticate
 from .models import Customer, CustomerPreference
+from freshmart_project.pagination import CreatedAtCursorPagination
+from freshmart_project.exports import StreamingExportView
+from freshmart_project.throttling import SharedAnonRateThrottle
+from freshmart_project.authentication import invalidate_cached_user
 from .serializers import (
     CustomerSerializer, CustomerRegistrationSerializer,
     CustomerUpdateSerializer, CustomerPreferenceSerializer
 )
 
 
-class LoginRateThrottle(AnonRateThrottle):
+class LoginRateThrottle(SharedAnonRateThrottle):
     """Rate limiting for login attempts"""
+    scope = 'login'
     rate = '5/minute'
 
 
@@ -21,7 +25,7 @@ class RegisterView(generics.CreateAPIView):
     queryset = Customer.objects.all()
     permission_classes = [permissions.AllowAny]
     serializer_class = CustomerRegistrationSerializer
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [SharedAnonRateThrottle]
     
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -102,6 +106,7 @@ class LogoutView(APIView):
             if refresh_token:
                 token = RefreshToken(refresh_token)
                 token.blacklist()
+            invalidate_cached_user(request.user.pk)
             return Response({
                 'success': True,
                 'message': 'Logout successful'
@@ -119,7 +124,10 @@ class ProfileView(generics.RetrieveUpdateDestroyAPIView):
     serializer_class = CustomerSerializer
     
     def get_object(self):
-        return self.request.user
+        # request.user may come from the auth cache; writes must start from the current row
+        if self.request.method in permissions.SAFE_METHODS:
+            return self.request.user
+        return Customer.objects.get(pk=self.request.user.pk)
     
     def update(self, request, *args, **kwargs):
         partial = kwargs.pop('partial', False)
@@ -203,7 +211,7 @@ class CustomerPreferenceDetailView(generics.RetrieveUpdateDestroyAPIView):
 class LoyaltyCardLookupView(APIView):
     """Look up customer by loyalty card (for kiosk) - Public for kiosk access"""
     permission_classes = [permissions.AllowAny]
-    throttle_classes = [AnonRateThrottle]
+    throttle_classes = [SharedAnonRateThrottle]
     
     def post(self, request):
         loyalty_card = request.data.get('loyalty_card')
@@ -240,9 +248,24 @@ class LoyaltyCardLookupView(APIView):
 # Admin Views
 class AdminCustomerListView(generics.ListAPIView):
     """List all customers - Admin only"""
-    queryset = Customer.objects.all().order_by('-created_at')
+    queryset = Customer.objects.prefetch_related('preferences')
     serializer_class = CustomerSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = CreatedAtCursorPagination
+
+
+class AdminCustomerExportView(StreamingExportView):
+    """Stream customers as CSV or NDJSON - Admin only"""
+    filename = 'customers'
+    columns = (
+        'id', 'username', 'email', 'first_name', 'last_name', 'role',
+        'city', 'store_branch', 'loyalty_card', 'loyalty_points',
+        'cashback_balance', 'total_cashback_earned', 'orders_over_minimum',
+        'is_active', 'created_at',
+    )
+    fields = columns
+    queryset = Customer.objects.all()
+    ordering = ('created_at', 'id')
 
 
 class AdminCustomerDetailView(generics.RetrieveUpdateDestroyAPIView):
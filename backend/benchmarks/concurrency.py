@@ -0,0 +1,187 @@
+"""
+Closed-loop load generator for comparing WSGI and ASGI request capacity
+
+`concurrency` clients each send a request, wait for the response and send
+the next one. Requests go straight to Django's WSGIHandler/ASGIHandler, as
+a server would call them (the test clients skip parts of that, such as
+the ASGI handler's per-request thread context).
+
+Under WSGI the requests are served by a fixed pool of worker threads, like
+a threaded gunicorn worker, so clients beyond the pool size queue. Under
+ASGI every client is a task on one event loop. Latencies include any time
+spent queued.
+"""
+import asyncio
+import io
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from benchmarks.timing import summarize
+from freshmart_project.throttling import SlidingWindowStore
+
+
+class UnlimitedThrottleStore(SlidingWindowStore):
+    """Admits every request, so throttles do not cap the measured capacity"""
+
+    def __init__(self, location=None):
+        pass
+
+    def hit(self, key, limit, duration, now=None):
+        return True, 0
+
+
+class SimulatedDatabaseLatency:
+    """
+    Adds a fixed delay to every query on connections opened while active, to
+    model a database across the network instead of a local SQLite file.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+
+    def __call__(self, execute, sql, params, many, context):
+        time.sleep(self.seconds)
+        return execute(sql, params, many, context)
+
+    def connection_created(self, sender, connection, **kwargs):
+        # Outermost, so wrappers pushed and popped around requests keep it
+        connection.execute_wrappers.insert(0, self)
+
+    def __enter__(self):
+        connections.close_all()
+        connection_created.connect(self.connection_created)
+        return self
+
+    def __exit__(self, *exc):
+        connection_created.disconnect(self.connection_created)
+        connections.close_all()
+        return False
+
+
+def _collect(started, seconds, latencies, errors):
+    elapsed = time.perf_counter() - started
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'requests_per_s': len(latencies) / max(elapsed, seconds),
+        **summarize(latencies),
+    }
+
+
+def wsgi_get(handler, url):
+    """Serve one GET through `handler`; returns the status code"""
+    parts = urlsplit(url)
+    environ = {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': parts.path,
+        'QUERY_STRING': parts.query,
+        'SERVER_NAME': 'testserver',
+        'SERVER_PORT': '80',
+        'SERVER_PROTOCOL': 'HTTP/1.1',
+        'REMOTE_ADDR': '127.0.0.1',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': 'http',
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    status = []
+    response = handler(environ, lambda status_line, headers: status.append(int(status_line[:3])))
+    try:
+        for _ in response:
+            pass
+    finally:
+        response.close()
+    return status[0]
+
+
+async def asgi_get(application, url):
+    """Serve one GET through `application`; returns the status code"""
+    parts = urlsplit(url)
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': parts.path,
+        'raw_path': parts.path.encode(),
+        'query_string': parts.query.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'testserver')],
+        'client': ('127.0.0.1', 0),
+        'server': ('testserver', 80),
+    }
+    request_sent = False
+    status = []
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        # The client never disconnects early
+        await asyncio.Event().wait()
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            status.append(message['status'])
+
+    await application(scope, receive, send)
+    return status[0]
+
+
+def run_wsgi_load(url, concurrency, seconds, threads):
+    """Drive the sync stack with `concurrency` clients and `threads` workers"""
+    handler = WSGIHandler()
+
+    async def drive(pool):
+        loop = asyncio.get_running_loop()
+        latencies, errors = [], [0]
+        deadline = time.perf_counter() + seconds
+
+        async def client():
+            while time.perf_counter() < deadline:
+                sent = time.perf_counter_ns()
+                status = await loop.run_in_executor(pool, wsgi_get, handler, url)
+                if status >= 400:
+                    errors[0] += 1
+                latencies.append(time.perf_counter_ns() - sent)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return _collect(started, seconds, latencies, errors[0])
+
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        return asyncio.run(drive(pool))
+
+
+def run_asgi_load(url, concurrency, seconds):
+    """Drive the async stack with `concurrency` clients on one event loop"""
+    application = ASGIHandler()
+
+    async def drive():
+        latencies, errors = [], [0]
+        deadline = time.perf_counter() + seconds
+
+        async def client():
+            while time.perf_counter() < deadline:
+                sent = time.perf_counter_ns()
+                if await asgi_get(application, url) >= 400:
+                    errors[0] += 1
+                latencies.append(time.perf_counter_ns() - sent)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return _collect(started, seconds, latencies, errors[0])
+
+    return asyncio.run(drive())
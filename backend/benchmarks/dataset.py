@@ -0,0 +1,394 @@
+"""
+Deterministic synthetic dataset generation for load testing
+
+Rows are generated in fixed-size chunks. Each chunk seeds its own
+random.Random from (seed, table, chunk index) and rows get explicit primary
+keys allocated from a per-table base, so the output is identical for a
+given seed whatever the number of worker processes or the order chunks
+finish in. Product and customer popularity follow a Zipf distribution.
+Timestamps fall in the `days` before DATASET_END, a fixed instant rather
+than the time of generation, so datasets generated on different days match
+too. Views that filter relative to now (e.g. "last 7 days") therefore see
+the data as history.
+
+With --workers > 1 chunks are generated in forked processes. On SQLite,
+which allows a single writer, the inserts themselves are serialised
+through a shared lock.
+"""
+import multiprocessing
+import random
+import time
+from bisect import bisect_left
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from itertools import accumulate
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.color import no_style
+from django.db import connection, connections, transaction
+from django.db.models import Max
+
+from accounts.models import Customer
+from kiosk.models import KioskInteraction, KioskSession
+from products.models import Brand, Category, Product, ProductReview
+from purchases.models import Purchase, PurchaseItem
+
+DATASET_PASSWORD = 'loadtest-pass-123'
+DATASET_END = datetime(2025, 1, 1, tzinfo=dt_timezone.utc)
+
+CATEGORIES = [
+    'Fruits', 'Vegetables', 'Dairy', 'Bakery', 'Meat', 'Seafood', 'Beverages',
+    'Snacks', 'Frozen', 'Pantry', 'Household', 'Personal Care',
+]
+BRANDS = [
+    'FreshFarm', 'GreenValley', 'DailyHarvest', 'OceanCatch', 'SunnySide',
+    'NatureBest', 'CityBakers', 'PurePantry', 'HomeEssentials', 'OrchardGold',
+]
+LOCATIONS = [
+    ('New York', 'Manhattan'), ('New York', 'Brooklyn'), ('Los Angeles', 'Downtown LA'),
+    ('Chicago', 'North Chicago'), ('San Francisco', 'Downtown SF'),
+]
+PAYMENT_METHODS = ['credit_card', 'debit_card', 'cash']
+STATUS_WEIGHTS = (('completed', 90), ('pending', 4), ('processing', 3), ('cancelled', 3))
+SEARCH_TERMS = ['milk', 'bread', 'apple', 'chicken', 'organic', 'cheese', 'coffee', 'rice', 'eggs']
+INTERACTION_TYPES = [choice for choice, _ in KioskInteraction.INTERACTION_TYPES]
+
+
+class ZipfSampler:
+    """Draw 0-based ranks with P(rank) proportional to 1 / (rank + 1) ** exponent"""
+
+    def __init__(self, size, exponent=1.1):
+        self.cum_weights = list(accumulate(1.0 / (rank + 1) ** exponent for rank in range(size)))
+        self.total = self.cum_weights[-1]
+
+    def sample(self, rng):
+        return bisect_left(self.cum_weights, rng.random() * self.total)
+
+
+def chunk_rng(seed, table, chunk_index):
+    return random.Random(f'{seed}:{table}:{chunk_index}')
+
+
+@contextmanager
+def historical_timestamps(*models):
+    """Let bulk_create keep the generated auto_now/auto_now_add values"""
+    saved = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                saved.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def next_id(model):
+    return (model.objects.aggregate(m=Max('pk'))['m'] or 0) + 1
+
+
+# State shared with worker processes. Set in the parent before the pool is
+# created, so forked workers inherit it without pickling.
+_context = {}
+
+
+def _write_lock():
+    """Serialises chunk writes on SQLite, which allows one writer at a time"""
+    return _context.get('write_lock') or nullcontext()
+
+
+def _timestamp(rng, days):
+    return _context['end'] - timedelta(seconds=rng.random() * days * 86400)
+
+
+def _customers_chunk(chunk_index, start, count):
+    ctx = _context
+    rng = chunk_rng(ctx['seed'], 'customers', chunk_index)
+    rows = []
+    for offset in range(count):
+        pk = ctx['customer_base'] + start + offset
+        city, branch = rng.choice(LOCATIONS)
+        joined = _timestamp(rng, ctx['days'])
+        rows.append(Customer(
+            id=pk,
+            username=f'load_{pk}',
+            email=f'load_{pk}@example.com',
+            password=ctx['password'],
+            first_name='Load',
+            last_name=f'Tester{pk}',
+            age=rng.randint(18, 80),
+            gender=rng.choice('MFO'),
+            city=city,
+            store_branch=branch,
+            loyalty_card=f'LT{pk:010d}',
+            loyalty_points=rng.randint(0, 5000),
+            date_joined=joined,
+            created_at=joined,
+            updated_at=joined,
+        ))
+    with _write_lock():
+        Customer.objects.bulk_create(rows, batch_size=ctx['batch_size'])
+    return len(rows), 0
+
+
+def _purchases_chunk(chunk_index, start, count):
+    ctx = _context
+    rng = chunk_rng(ctx['seed'], 'purchases', chunk_index)
+    customers, products = ctx['customer_ids'], ctx['product_ids']
+    prices = ctx['product_prices']
+    statuses, status_weights = zip(*STATUS_WEIGHTS)
+    purchases, items = [], []
+    for offset in range(count):
+        pk = ctx['purchase_base'] + start + offset
+        created = _timestamp(rng, ctx['days'])
+        total = Decimal('0.00')
+        line_count = max(1, int(rng.expovariate(1 / ctx['items_per_purchase'])))
+        chosen = {products[ctx['product_zipf'].sample(rng)] for _ in range(line_count)}
+        for product_id in chosen:
+            quantity = rng.randint(1, 4)
+            price = prices[product_id]
+            total += price * quantity
+            items.append(PurchaseItem(
+                purchase_id=pk, product_id=product_id, quantity=quantity, price_at_purchase=price,
+            ))
+        purchases.append(Purchase(
+            id=pk,
+            customer_id=customers[ctx['customer_zipf'].sample(rng)],
+            total_amount=total,
+            status=rng.choices(statuses, status_weights)[0],
+            payment_method=rng.choice(PAYMENT_METHODS),
+            created_at=created,
+            updated_at=created,
+        ))
+    with _write_lock(), transaction.atomic():
+        Purchase.objects.bulk_create(purchases, batch_size=ctx['batch_size'])
+        PurchaseItem.objects.bulk_create(items, batch_size=ctx['batch_size'])
+    return len(purchases), len(items)
+
+
+def _reviews_chunk(chunk_index, start, count):
+    ctx = _context
+    rng = chunk_rng(ctx['seed'], 'reviews', chunk_index)
+    products = ctx['product_ids']
+    # Each chunk reviews as a disjoint slice of customers, so (product,
+    # customer) pairs never collide across chunks and the result does not
+    # depend on which chunk commits first
+    customers = ctx['customer_ids'][chunk_index::ctx['review_chunks']]
+    if not customers:
+        return 0, 0
+    seen = set()
+    rows = []
+    for _ in range(count):
+        pair = (products[ctx['product_zipf'].sample(rng)], rng.choice(customers))
+        if pair in seen:
+            continue
+        seen.add(pair)
+        created = _timestamp(rng, ctx['days'])
+        rows.append(ProductReview(
+            product_id=pair[0], customer_id=pair[1],
+            rating=min(5, max(1, round(rng.gauss(4, 1)))),
+            comment='', created_at=created, updated_at=created,
+        ))
+    with _write_lock():
+        ProductReview.objects.bulk_create(rows, batch_size=ctx['batch_size'])
+    return len(rows), 0
+
+
+def _sessions_chunk(chunk_index, start, count):
+    ctx = _context
+    rng = chunk_rng(ctx['seed'], 'sessions', chunk_index)
+    customers, products = ctx['customer_ids'], ctx['product_ids']
+    sessions, interactions = [], []
+    for offset in range(count):
+        pk = ctx['session_base'] + start + offset
+        started = _timestamp(rng, ctx['days'])
+        duration = int(rng.expovariate(1 / 180)) + 5
+        customer_id = customers[ctx['customer_zipf'].sample(rng)] if rng.random() < 0.7 else None
+        sessions.append(KioskSession(
+            id=pk,
+            customer_id=customer_id,
+            session_id=f'load-{pk}',
+            started_at=started,
+            ended_at=started + timedelta(seconds=duration),
+            duration_seconds=duration,
+        ))
+        for _ in range(int(rng.expovariate(1 / ctx['interactions_per_session']))):
+            kind = rng.choice(INTERACTION_TYPES)
+            interactions.append(KioskInteraction(
+                session_id=pk,
+                interaction_type=kind,
+                product_id=products[ctx['product_zipf'].sample(rng)] if kind != 'product_search' else None,
+                search_query=rng.choice(SEARCH_TERMS) if kind == 'product_search' else '',
+                created_at=started + timedelta(seconds=rng.random() * duration),
+            ))
+    with _write_lock(), transaction.atomic():
+        KioskSession.objects.bulk_create(sessions, batch_size=ctx['batch_size'])
+        KioskInteraction.objects.bulk_create(interactions, batch_size=ctx['batch_size'])
+    return len(sessions), len(interactions)
+
+
+CHUNK_FUNCTIONS = {
+    'customers': _customers_chunk,
+    'purchases': _purchases_chunk,
+    'reviews': _reviews_chunk,
+    'sessions': _sessions_chunk,
+}
+
+
+CHILD_LABELS = {
+    'purchases': 'purchase items',
+    'sessions': 'kiosk interactions',
+}
+
+
+def _run_chunk(task):
+    table, chunk_index, start, count = task
+    return (table,) + CHUNK_FUNCTIONS[table](chunk_index, start, count)
+
+
+class DatasetGenerator:
+    """
+    Generates customers, products, purchases (with items), reviews and kiosk
+    sessions (with interactions) into the default database.
+    """
+
+    def __init__(self, seed=42, customers=10000, products=2000, purchases=100000,
+                 items_per_purchase=6, reviews=50000, sessions=20000,
+                 interactions_per_session=5, days=365, chunk_size=2000,
+                 batch_size=1000, workers=1, end=DATASET_END, log=print):
+        self.seed = seed
+        self.end = end
+        self.counts = {
+            'customers': customers,
+            'purchases': purchases,
+            'reviews': reviews,
+            'sessions': sessions,
+        }
+        self.product_count = products
+        self.items_per_purchase = items_per_purchase
+        self.interactions_per_session = interactions_per_session
+        self.days = days
+        self.chunk_size = chunk_size
+        self.batch_size = batch_size
+        self.workers = workers
+        self.log = log
+
+    def generate(self):
+        if self.workers > 1 and connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.log('In-memory SQLite cannot be shared between processes; using 1 worker')
+            self.workers = 1
+
+        started = time.perf_counter()
+        _context.clear()
+        _context.update(
+            seed=self.seed,
+            end=self.end,
+            days=self.days,
+            batch_size=self.batch_size,
+            items_per_purchase=self.items_per_purchase,
+            interactions_per_session=self.interactions_per_session,
+            password=make_password(DATASET_PASSWORD),
+        )
+
+        models = (Customer, Product, Purchase, ProductReview, KioskSession, KioskInteraction)
+        with historical_timestamps(*models):
+            # Products and customers are referenced by every later table, so
+            # they are created first and their ids shared with the workers.
+            self._create_catalog()
+            _context['customer_base'] = next_id(Customer)
+            self._run_table('customers')
+            customer_ids = list(
+                Customer.objects.filter(pk__gte=_context['customer_base']).order_by('pk').values_list('pk', flat=True)
+            )
+            chunk_rng(self.seed, 'customers', 'ranks').shuffle(customer_ids)
+            _context['customer_ids'] = customer_ids
+            _context['customer_zipf'] = ZipfSampler(len(_context['customer_ids']))
+            _context['purchase_base'] = next_id(Purchase)
+            _context['session_base'] = next_id(KioskSession)
+            _context['review_chunks'] = len(self._tasks('reviews'))
+            self._run_table('purchases', 'reviews', 'sessions')
+
+        with connection.cursor() as cursor:
+            for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                cursor.execute(sql)
+        self.log(f'Finished in {time.perf_counter() - started:.1f}s')
+
+    def _create_catalog(self):
+        rng = chunk_rng(self.seed, 'products', 0)
+        categories = [Category.objects.get_or_create(name=name)[0] for name in CATEGORIES]
+        brands = [Brand.objects.get_or_create(name=name)[0] for name in BRANDS]
+        base = next_id(Product)
+        rows = []
+        for offset in range(self.product_count):
+            pk = base + offset
+            category = rng.choice(categories)
+            created = _timestamp(rng, self.days)
+            price = Decimal(f'{rng.lognormvariate(1.3, 0.7):.2f}') + Decimal('0.50')
+            rows.append(Product(
+                id=pk,
+                name=f'{category.name} item {pk}',
+                description=f'Synthetic {category.name.lower()} product #{pk}',
+                category=category,
+                brand=rng.choice(brands),
+                price=price,
+                market_avg_price=price * Decimal(f'{rng.uniform(0.9, 1.2):.2f}'),
+                stock_quantity=rng.randint(0, 500),
+                aisle_location=f'{chr(65 + categories.index(category))}-{rng.randint(1, 30)}',
+                featured=rng.random() < 0.02,
+                eco_score=rng.randint(1, 100),
+                created_at=created,
+                updated_at=created,
+            ))
+        Product.objects.bulk_create(rows, batch_size=self.batch_size)
+        # Popularity ranks are shuffled so the best sellers are spread
+        # across categories rather than being the lowest ids
+        product_ids = [row.id for row in rows]
+        rng.shuffle(product_ids)
+        _context['product_ids'] = product_ids
+        _context['product_prices'] = {row.id: row.price for row in rows}
+        _context['product_zipf'] = ZipfSampler(len(product_ids))
+        self.log(f'products: {len(rows)} rows')
+
+    def _tasks(self, table):
+        total = self.counts[table]
+        return [
+            (table, index, start, min(self.chunk_size, total - start))
+            for index, start in enumerate(range(0, total, self.chunk_size))
+        ]
+
+    def _run_table(self, *tables):
+        tasks = [task for table in tables for task in self._tasks(table)]
+        started = time.perf_counter()
+        done = {table: [0, 0] for table in tables}
+
+        if self.workers > 1 and len(tasks) > 1:
+            # Forked children must not reuse the parent's open connection
+            connections.close_all()
+            mp_context = multiprocessing.get_context('fork')
+            if connection.vendor == 'sqlite':
+                _context['write_lock'] = mp_context.Lock()
+            pool = mp_context.Pool(self.workers, initializer=connections.close_all)
+            try:
+                results = pool.imap_unordered(_run_chunk, tasks)
+                for table, rows, children in results:
+                    done[table][0] += rows
+                    done[table][1] += children
+            finally:
+                pool.close()
+                pool.join()
+                _context.pop('write_lock', None)
+        else:
+            for task in tasks:
+                table, rows, children = _run_chunk(task)
+                done[table][0] += rows
+                done[table][1] += children
+
+        elapsed = time.perf_counter() - started
+        for table, (rows, children) in done.items():
+            line = f'{table}: {rows} rows'
+            if table in CHILD_LABELS:
+                line += f', {children} {CHILD_LABELS[table]}'
+            self.log(f'{line} ({elapsed:.1f}s)')
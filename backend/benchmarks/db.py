@@ -0,0 +1,48 @@
+"""
+Database helpers for benchmark commands
+"""
+from contextlib import contextmanager
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.test.utils import override_settings
+
+from recommendations.events import event_buffer
+
+
+@contextmanager
+def temporary_database(keepdb=False, test_name=None):
+    """
+    Run the block against a freshly migrated throwaway database (the same
+    one the test runner would create), so benchmarks never touch real data.
+
+    `test_name` overrides TEST['NAME']; with keepdb=True this keeps a named
+    dataset database around between runs. Aliases with TEST['MIRROR'] set to
+    the default (the read replica) point at the same database meanwhile.
+    Recommendation events are written as they happen inside the block, and
+    any still buffered are written before the database is destroyed.
+    """
+    old_name = connection.settings_dict['NAME']
+    old_test_name = connection.settings_dict['TEST'].get('NAME')
+    if test_name is not None:
+        connection.settings_dict['TEST']['NAME'] = str(test_name)
+    try:
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, keepdb=keepdb)
+        mirrors = {
+            alias: connections[alias].settings_dict
+            for alias in connections
+            if connections[alias].settings_dict['TEST'].get('MIRROR') == DEFAULT_DB_ALIAS
+        }
+        for alias in mirrors:
+            connections[alias].close()
+            connections[alias].settings_dict = connection.settings_dict
+        try:
+            with override_settings(RECOMMENDATION_EVENT_FLUSH_SECONDS=0):
+                yield connection
+        finally:
+            event_buffer.stop()
+            for alias, settings_dict in mirrors.items():
+                connections[alias].close()
+                connections[alias].settings_dict = settings_dict
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=keepdb)
+    finally:
+        connection.settings_dict['TEST']['NAME'] = old_test_name
@@ -0,0 +1,72 @@
+"""
+Compare request capacity of the sync (WSGI) and async (ASGI) read endpoints
+Usage: python manage.py benchmark_asgi [--concurrency 1 8 32 128] [--seconds 3] [--wsgi-threads 4] [--db-latency-ms 0]
+"""
+import tempfile
+from contextlib import nullcontext
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.test import override_settings
+
+from benchmarks.concurrency import SimulatedDatabaseLatency, run_asgi_load, run_wsgi_load
+from benchmarks.dataset import DatasetGenerator
+from benchmarks.db import temporary_database
+from freshmart_project import throttling
+from kiosk.models import KioskSession
+from products.models import Product
+
+
+class Command(BaseCommand):
+    help = 'Measure throughput and latency of WSGI vs ASGI read endpoints as concurrency grows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+        parser.add_argument('--seconds', type=float, default=3)
+        parser.add_argument('--wsgi-threads', type=int, default=4,
+                            help='Worker threads serving the WSGI stack (gunicorn --threads)')
+        parser.add_argument('--db-latency-ms', type=float, default=0,
+                            help='Delay added to every query to model a networked database')
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp, \
+                temporary_database(test_name=Path(tmp) / 'asgi.sqlite3') as connection, \
+                override_settings(
+                    API_LOG_SAMPLE_RATE=0.0,
+                    THROTTLE_STORE={'BACKEND': 'benchmarks.concurrency.UnlimitedThrottleStore'},
+                ):
+            saved_store, throttling._store = throttling._store, None
+            try:
+                DatasetGenerator(
+                    customers=200, products=500, purchases=2000, reviews=1000, sessions=100,
+                    log=lambda message: None,
+                ).generate()
+                product = Product.objects.filter(is_active=True).order_by('pk').first()
+                session = KioskSession.objects.create(session_id='benchmark-asgi')
+                connection.close()
+                self.run_endpoints(product, session, options)
+            finally:
+                throttling._store = saved_store
+
+    def run_endpoints(self, product, session, options):
+        term = product.name[:4]
+        endpoints = [
+            ('kiosk search', f'/api/kiosk/{session.session_id}/search/?q={term}'),
+            ('kiosk product detail', f'/api/kiosk/{session.session_id}/products/{product.pk}/'),
+            # The async view also serves from the catalog cache
+            ('product detail', f'/api/products/{product.pk}/'),
+        ]
+        latency = options['db_latency_ms'] / 1000
+        with SimulatedDatabaseLatency(latency) if latency else nullcontext():
+            for label, path in endpoints:
+                async_path = path.replace('/api/', '/api/async/', 1)
+                self.stdout.write(f'{label}: {path} vs {async_path}')
+                for concurrency in options['concurrency']:
+                    wsgi = run_wsgi_load(path, concurrency, options['seconds'], options['wsgi_threads'])
+                    asgi = run_asgi_load(async_path, concurrency, options['seconds'])
+                    for mode, result in (('wsgi', wsgi), ('asgi', asgi)):
+                        self.stdout.write(
+                            f"  {mode} c={concurrency:<4} req/s={result['requests_per_s']:>8.1f} "
+                            f"p50={result['p50_us'] / 1000:>8.1f}ms p99={result['p99_us'] / 1000:>8.1f}ms "
+                            f"errors={result['errors']}"
+                        )
@@ -0,0 +1,44 @@
+"""
+Benchmark per-request JWT user resolution
+Usage: python manage.py benchmark_auth [--iterations 5000]
+"""
+from django.db import connection
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import Customer
+from benchmarks.db import temporary_database
+from benchmarks.timing import format_summary, summarize, time_calls
+from freshmart_project.authentication import CachedJWTAuthentication, user_cache
+
+
+class Command(BaseCommand):
+    help = 'Compare JWTAuthentication with CachedJWTAuthentication on a throwaway database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+
+        with temporary_database():
+            customer = Customer.objects.create_user(
+                username='bench_user', email='bench@example.com', password='bench-pass-123',
+                city='New York', store_branch='Manhattan', loyalty_card='LC999999',
+            )
+            token = str(AccessToken.for_user(customer))
+            request = RequestFactory().get('/api/purchases/cart/', HTTP_AUTHORIZATION=f'Bearer {token}')
+
+            user_cache.clear()
+            for label, auth in (('JWTAuthentication', JWTAuthentication()),
+                                ('CachedJWTAuthentication', CachedJWTAuthentication())):
+                with CaptureQueriesContext(connection) as queries:
+                    samples = time_calls(lambda i: auth.authenticate(request), iterations)
+                self.stdout.write(
+                    f"{format_summary(label, summarize(samples))} queries={len(queries)}"
+                )
+
+            self.stdout.write(f'cache hits={user_cache.hits} misses={user_cache.misses}')
@@ -0,0 +1,67 @@
+"""
+Benchmark RequestLoggingMiddleware with synchronous vs queued log handlers
+Usage: python manage.py benchmark_logging [--iterations 5000]
+"""
+import copy
+import os
+import tempfile
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory, override_settings
+
+from benchmarks.timing import format_summary, summarize, time_calls
+from freshmart_project.logging_config import configure_logging, log_queue_depth, queue_handlers, stop_log_listener
+from freshmart_project.middleware import RequestLoggingMiddleware
+
+
+class Command(BaseCommand):
+    help = 'Compare RequestLoggingMiddleware latency with direct and queue-based handlers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        middleware = RequestLoggingMiddleware(lambda request: HttpResponse())
+        response = HttpResponse()
+        request = RequestFactory().get('/api/products/')
+        request.user = AnonymousUser()
+
+        def run(i):
+            middleware.process_request(request)
+            middleware.process_response(request, response)
+
+        with tempfile.TemporaryDirectory() as log_dir, open(os.devnull, 'w') as devnull:
+            try:
+                variants = (
+                    ('synchronous handlers', False, 1.0),
+                    ('queued handlers', True, 1.0),
+                    ('synchronous handlers, 10% sampled', False, 0.1),
+                    ('queued handlers, 10% sampled', True, 0.1),
+                )
+                for label, queued, sample_rate in variants:
+                    configure_logging(self.redirected_config(log_dir, devnull), queued=queued)
+                    with override_settings(API_LOG_SAMPLE_RATE=sample_rate):
+                        samples = time_calls(run, iterations)
+                    dropped = sum(handler.dropped for handler in queue_handlers())
+                    self.stdout.write(
+                        f"{format_summary(label, summarize(samples))} "
+                        f"queued={log_queue_depth()} dropped={dropped}"
+                    )
+                    stop_log_listener()
+            finally:
+                configure_logging(settings.LOGGING)
+
+    @staticmethod
+    def redirected_config(log_dir, stream):
+        """settings.LOGGING with files moved to `log_dir` and console output sent to `stream`"""
+        config = copy.deepcopy(settings.LOGGING)
+        for name, handler in config['handlers'].items():
+            if 'filename' in handler:
+                handler['filename'] = os.path.join(log_dir, os.path.basename(handler['filename']))
+            elif handler.get('class') == 'logging.StreamHandler':
+                handler['stream'] = stream
+        return config
@@ -0,0 +1,41 @@
+"""
+Benchmark the per-request cost of MetricsMiddleware
+Usage: python manage.py benchmark_metrics [--iterations 20000]
+"""
+from django.core.management.base import BaseCommand
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import resolve
+
+from benchmarks.timing import format_summary, summarize, time_calls
+from freshmart_project.metrics import QueryStats, registry
+from freshmart_project.middleware import MetricsMiddleware
+
+
+class Command(BaseCommand):
+    help = 'Measure metrics recording overhead per request'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20000)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        request = RequestFactory().get('/api/products/')
+        request.resolver_match = resolve('/api/products/')
+        response = HttpResponse(b'x' * 2048)
+
+        def bare_view(req):
+            return response
+
+        queries = QueryStats()
+        cases = (
+            ('registry.observe_request', lambda i: registry.observe_request(
+                'products:product-list', 'GET', 200, 0.012, 0, 2048, queries
+            )),
+            ('bare view', lambda i: bare_view(request)),
+            ('MetricsMiddleware(bare view)', lambda i: MetricsMiddleware(bare_view)(request)),
+        )
+        for label, func in cases:
+            registry.reset()
+            self.stdout.write(format_summary(label, summarize(time_calls(func, iterations))))
+        registry.reset()
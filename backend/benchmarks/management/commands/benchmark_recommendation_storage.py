@@ -0,0 +1,196 @@
+"""
+Benchmark row vs packed recommendation storage
+Usage: python manage.py benchmark_recommendation_storage [--customers 10000] [--per-customer 10] [--iterations 200]
+       10M recommendations: --customers 1000000 --per-customer 10 --keepdb --save
+--save records the results in benchmarks/baselines/recommendations-<customers>x<per-customer>.json
+"""
+import random
+import time
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.db import connection, reset_queries
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.request import Request
+
+from accounts.models import Customer
+from benchmarks.dataset import DatasetGenerator, ZipfSampler
+from benchmarks.db import temporary_database
+from benchmarks.suite import DATASET_DIR, save_baseline
+from benchmarks.timing import format_summary, summarize
+from products.models import Product
+from recommendations.models import PackedRecommendation, Recommendation
+from recommendations.storage import REASONS, PackedStore, RowStore, reason_text
+
+REASON_CODES = sorted(REASONS)
+
+
+def table_bytes(model):
+    """On-disk size of a model's table and indexes, where the backend can tell"""
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        try:
+            if connection.vendor == 'sqlite':
+                cursor.execute(
+                    "SELECT SUM(pgsize) FROM dbstat WHERE name = %s OR name IN "
+                    "(SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = %s)",
+                    [table, table]
+                )
+            elif connection.vendor == 'postgresql':
+                cursor.execute('SELECT pg_total_relation_size(%s)', [table])
+            else:
+                return None
+        except Exception:
+            return None
+        return cursor.fetchone()[0]
+
+
+def timed(func, iterations, before=None):
+    """Per-call nanoseconds of `func(i)`; `before(i)` runs untimed"""
+    samples = []
+    for i in range(iterations):
+        if before is not None:
+            before(i)
+        start = time.perf_counter_ns()
+        func(i)
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+
+class Command(BaseCommand):
+    help = "Time reading and replacing one customer's recommendations with row and packed storage"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--per-customer', type=int, default=10)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the filled database for later runs (reused when it matches)')
+        parser.add_argument('--save', action='store_true',
+                            help='Record the results with the benchmark baselines')
+
+    def handle(self, *args, **options):
+        customers, per_customer = options['customers'], options['per_customer']
+        seed = options['seed']
+        name = f'recommendations-{customers}x{per_customer}'
+        test_name = None
+        if options['keepdb']:
+            if connection.vendor == 'sqlite':
+                DATASET_DIR.mkdir(exist_ok=True)
+                test_name = DATASET_DIR / f'{name}-seed{seed}.sqlite3'
+            else:
+                test_name = f"test_freshmart_benchmark_{name.replace('-', '_')}_seed{seed}"
+
+        with temporary_database(keepdb=options['keepdb'], test_name=test_name):
+            if Recommendation.objects.count() != customers * per_customer:
+                self.fill(options)
+            else:
+                self.stdout.write('Using existing recommendations')
+            tables, results = self.run(options)
+            if options['save']:
+                save_baseline(name, seed, options['iterations'], results, tables=tables)
+                self.stdout.write(f'Saved baseline {name}')
+
+    def ranked(self, rng, zipf, product_ids, per_customer):
+        picked = set()
+        while len(picked) < per_customer:
+            picked.add(product_ids[zipf.sample(rng)])
+        # Distinct, descending scores keep both stores' order identical
+        scores = sorted(rng.sample(range(1, 100000), per_customer), reverse=True)
+        return [
+            (product_id, score / 100, rng.choice(REASON_CODES))
+            for product_id, score in zip(picked, scores)
+        ]
+
+    def fill(self, options):
+        started = time.perf_counter()
+        Recommendation.objects.all().delete()
+        PackedRecommendation.objects.all().delete()
+        DatasetGenerator(
+            seed=options['seed'], customers=options['customers'], products=options['products'],
+            purchases=0, reviews=0, sessions=0, batch_size=options['batch_size'], log=self.stdout.write,
+        ).generate()
+
+        rng = random.Random(f"{options['seed']}:recommendations")
+        products = dict(Product.objects.values_list('pk', 'category__name'))
+        product_ids = list(products)
+        rng.shuffle(product_ids)
+        zipf = ZipfSampler(len(product_ids))
+        batch_size = options['batch_size']
+        rows, packed = [], []
+        # Not iterator(): SQLite cannot checkpoint its WAL while the read is
+        # open, and the WAL grows to many times the database at 10M rows
+        customer_ids = list(Customer.objects.order_by('pk').values_list('pk', flat=True))
+        for customer_id in customer_ids:
+            ranked = self.ranked(rng, zipf, product_ids, options['per_customer'])
+            rows.extend(
+                Recommendation(customer_id=customer_id, product_id=product_id, score=score,
+                               reason=reason_text(code, products[product_id]))
+                for product_id, score, code in ranked
+            )
+            packed.append(PackedRecommendation(
+                customer_id=customer_id, items=[list(item) for item in ranked], size=len(ranked)
+            ))
+            if len(packed) >= batch_size // options['per_customer'] or len(rows) >= batch_size:
+                Recommendation.objects.bulk_create(rows, batch_size=batch_size)
+                PackedRecommendation.objects.bulk_create(packed, batch_size=batch_size)
+                rows, packed = [], []
+        Recommendation.objects.bulk_create(rows, batch_size=batch_size)
+        PackedRecommendation.objects.bulk_create(packed, batch_size=batch_size)
+        self.stdout.write(
+            f'Filled {Recommendation.objects.count()} recommendations for '
+            f'{PackedRecommendation.objects.count()} customers in {time.perf_counter() - started:.1f}s'
+        )
+
+    def run(self, options):
+        iterations = options['iterations']
+        rng = random.Random(f"{options['seed']}:benchmark")
+        customer_ids = list(PackedRecommendation.objects.values_list('pk', flat=True))
+        sample = [Customer(pk=pk) for pk in rng.choices(customer_ids, k=iterations)]
+        products = dict(Product.objects.values_list('pk', 'category__name'))
+        product_ids = list(products)
+        zipf = ZipfSampler(len(product_ids))
+        replacements = [
+            [(product_id, score, code, reason_text(code, products[product_id]))
+             for product_id, score, code in self.ranked(rng, zipf, product_ids, options['per_customer'])]
+            for _ in range(iterations)
+        ]
+        context = {'request': Request(RequestFactory().get('/api/recommendations/'))}
+        stores = {'rows': RowStore(), 'packed': PackedStore()}
+
+        tables = {}
+        for model in (Recommendation, PackedRecommendation):
+            size = table_bytes(model)
+            tables[model.__name__] = {'rows': model.objects.count(), 'bytes': size}
+            self.stdout.write(
+                f'{model.__name__}: {tables[model.__name__]["rows"]} rows'
+                + (f', {size / 1024 / 1024:.1f} MiB with indexes' if size else '')
+            )
+
+        cases = [
+            ('read rows', lambda i: stores['rows'].read(sample[i], context), None),
+            ('read packed (cold catalog cache)', lambda i: stores['packed'].read(sample[i], context),
+             lambda i: cache.clear()),
+            ('read packed (warm catalog cache)', lambda i: stores['packed'].read(sample[i], context),
+             lambda i: stores['packed'].read(sample[i], context)),
+            ('write rows', lambda i: stores['rows'].save(sample[i], replacements[i]), None),
+            ('write packed', lambda i: stores['packed'].save(sample[i], replacements[i]), None),
+        ]
+        results = {}
+        for label, func, before in cases:
+            cache.clear()
+            if before is not None:
+                before(0)
+            # The fill overflowed the query log, which then stops growing
+            reset_queries()
+            with CaptureQueriesContext(connection) as queries:
+                func(0)
+            summary = summarize(timed(func, iterations, before))
+            summary['queries'] = len(queries)
+            results[label] = summary
+            self.stdout.write(f'  {format_summary(label, summary)} queries={len(queries)}')
+        return tables, results
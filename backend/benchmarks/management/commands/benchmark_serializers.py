@@ -0,0 +1,82 @@
+"""
+Benchmark the values() fast path against the DRF serializers it replaces
+Usage: python manage.py benchmark_serializers [--iterations 200] [--page-size 20] [--scale 1k]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from benchmarks.dataset import DatasetGenerator
+from benchmarks.db import temporary_database
+from benchmarks.suite import SCALES
+from benchmarks.timing import format_summary, summarize, time_calls
+from freshmart_project.renderers import FastJSONRenderer
+from products.models import Product
+from products.serializers import ProductListRowSerializer, ProductListSerializer
+from purchases.models import Purchase
+from purchases.serializers import PurchaseRowSerializer, PurchaseSerializer
+from recommendations.engine import update_recommendations_for_customer
+from recommendations.models import Recommendation
+from recommendations.serializers import RecommendationRowSerializer, RecommendationSerializer
+
+
+class Command(BaseCommand):
+    help = 'Time one page of each hot list serializer, DRF + JSONRenderer vs row serializer + FastJSONRenderer'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--page-size', type=int, default=20)
+        parser.add_argument('--scale', choices=sorted(SCALES), default='1k')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        page_size = options['page_size']
+
+        with temporary_database():
+            DatasetGenerator(seed=options['seed'], log=lambda message: None, **SCALES[options['scale']]).generate()
+            customer = Purchase.objects.select_related('customer').first().customer
+            update_recommendations_for_customer(customer)
+
+            context = {'request': Request(RequestFactory().get('/api/'))}
+            cases = [
+                (
+                    'ProductListSerializer', ProductListSerializer, ProductListRowSerializer,
+                    Product.objects.filter(is_active=True).order_by('-created_at'),
+                    lambda queryset: queryset.select_related('category', 'brand').prefetch_related('reviews'),
+                ),
+                (
+                    'RecommendationSerializer', RecommendationSerializer, RecommendationRowSerializer,
+                    Recommendation.objects.filter(customer=customer),
+                    lambda queryset: queryset.select_related(
+                        'product', 'product__category', 'product__brand'
+                    ).prefetch_related('product__reviews'),
+                ),
+                (
+                    'PurchaseSerializer', PurchaseSerializer, PurchaseRowSerializer,
+                    Purchase.objects.order_by('-created_at', '-id'),
+                    lambda queryset: queryset.select_related('customer').prefetch_related('items__product'),
+                ),
+            ]
+
+            for label, serializer_class, row_serializer_class, queryset, optimize in cases:
+                def drf(i):
+                    data = serializer_class(optimize(queryset)[:page_size], many=True, context=context).data
+                    return JSONRenderer().render(data)
+
+                def fast(i):
+                    serializer = row_serializer_class(context)
+                    return FastJSONRenderer().render(serializer.serialize(serializer.rows(queryset)[:page_size]))
+
+                if drf(0) != fast(0):
+                    raise CommandError(f'{label}: fast path output differs from DRF')
+
+                self.stdout.write(f'{label} ({len(drf(0))} bytes)')
+                for name, func in (('drf', drf), ('fast', fast)):
+                    with CaptureQueriesContext(connection) as queries:
+                        func(0)
+                    summary = summarize(time_calls(func, iterations))
+                    self.stdout.write(f"  {format_summary(name, summary)} queries={len(queries)}")
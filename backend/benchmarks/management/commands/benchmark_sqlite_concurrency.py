@@ -0,0 +1,128 @@
+"""
+Benchmark SQLite read throughput while concurrent writers check out orders
+Usage: python manage.py benchmark_sqlite_concurrency [--readers 4] [--writers 2] [--seconds 5]
+"""
+import random
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand
+from django.db import OperationalError, connections, transaction
+from django.db.models import F
+
+from benchmarks.dataset import DatasetGenerator
+from benchmarks.db import temporary_database
+from benchmarks.timing import summarize
+from products.models import Product
+from purchases.models import Purchase, PurchaseItem
+
+PROFILES = (
+    ('django sqlite3 (default)', {'ENGINE': 'django.db.backends.sqlite3'}),
+    ('freshmart_project.sqlite', {'ENGINE': 'freshmart_project.sqlite'}),
+)
+
+
+class Command(BaseCommand):
+    help = 'Compare the default and tuned SQLite profiles under mixed read/write load'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = Path(tmp) / 'concurrency.sqlite3'
+            with temporary_database(test_name=path) as connection:
+                DatasetGenerator(
+                    customers=200, products=500, purchases=2000, reviews=500, sessions=100,
+                    log=lambda message: None,
+                ).generate()
+                self.customer_id = connection.cursor().execute(
+                    'SELECT MIN(id) FROM accounts_customer'
+                ).fetchone()[0]
+                self.product_ids = list(Product.objects.values_list('pk', flat=True))
+                connection.close()
+
+                for label, engine in PROFILES:
+                    # WAL persists in the file; start each profile from rollback-journal mode
+                    sqlite3.connect(path).execute('PRAGMA journal_mode = DELETE').close()
+                    result = self.run_profile(path, engine, options)
+                    reads = result['read']
+                    self.stdout.write(
+                        f"{label:<28} reads/s={result['reads_per_s']:>8.0f} "
+                        f"read p50={reads['p50_us']:>8.0f}us p99={reads['p99_us']:>9.0f}us "
+                        f"writes/s={result['writes_per_s']:>6.0f} locked_errors={result['errors']}"
+                    )
+
+    def run_profile(self, path, engine, options):
+        alias = 'concurrency_benchmark'
+        connections.settings[alias] = connections.configure_settings({
+            'default': dict(connections.settings['default']),
+            alias: {**engine, 'NAME': str(path)},
+        })[alias]
+        deadline = time.monotonic() + options['seconds']
+        read_samples, writes, errors = [], [0], [0]
+        lock = threading.Lock()
+
+        def reader():
+            samples = []
+            try:
+                while time.monotonic() < deadline:
+                    started = time.perf_counter_ns()
+                    try:
+                        list(Product.objects.using(alias).filter(is_active=True)
+                             .select_related('category').order_by('-created_at')[:20])
+                    except OperationalError:
+                        with lock:
+                            errors[0] += 1
+                        continue
+                    samples.append(time.perf_counter_ns() - started)
+            finally:
+                connections[alias].close()
+            with lock:
+                read_samples.extend(samples)
+
+        def writer():
+            rng = random.Random(threading.get_ident())
+            try:
+                while time.monotonic() < deadline:
+                    product_id = rng.choice(self.product_ids)
+                    try:
+                        with transaction.atomic(using=alias):
+                            product = Product.objects.using(alias).get(pk=product_id)
+                            purchase = Purchase.objects.using(alias).create(
+                                customer_id=self.customer_id, total_amount=product.price, status='completed',
+                            )
+                            PurchaseItem.objects.using(alias).create(
+                                purchase=purchase, product=product, quantity=1, price_at_purchase=product.price,
+                            )
+                            Product.objects.using(alias).filter(pk=product_id).update(
+                                stock_quantity=F('stock_quantity') - 1
+                            )
+                    except OperationalError:
+                        with lock:
+                            errors[0] += 1
+                        continue
+                    with lock:
+                        writes[0] += 1
+            finally:
+                connections[alias].close()
+
+        threads = [threading.Thread(target=reader) for _ in range(options['readers'])]
+        threads += [threading.Thread(target=writer) for _ in range(options['writers'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        del connections.settings[alias]
+
+        return {
+            'read': summarize(read_samples),
+            'reads_per_s': len(read_samples) / options['seconds'],
+            'writes_per_s': writes[0] / options['seconds'],
+            'errors': errors[0],
+        }
@@ -0,0 +1,66 @@
+"""
+Benchmark per-request throttle overhead
+Usage: python manage.py benchmark_throttle [--iterations 5000] [--clients 50]
+"""
+import os
+import tempfile
+from unittest import mock
+
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+from rest_framework.throttling import AnonRateThrottle
+
+from benchmarks.timing import format_summary, summarize, time_calls
+from freshmart_project import throttling
+
+
+class Command(BaseCommand):
+    help = 'Measure allow_request() cost for the DRF cache throttle and the shared sliding-window throttles'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=5000)
+        parser.add_argument('--clients', type=int, default=50, help='Distinct client IPs to rotate through')
+
+    def handle(self, *args, **options):
+        iterations = options['iterations']
+        clients = options['clients']
+        factory = RequestFactory()
+        requests = [
+            factory.get('/api/products/', REMOTE_ADDR=f'10.0.{i // 256}.{i % 256}')
+            for i in range(clients)
+        ]
+        for request in requests:
+            request.user = AnonymousUser()
+        # Generous rate so every request is admitted and DRF's history keeps growing
+        rate = f'{iterations * 2}/hour'
+
+        def run(throttle_class):
+            throttle_class.rate = rate
+            throttle = throttle_class()
+            return summarize(time_calls(
+                lambda i: throttle.allow_request(requests[i % clients], None),
+                iterations
+            ))
+
+        class CacheAnonThrottle(AnonRateThrottle):
+            pass
+
+        class SharedAnonThrottle(throttling.SharedAnonRateThrottle):
+            pass
+
+        cache.clear()
+        results = {'drf_cache_history': run(CacheAnonThrottle)}
+
+        with mock.patch.object(throttling, '_store', throttling.LocMemThrottleStore()):
+            results['sliding_window_locmem'] = run(SharedAnonThrottle)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = throttling.SQLiteThrottleStore(os.path.join(tmp, 'throttle.sqlite3'))
+            with mock.patch.object(throttling, '_store', store):
+                results['sliding_window_sqlite'] = run(SharedAnonThrottle)
+
+        self.stdout.write(f'{iterations} checks across {clients} clients')
+        for label, summary in results.items():
+            self.stdout.write(format_summary(label, summary))
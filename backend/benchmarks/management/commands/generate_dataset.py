@@ -0,0 +1,49 @@
+"""
+Generate a large, deterministic synthetic dataset for load testing
+Usage: python manage.py generate_dataset [--seed 42] [--purchases 100000] [--workers 4]
+"""
+from django.core.management.base import BaseCommand
+
+from benchmarks.dataset import DATASET_PASSWORD, DatasetGenerator
+
+
+class Command(BaseCommand):
+    help = 'Bulk-generate seeded customers, products, purchases, reviews and kiosk sessions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--customers', type=int, default=10000)
+        parser.add_argument('--products', type=int, default=2000)
+        parser.add_argument('--purchases', type=int, default=100000)
+        parser.add_argument('--items-per-purchase', type=float, default=6,
+                            help='Mean purchase items per purchase')
+        parser.add_argument('--reviews', type=int, default=50000)
+        parser.add_argument('--sessions', type=int, default=20000)
+        parser.add_argument('--interactions-per-session', type=float, default=5,
+                            help='Mean kiosk interactions per session')
+        parser.add_argument('--days', type=int, default=365,
+                            help='Spread timestamps over this many days before now')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--workers', type=int, default=1)
+
+    def handle(self, *args, **options):
+        generator = DatasetGenerator(
+            seed=options['seed'],
+            customers=options['customers'],
+            products=options['products'],
+            purchases=options['purchases'],
+            items_per_purchase=options['items_per_purchase'],
+            reviews=options['reviews'],
+            sessions=options['sessions'],
+            interactions_per_session=options['interactions_per_session'],
+            days=options['days'],
+            chunk_size=options['chunk_size'],
+            batch_size=options['batch_size'],
+            workers=options['workers'],
+            log=self.stdout.write,
+        )
+        generator.generate()
+        self.stdout.write(self.style.SUCCESS(
+            f'Dataset generated. Customers log in as load_<id> / {DATASET_PASSWORD}'
+        ))
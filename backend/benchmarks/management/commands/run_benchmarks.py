@@ -0,0 +1,91 @@
+"""
+Run the endpoint benchmark suite and gate on stored baselines
+Usage: python manage.py run_benchmarks [--scale 1k --scale 100k] [--iterations 100] [--save-baseline]
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test import override_settings
+
+from benchmarks import suite
+from benchmarks.db import temporary_database
+from benchmarks.timing import format_summary
+from freshmart_project import throttling
+
+
+class Command(BaseCommand):
+    help = 'Benchmark hot endpoints on generated datasets and compare with JSON baselines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', action='append', choices=sorted(suite.SCALES),
+                            help='Dataset scale (repeatable, default: 1k)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=100)
+        parser.add_argument('--warmup', type=int, default=10)
+        parser.add_argument('--only', action='append', help='Run only these scenarios')
+        parser.add_argument('--workers', type=int, default=1, help='Processes for dataset generation')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Write results as the new baseline instead of comparing')
+        parser.add_argument('--threshold', type=float, default=0.5,
+                            help='Allowed relative p50/p95 growth over baseline')
+        parser.add_argument('--min-delta-us', type=float, default=500,
+                            help='Ignore latency growth smaller than this many microseconds')
+
+    def handle(self, *args, **options):
+        failures = []
+        for scale in options['scale'] or ['1k']:
+            failures += self.run_scale(scale, options)
+        if failures:
+            raise CommandError('Performance regressions:\n  ' + '\n  '.join(failures))
+
+    def run_scale(self, scale, options):
+        seed = options['seed']
+        suite.DATASET_DIR.mkdir(exist_ok=True)
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Scale {scale}'))
+
+        # Quiet request logging and a private, resettable throttle store so
+        # rate limits never cut a run short
+        with temporary_database(keepdb=True, test_name=suite.dataset_name(scale, seed)), \
+                override_settings(API_LOG_SAMPLE_RATE=0.0, THROTTLE_STORE={}):
+            saved_store, throttling._store = throttling._store, None
+            try:
+                suite.ensure_dataset(scale, seed, options['workers'], log=self.stdout.write)
+                # Checkout and kiosk writes are rolled back so the kept
+                # dataset stays identical from run to run
+                with transaction.atomic():
+                    results = self.run_scenarios(suite.Fixtures(), options)
+                    transaction.set_rollback(True)
+            finally:
+                throttling._store = saved_store
+
+        if options['save_baseline']:
+            suite.save_baseline(scale, seed, options['iterations'], results)
+            self.stdout.write(self.style.SUCCESS(f'Baseline written to {suite.baseline_path(scale)}'))
+            return []
+
+        baseline = suite.load_baseline(scale)
+        if baseline is None:
+            self.stdout.write(self.style.WARNING(f'No baseline for {scale}; run with --save-baseline'))
+            return []
+        regressions = suite.find_regressions(
+            results, baseline, options['threshold'], options['min_delta_us']
+        )
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f'{scale}: within {options["threshold"]:.0%} of baseline'))
+        return [f'[{scale}] {line}' for line in regressions]
+
+    def run_scenarios(self, fixtures, options):
+        results = {}
+        store = throttling.get_throttle_store()
+        for scenario, customer in fixtures.scenarios():
+            if options['only'] and scenario.name not in options['only']:
+                continue
+            client = fixtures.client(customer) if customer else suite.APIClient()
+            try:
+                result = suite.run_scenario(
+                    client, scenario, options['iterations'], options['warmup'], store.clear
+                )
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            results[scenario.name] = result
+            self.stdout.write(f"{format_summary(scenario.name, result)} queries={result['queries']}")
+        return results
@@ -0,0 +1,221 @@
+"""
+Endpoint benchmark suite
+
+Each scenario sends one request through the DRF test client, so the timing
+covers the full stack: middleware, JWT auth, view, queries and rendering.
+Datasets come from `benchmarks.dataset` at fixed scales and seeds, and
+results are compared against JSON baselines in benchmarks/baselines/.
+"""
+import json
+import platform
+import statistics
+import subprocess
+import time
+import uuid
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from accounts.models import Customer
+from benchmarks.dataset import DatasetGenerator
+from benchmarks.timing import summarize
+from freshmart_project.metrics import QueryStats
+from kiosk.models import KioskSession
+from products.models import Product
+from purchases.models import Cart, CartItem, Purchase, PurchaseItem
+from recommendations.engine import update_recommendations_for_customer
+
+BASELINE_DIR = Path(__file__).resolve().parent / 'baselines'
+DATASET_DIR = Path(settings.BASE_DIR) / 'benchmark_data'
+
+# Named by approximate PurchaseItem count
+SCALES = {
+    '1k': dict(customers=50, products=100, purchases=200, reviews=200, sessions=50),
+    '100k': dict(customers=2000, products=1000, purchases=20000, reviews=5000, sessions=2000),
+    '1m': dict(customers=10000, products=2000, purchases=200000, reviews=50000, sessions=20000),
+}
+
+
+def dataset_name(scale, seed):
+    if connection.vendor == 'sqlite':
+        return DATASET_DIR / f'{scale}-seed{seed}.sqlite3'
+    return f'test_freshmart_benchmark_{scale}_{seed}'
+
+
+def ensure_dataset(scale, seed, workers=1, log=print):
+    """Generate the dataset unless the (kept) database already holds it"""
+    if Purchase.objects.exists():
+        log(f'Using existing {scale} dataset')
+        return
+    log(f'Generating {scale} dataset (seed {seed})...')
+    DatasetGenerator(seed=seed, workers=workers, log=log, **SCALES[scale]).generate()
+
+
+class Scenario:
+    """One benchmarked request; `before` runs untimed ahead of each call"""
+
+    def __init__(self, name, method, path, data=None, before=None):
+        self.name = name
+        self.method = method
+        self.path = path
+        self.data = data
+        self.before = before
+
+    def request(self, client):
+        return getattr(client, self.method)(self.path, self.data, format='json' if self.method == 'post' else None)
+
+
+class Fixtures:
+    """Users, sessions and carts the scenarios act on"""
+
+    def __init__(self):
+        # The most active shopper has the largest history to recommend from
+        self.customer = Customer.objects.filter(is_staff=False).order_by('-loyalty_points', 'pk').first()
+        self.checkout_customer = Customer.objects.filter(is_staff=False).exclude(
+            pk=self.customer.pk
+        ).order_by('pk').first()
+        best_seller = PurchaseItem.objects.values('product_id').annotate(
+            sold=Count('id')
+        ).order_by('-sold', 'product_id').first()
+        self.product = Product.objects.get(pk=best_seller['product_id'])
+        self.cheap_product = Product.objects.filter(is_active=True).order_by('price', 'pk').first()
+        self.search_term = self.product.category.name[:4]
+
+        cart, _ = Cart.objects.get_or_create(customer=self.customer)
+        for product in Product.objects.filter(is_active=True, stock_quantity__gt=0).order_by('pk')[:5]:
+            CartItem.objects.get_or_create(cart=cart, product=product, defaults={'quantity': 2})
+        self.checkout_cart, _ = Cart.objects.get_or_create(customer=self.checkout_customer)
+
+        update_recommendations_for_customer(self.customer)
+        self.kiosk_session = KioskSession.objects.create(
+            customer=self.customer, session_id=f'benchmark-{uuid.uuid4().hex[:12]}',
+        )
+
+    def client(self, customer):
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {AccessToken.for_user(customer)}')
+        return client
+
+    def fill_checkout_cart(self):
+        # Stays under the $60 reward threshold: one cheap line per checkout
+        Product.objects.filter(pk=self.cheap_product.pk).update(stock_quantity=1000)
+        CartItem.objects.update_or_create(
+            cart=self.checkout_cart, product=self.cheap_product, defaults={'quantity': 1}
+        )
+
+    def refresh_kiosk_session(self):
+        # Kiosk sessions expire after 30 minutes
+        KioskSession.objects.filter(pk=self.kiosk_session.pk).update(started_at=timezone.now())
+
+    def scenarios(self):
+        product_id = self.product.pk
+        return [
+            (Scenario('product_list', 'get', '/api/products/'), self.customer),
+            (Scenario('product_search', 'get', f'/api/products/?search={self.search_term}'), self.customer),
+            (Scenario('product_detail', 'get', f'/api/products/{product_id}/'), self.customer),
+            (Scenario('frequently_bought_together', 'get',
+                      f'/api/products/{product_id}/frequently_bought_together/'), self.customer),
+            (Scenario('cart', 'get', '/api/purchases/cart/'), self.customer),
+            (Scenario('checkout', 'post', '/api/purchases/checkout/', {'payment_method': 'credit_card'},
+                      before=self.fill_checkout_cart), self.checkout_customer),
+            (Scenario('recommendations', 'get', '/api/recommendations/'), self.customer),
+            (Scenario('package_recommendations', 'get', '/api/packages/recommendations/?people=2&days=7'),
+             self.customer),
+            (Scenario('kiosk_search', 'get',
+                      f'/api/kiosk/{self.kiosk_session.session_id}/search/?q={self.search_term}',
+                      before=self.refresh_kiosk_session), None),
+        ]
+
+
+def run_scenario(client, scenario, iterations, warmup, reset_throttles):
+    """Time `iterations` requests (after `warmup`) and count their queries"""
+    samples, query_counts = [], []
+    for i in range(warmup + iterations):
+        if scenario.before:
+            scenario.before()
+        reset_throttles()
+        queries = QueryStats()
+        with connection.execute_wrapper(queries):
+            started = time.perf_counter_ns()
+            response = scenario.request(client)
+            elapsed = time.perf_counter_ns() - started
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{scenario.name}: {scenario.method.upper()} {scenario.path} returned {response.status_code}'
+            )
+        if i >= warmup:
+            samples.append(elapsed)
+            query_counts.append(queries.count)
+    result = summarize(samples)
+    result['queries'] = int(statistics.median(query_counts))
+    return result
+
+
+def baseline_path(scale):
+    return BASELINE_DIR / f'{scale}.json'
+
+
+def load_baseline(scale):
+    path = baseline_path(scale)
+    if not path.exists():
+        return None
+    return json.loads(path.read_text())
+
+
+def source_commit():
+    """Checked-out commit hash, `-dirty` with uncommitted changes; None outside git"""
+    def git(*args):
+        return subprocess.run(
+            ['git', *args], cwd=BASELINE_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+
+    try:
+        commit = git('rev-parse', 'HEAD')
+        # Baselines already written by this run are not source changes
+        changes = git('status', '--porcelain', '--untracked-files=no', '--', ':/', f':(exclude){BASELINE_DIR}')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return f'{commit}-dirty' if changes else commit
+
+
+def save_baseline(scale, seed, iterations, results, **fields):
+    """Write `results` to baselines/<scale>.json; `fields` are recorded alongside"""
+    BASELINE_DIR.mkdir(parents=True, exist_ok=True)
+    payload = {
+        **fields,
+        'scale': scale,
+        'seed': seed,
+        'iterations': iterations,
+        'commit': source_commit(),
+        'recorded_at': timezone.now().isoformat(),
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'database': connection.vendor,
+        'results': results,
+    }
+    baseline_path(scale).write_text(json.dumps(payload, indent=2, sort_keys=True) + '\n')
+
+
+def find_regressions(results, baseline, threshold, min_delta_us):
+    """
+    Latency regresses when p50 or p95 grows by more than `threshold` (a
+    fraction) and by more than `min_delta_us`; any extra query regresses.
+    """
+    regressions = []
+    for name, result in results.items():
+        base = baseline['results'].get(name)
+        if base is None:
+            continue
+        for key in ('p50_us', 'p95_us'):
+            limit = base[key] * (1 + threshold)
+            if result[key] > limit and result[key] - base[key] > min_delta_us:
+                regressions.append(f'{name}: {key} {result[key]:.0f}us > baseline {base[key]:.0f}us')
+        if result['queries'] > base['queries']:
+            regressions.append(f"{name}: {result['queries']} queries > baseline {base['queries']}")
+    return regressions
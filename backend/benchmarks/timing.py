@@ -0,0 +1,43 @@
+"""
+Timing helpers shared by the benchmark commands
+"""
+import statistics
+import time
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not samples:
+        return 0.0
+    index = max(0, min(len(samples) - 1, int(round(pct / 100 * len(samples))) - 1))
+    return samples[index]
+
+
+def summarize(samples_ns):
+    """Summarize nanosecond samples as microsecond statistics"""
+    samples = sorted(s / 1000 for s in samples_ns)
+    return {
+        'count': len(samples),
+        'mean_us': round(statistics.fmean(samples), 2) if samples else 0.0,
+        'p50_us': round(percentile(samples, 50), 2),
+        'p95_us': round(percentile(samples, 95), 2),
+        'p99_us': round(percentile(samples, 99), 2),
+        'max_us': round(samples[-1], 2) if samples else 0.0,
+    }
+
+
+def time_calls(func, iterations):
+    """Call `func(i)` `iterations` times and return per-call nanoseconds"""
+    samples = []
+    for i in range(iterations):
+        start = time.perf_counter_ns()
+        func(i)
+        samples.append(time.perf_counter_ns() - start)
+    return samples
+
+
+def format_summary(label, summary):
+    return (
+        f"{label:<40} n={summary['count']:<7} mean={summary['mean_us']:>9.2f}us "
+        f"p50={summary['p50_us']:>9.2f}us p99={summary['p99_us']:>9.2f}us"
+    )
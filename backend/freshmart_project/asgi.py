@@ -2,6 +2,9 @@
 ASGI config for freshmart_project project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server (e.g. ``uvicorn freshmart_project.asgi:application``)
+to run the async-native read endpoints under /api/async/ without a thread
+per request.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/6.0/howto/deployment/asgi/
@@ -0,0 +1,116 @@
+"""
+Async-native read views for FreshMart API
+
+DRF's APIView is synchronous, so under ASGI every request to it holds a
+worker thread for its whole life. `AsyncAPIView` is a plain Django view
+with `async def` handlers that keeps the APIView behaviour the read
+endpoints rely on (JWT authentication, shared throttles and the
+`{'success': False, 'error': ...}` error shape), while database and cache
+access go through Django's async ORM and cache APIs.
+"""
+import math
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import AnonymousUser
+from django.http import JsonResponse
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def json_response(data, status=status.HTTP_200_OK):
+    return JsonResponse(data, status=status, encoder=JSONEncoder, safe=False)
+
+
+def error_response(status_code, message):
+    """Same body as freshmart_project.exceptions.custom_exception_handler"""
+    return json_response(
+        {'success': False, 'error': {'status_code': status_code, 'message': message}},
+        status=status_code
+    )
+
+
+class AsyncAPIView(View):
+    """Base class for async read-only API endpoints"""
+    http_method_names = ['get', 'head', 'options']
+    authentication_classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    throttle_classes = api_settings.DEFAULT_THROTTLE_CLASSES
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            request.user = await self.authenticate(request)
+            await self.check_throttles(request)
+            return await super().dispatch(request, *args, **kwargs)
+        except exceptions.Throttled as exc:
+            response = error_response(exc.status_code, str(exc.detail))
+            if exc.wait is not None:
+                response['Retry-After'] = str(math.ceil(exc.wait))
+            return response
+        except (exceptions.NotAuthenticated, exceptions.AuthenticationFailed) as exc:
+            response = error_response(status.HTTP_401_UNAUTHORIZED, str(exc.detail))
+            if self.authentication_classes:
+                response['WWW-Authenticate'] = self.authentication_classes[0]().authenticate_header(request)
+            return response
+        except exceptions.APIException as exc:
+            return error_response(exc.status_code, str(exc.detail))
+
+    async def authenticate(self, request):
+        # Anonymous requests (all kiosk traffic) never leave the event loop
+        if not self.authentication_classes or 'HTTP_AUTHORIZATION' not in request.META:
+            return AnonymousUser()
+        for authenticator_class in self.authentication_classes:
+            result = await sync_to_async(authenticator_class().authenticate)(request)
+            if result is not None:
+                return result[0]
+        return AnonymousUser()
+
+    def permission_denied(self, request):
+        """Raise what APIView.permission_denied would for this request"""
+        if self.authentication_classes and not request.user.is_authenticated:
+            raise exceptions.NotAuthenticated()
+        raise exceptions.PermissionDenied()
+
+    async def check_throttles(self, request):
+        waits = []
+        for throttle_class in self.throttle_classes:
+            throttle = throttle_class()
+            # The shared throttle store does its own locking
+            allowed = await sync_to_async(throttle.allow_request, thread_sensitive=False)(request, self)
+            if not allowed:
+                waits.append(throttle.wait())
+        if waits:
+            raise exceptions.Throttled(wait=max((w for w in waits if w is not None), default=None))
+
+    async def paginate(self, request, queryset, serialize):
+        """
+        Page through `queryset` like DRF's PageNumberPagination, returning
+        the same {'count', 'next', 'previous', 'results'} body.
+        `serialize(objects)` turns one page of objects into result data.
+        """
+        page_size = api_settings.PAGE_SIZE
+        try:
+            page = int(request.GET.get('page', 1))
+        except ValueError:
+            page = 0
+        count = await queryset.acount()
+        last_page = max(1, math.ceil(count / page_size))
+        if not 1 <= page <= last_page:
+            raise exceptions.NotFound('Invalid page.')
+
+        offset = (page - 1) * page_size
+        objects = [obj async for obj in queryset[offset:offset + page_size]]
+        url = request.build_absolute_uri()
+        if page == 1:
+            previous_url = None
+        elif page == 2:
+            previous_url = remove_query_param(url, 'page')
+        else:
+            previous_url = replace_query_param(url, 'page', page - 1)
+        return {
+            'count': count,
+            'next': replace_query_param(url, 'page', page + 1) if page < last_page else None,
+            'previous': previous_url,
+            'results': serialize(objects),
+        }
@@ -0,0 +1,136 @@
+"""
+Authentication classes for FreshMart API
+"""
+import copy
+import hmac
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authentication import BaseAuthentication
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+
+
+class UserCache:
+    """
+    Size-bounded, TTL-expiring LRU of authenticated users.
+
+    Entries are keyed by (user_id, token iat) so a freshly issued token
+    always resolves the user again. A secondary index by user_id lets
+    profile updates, deactivation and logout drop every entry for a user.
+    """
+
+    def __init__(self, max_entries=10000, ttl=30):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._keys_by_user = {}
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        # Each request gets its own copy so mutations never leak between requests
+        return copy.copy(user)
+
+    def set(self, key, user):
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (copy.copy(user), time.monotonic() + self.ttl)
+            self._keys_by_user.setdefault(key[0], set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in self._keys_by_user.pop(str(user_id), ()):
+                self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _remove(self, key):
+        self._entries.pop(key, None)
+        keys = self._keys_by_user.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[key[0]]
+
+
+user_cache = UserCache(
+    max_entries=getattr(settings, 'AUTH_USER_CACHE_MAX_ENTRIES', 10000),
+    ttl=getattr(settings, 'AUTH_USER_CACHE_TTL_SECONDS', 30),
+)
+
+
+def invalidate_cached_user(user_id):
+    """Drop cached entries for a user in this process"""
+    user_cache.invalidate_user(user_id)
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication that resolves users from `user_cache` instead of
+    loading the Customer row on every request.
+
+    Invalidation is per process: saves, deletes and logout clear the local
+    entries immediately, while other worker processes pick up the change
+    once AUTH_USER_CACHE_TTL_SECONDS expires.
+    """
+
+    def get_user(self, validated_token):
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        if user_id is None:
+            return super().get_user(validated_token)
+
+        key = (str(user_id), validated_token.get('iat'))
+        user = user_cache.get(key)
+        if user is None:
+            user = super().get_user(validated_token)
+            user_cache.set(key, user)
+        return user
+
+
+# request.auth for requests authenticated by MetricsTokenAuthentication
+METRICS_AUTH = 'metrics-token'
+
+
+class MetricsTokenAuthentication(BaseAuthentication):
+    """
+    Accepts `Authorization: Bearer <METRICS_TOKEN>` from metrics scrapers.
+
+    The request stays anonymous; `request.auth` is METRICS_AUTH. Any other
+    header is left to the next authentication class.
+    """
+
+    def authenticate(self, request):
+        token = getattr(settings, 'METRICS_TOKEN', None)
+        header = request.META.get('HTTP_AUTHORIZATION', '')
+        if token and hmac.compare_digest(header.encode(), f'Bearer {token}'.encode()):
+            return AnonymousUser(), METRICS_AUTH
+        return None
+
+    def authenticate_header(self, request):
+        return 'Bearer realm="api"'
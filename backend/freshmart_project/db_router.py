@@ -0,0 +1,117 @@
+"""
+Read/write database routing for FreshMart
+
+Within a request, catalog apps (REPLICA_CATALOG_APPS) read from the replica
+alias. Analytics code opts in with `read_from_replica()`, in or out of a
+request. Everything else goes to `default`: every write, and reads from
+background threads, management commands and on_commit workers, which must
+not act on a copy that may be a sync interval old.
+
+Routing state is kept per request in a contextvar. Once a request writes
+(or if it uses an unsafe HTTP method), it is pinned to the primary, so it
+always reads its own writes. The replica is used only while it exists; a
+local stand-in that has not been synced yet falls back to `default`.
+"""
+import os
+from contextlib import ContextDecorator
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+class RoutingState:
+    """Mutable per-request state shared by every copy of the context"""
+    __slots__ = ('in_request', 'pinned', 'replica_reads')
+
+    def __init__(self, in_request=False, pinned=False):
+        self.in_request = in_request
+        self.pinned = pinned
+        self.replica_reads = 0
+
+
+_state = ContextVar('freshmart_db_routing', default=None)
+
+
+def _current_state():
+    state = _state.get()
+    if state is None:
+        state = RoutingState()
+        _state.set(state)
+    return state
+
+
+def begin_request(pinned=False):
+    """Start fresh routing state; returns a token for `end_request`"""
+    return _state.set(RoutingState(in_request=True, pinned=pinned))
+
+
+def end_request(token):
+    _state.reset(token)
+
+
+def pin_primary():
+    """Send the rest of this request's reads to the primary"""
+    _current_state().pinned = True
+
+
+class read_from_replica(ContextDecorator):
+    """Route reads of any app to the replica (unless pinned) within the block"""
+
+    def __enter__(self):
+        _current_state().replica_reads += 1
+        return self
+
+    def __exit__(self, *exc):
+        _current_state().replica_reads -= 1
+        return False
+
+
+_replica_seen = False
+
+
+def replica_alias():
+    """The replica alias if configured and usable, else None"""
+    global _replica_seen
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+    if not alias or alias not in settings.DATABASES:
+        return None
+    replica = connections[alias].settings_dict
+    if replica['NAME'] == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']:
+        # Mirrored (TEST['MIRROR'] under the test runner): use the primary
+        # connection itself so reads see the test transaction
+        return None
+    if not _replica_seen:
+        if 'sqlite' in replica['ENGINE'] and not (
+            os.path.exists(replica['NAME']) and os.path.getsize(replica['NAME'])
+        ):
+            # Local stand-in not synced yet (opening it creates an empty file)
+            return None
+        _replica_seen = True
+    return alias
+
+
+class ReplicaRouter:
+    """Database router for the primary/replica pair"""
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.pinned:
+            return DEFAULT_DB_ALIAS
+        if state.replica_reads or (
+            state.in_request and model._meta.app_label in getattr(settings, 'REPLICA_CATALOG_APPS', ())
+        ):
+            return replica_alias() or DEFAULT_DB_ALIAS
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both aliases hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is a copy of the primary and is never migrated itself
+        return db == DEFAULT_DB_ALIAS
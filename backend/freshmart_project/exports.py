@@ -0,0 +1,132 @@
+"""
+Streaming CSV / NDJSON exports for FreshMart admin APIs
+"""
+import csv
+import json
+from datetime import datetime, time
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework import permissions, status
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from freshmart_project.db_router import read_from_replica
+
+EXPORT_CONTENT_TYPES = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class Echo:
+    """Pseudo-buffer for csv.writer: returns each row instead of storing it"""
+
+    def write(self, value):
+        return value
+
+
+def parse_export_bound(value, end_of_day=False):
+    """Parse a `start`/`end` query value (date or ISO datetime) into an aware datetime"""
+    if not value:
+        return None
+    # Dates first: parse_datetime also accepts a bare date, as midnight
+    day = parse_date(value)
+    if day is not None:
+        parsed = datetime.combine(day, time.max if end_of_day else time.min)
+    else:
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError(f"Invalid date: {value}")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def format_row(row):
+    """Render datetimes as full-precision ISO 8601 so both formats agree"""
+    return [value.isoformat() if isinstance(value, datetime) else value for value in row]
+
+
+def iter_csv(columns, rows):
+    """Yield CSV lines (header first) for an iterable of row tuples"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(columns)
+    for row in rows:
+        yield writer.writerow(format_row(row))
+
+
+def iter_ndjson(columns, rows):
+    """Yield one JSON object per line for an iterable of row tuples"""
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(dict(zip(columns, format_row(row)))) + '\n'
+
+
+class StreamingExportView(APIView):
+    """
+    Base view for admin exports streamed row by row.
+
+    Subclasses provide `columns` (output names), `fields` (values_list lookups
+    in the same order), `date_field` and `queryset` (or override
+    `get_queryset()`, as with DRF's generic views). Rows are pulled
+    with `.iterator(chunk_size=...)` so memory stays flat for any range, from
+    the read replica when one is available.
+    """
+    permission_classes = [permissions.IsAdminUser]
+    queryset = None
+    columns = ()
+    fields = ()
+    date_field = 'created_at'
+    ordering = ()
+    filename = 'export'
+    chunk_size = 2000
+
+    def get_queryset(self):
+        assert self.queryset is not None, (
+            f"'{self.__class__.__name__}' should either include a `queryset` attribute, "
+            f"or override the `get_queryset()` method."
+        )
+        # .all() so every request gets a fresh queryset
+        return self.queryset.all()
+
+    def get(self, request, export_format):
+        if export_format not in EXPORT_CONTENT_TYPES:
+            return Response(
+                {'success': False, 'error': 'Export format must be csv or ndjson'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        try:
+            start = parse_export_bound(request.query_params.get('start'))
+            end = parse_export_bound(request.query_params.get('end'), end_of_day=True)
+        except ValueError as e:
+            return Response(
+                {'success': False, 'error': str(e)},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        queryset = self.get_queryset()
+        if start:
+            queryset = queryset.filter(**{f'{self.date_field}__gte': start})
+        if end:
+            queryset = queryset.filter(**{f'{self.date_field}__lte': end})
+
+        # The rows are read after the view returns, so fix the alias now
+        with read_from_replica():
+            queryset = queryset.using(queryset.db)
+        rows = queryset.order_by(*self.ordering).values_list(*self.fields).iterator(
+            chunk_size=self.chunk_size
+        )
+        stream = iter_csv if export_format == 'csv' else iter_ndjson
+
+        response = StreamingHttpResponse(
+            stream(self.columns, rows),
+            content_type=EXPORT_CONTENT_TYPES[export_format]
+        )
+        response['Content-Disposition'] = (
+            f'attachment; filename="{self.filename}-{timezone.now():%Y%m%d%H%M%S}.{export_format}"'
+        )
+        return response
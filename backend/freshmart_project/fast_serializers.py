@@ -0,0 +1,284 @@
+"""
+values()-based fast path for hot list serializers
+
+A `RowSerializer` produces the same data as its DRF `serializer_class`, but
+reads `queryset.values()` rows instead of model instances. Building model
+instances and walking every field's get_attribute/to_representation is
+most of the cost of a list endpoint. Here each serializer is compiled once
+into a plan of (field name, getter) pairs, where each getter is a plain
+closure (or operator.itemgetter) that reads the needed columns and converts
+them the way the DRF field does, so the rendered bytes do not change.
+
+Fields are mapped from the DRF serializer's own field list:
+
+* model fields (also across forward relations, e.g. `category.name`) are
+  read from the row, and converted by the DRF field when needed (decimals,
+  datetimes, files). A null relation omits the field, like DRF does;
+* fields backed by model properties or methods must be declared in
+  `computed_fields` with the row columns they need and a `get_<name>`
+  method that takes those values;
+* `nested` serializes a forward relation with another RowSerializer
+  from the same row; `many` serializes reverse relations with one extra
+  query per page.
+"""
+from operator import itemgetter
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from django.db.models import OuterRef
+from rest_framework import serializers
+from rest_framework.fields import empty
+from rest_framework.response import Response
+
+# DRF fields whose to_representation returns database values unchanged
+IDENTITY_FIELDS = (
+    serializers.CharField, serializers.IntegerField, serializers.BooleanField,
+    serializers.ReadOnlyField, serializers.PrimaryKeyRelatedField,
+)
+
+# Returned by a getter when the field is left out of the output
+OMIT = object()
+
+
+def _converted(column, convert):
+    def get(row):
+        value = row[column]
+        return None if value is None else convert(value)
+    return get
+
+
+def _file_url(column, storage, file_url):
+    def get(row):
+        return file_url(storage, row[column])
+    return get
+
+
+def _when_present(columns, get, allow_null):
+    """`get(row)` if no relation in `columns` is null, else None or OMIT"""
+    missing = None if allow_null else OMIT
+
+    def get_present(row):
+        for column in columns:
+            if row[column] is None:
+                return missing
+        return get(row)
+    return get_present
+
+
+class RowSerializer:
+    """Serializes values() rows exactly like `serializer_class`"""
+    serializer_class = None
+    # field name -> columns passed to `get_<field name>()`
+    computed_fields = {}
+    # field name -> RowSerializer for a forward relation
+    nested = {}
+    # field name -> (RowSerializer for the related model, its FK to this model)
+    many = {}
+
+    _compiled = {}
+
+    def __init__(self, context=None, prefix=''):
+        self.context = context or {}
+        self.prefix = prefix
+        self.request = self.context.get('request')
+        key = (type(self), prefix)
+        if key not in self._compiled:
+            self._compiled[key] = self.compile()
+        self.plan = self._compiled[key]
+        self.getters = [(name, self.getter(*spec)) for name, spec in self.plan['fields']]
+
+    def getter(self, kind, *args):
+        """Bind one compiled field spec to this serializer instance"""
+        if kind == 'computed':
+            method, columns = args
+            method = getattr(self, method)
+            if len(columns) == 1:
+                column, = columns
+                return lambda row: method(row[column])
+            return lambda row: method(*[row[column] for column in columns])
+        if kind == 'many':
+            # Filled in by serialize() once the page is known
+            return lambda row: None
+        if kind == 'nested':
+            column, serializer_class, prefix = args
+            map_row = serializer_class(self.context, prefix=prefix).map_row
+            return lambda row: None if row[column] is None else map_row(row)
+        column, convert, nullable, allow_null = args
+        if kind == 'file':
+            get = _file_url(column, convert, self.file_url)
+        elif convert is None:
+            get = itemgetter(column)
+        else:
+            get = _converted(column, convert)
+        if nullable:
+            return _when_present(nullable, get, allow_null)
+        return get
+
+    def map_row(self, row):
+        data = {name: get(row) for name, get in self.getters}
+        for name in self.plan['omittable']:
+            if data[name] is OMIT:
+                del data[name]
+        return data
+
+    @property
+    def model(self):
+        return self.serializer_class.Meta.model
+
+    def key(self, name):
+        return self.prefix + name
+
+    def get_annotations(self, outer_ref):
+        """
+        Extra columns as {name: expression}; `outer_ref` refers to the pk
+        of this serializer's model in the outer query
+        """
+        return {}
+
+    def annotations(self):
+        outer_ref = OuterRef(self.prefix[:-2] if self.prefix else 'pk')
+        annotations = {
+            self.key(name): expression
+            for name, expression in self.get_annotations(outer_ref).items()
+        }
+        for name, (serializer_class, nested_prefix) in self.plan['nested'].items():
+            annotations.update(serializer_class(self.context, prefix=nested_prefix).annotations())
+        return annotations
+
+    def file_url(self, storage, name):
+        """What DRF's FileField returns for a stored file name"""
+        if not name:
+            return None
+        url = storage.url(name)
+        if self.request is not None:
+            return self.request.build_absolute_uri(url)
+        return url
+
+    def compile(self):
+        """Field specs for map_row() and the row columns they read"""
+        fields = self.serializer_class(context=self.context).fields
+        lookups = []
+        specs = []
+        nested = {}
+        # Fields left out when a nullable relation on their path is null
+        omittable = []
+
+        def column(name):
+            if self.key(name) not in lookups:
+                lookups.append(self.key(name))
+            return self.key(name)
+
+        for name, field in fields.items():
+            if name in self.computed_fields:
+                columns = tuple(column(c) for c in self.computed_fields[name])
+                specs.append((name, ('computed', f'get_{name}', columns)))
+                continue
+            if name in self.many:
+                specs.append((name, ('many',)))
+                continue
+            if name in self.nested:
+                nested_prefix = f'{self.prefix}{field.source}__'
+                nested[name] = (self.nested[name], nested_prefix)
+                nested_plan = self.nested[name](self.context, prefix=nested_prefix).plan
+                lookups.extend(c for c in nested_plan['lookups'] if c not in lookups)
+                specs.append((name, ('nested', column(field.source), self.nested[name], nested_prefix)))
+                continue
+
+            path, model_field, nullable = self.resolve(name, field)
+            if field.default is not empty and nullable:
+                raise ImproperlyConfigured(f'{type(self).__name__}.{name}: field defaults are not supported')
+            if isinstance(field, serializers.FileField):
+                # For files, the storage that resolves the stored name
+                kind, convert = 'file', model_field.storage
+            elif isinstance(field, IDENTITY_FIELDS) or type(field) is serializers.ChoiceField:
+                kind, convert = 'value', None
+            else:
+                kind, convert = 'value', field.to_representation
+            nullable = tuple(column(p) for p in nullable)
+            if nullable and not field.allow_null:
+                omittable.append(name)
+            specs.append((name, (kind, column(path[-1]), convert, nullable, field.allow_null)))
+
+        if self.many:
+            column('pk')
+        return {'fields': specs, 'lookups': lookups, 'nested': nested, 'omittable': omittable}
+
+    def resolve(self, name, field):
+        """
+        The values() path of `field`, the model field it ends on and the
+        nullable relations crossed on the way
+        """
+        model = self.model
+        path, nullable = [], []
+        attrs = field.source_attrs
+        for depth, attr in enumerate(attrs):
+            try:
+                model_field = model._meta.get_field(attr)
+            except FieldDoesNotExist:
+                raise ImproperlyConfigured(
+                    f'{type(self).__name__}.{name}: `{field.source}` is not a model field, '
+                    'declare it in computed_fields'
+                )
+            path.append('__'.join(attrs[:depth + 1]))
+            if depth == len(attrs) - 1:
+                break
+            if not (model_field.many_to_one or model_field.one_to_one) or model_field.auto_created:
+                raise ImproperlyConfigured(f'{type(self).__name__}.{name}: only forward relations can be followed')
+            if model_field.null:
+                nullable.append(path[-1])
+            model = model_field.related_model
+        if model_field.is_relation and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            raise ImproperlyConfigured(f'{type(self).__name__}.{name}: relation must be declared in nested or many')
+        return path, model_field, nullable
+
+    def rows(self, queryset, *extra):
+        """`queryset` as the values() rows this serializer reads"""
+        lookups = list(self.plan['lookups'])
+        lookups.extend(name for name in extra if name not in lookups)
+        return queryset.prefetch_related(None).annotate(**self.annotations()).values(*lookups)
+
+    def serialize(self, rows):
+        """Serialize already evaluated rows, as `serializer_class(many=True).data`"""
+        rows = list(rows)
+        map_row = self.map_row
+        data = [map_row(row) for row in rows]
+        for name, (serializer_class, fk) in self.many.items():
+            child = serializer_class(self.context)
+            pks = [row[self.key('pk')] for row in rows]
+            ordering = child.model._meta.ordering or ['pk']
+            children = child.rows(
+                child.model.objects.filter(**{f'{fk}__in': pks}).order_by(*ordering), fk
+            )
+            grouped = {pk: [] for pk in pks}
+            for row in children:
+                grouped[row[fk]].append(child.map_row(row))
+            for item, pk in zip(data, pks):
+                item[name] = grouped[pk]
+        return data
+
+
+class RowListMixin:
+    """
+    List view mixin that serves GET lists through `row_serializer_class`,
+    paginated like the view's DRF serializer path
+    """
+    row_serializer_class = None
+
+    def get_row_serializer(self):
+        return self.row_serializer_class(context=self.get_serializer_context())
+
+    def list(self, request, *args, **kwargs):
+        serializer = self.get_row_serializer()
+        # Cursor pagination reads its position from the ordering columns
+        ordering = getattr(self.paginator, 'ordering', None) or ()
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        rows = serializer.rows(
+            self.filter_queryset(self.get_queryset()),
+            *(field.lstrip('-') for field in ordering)
+        )
+
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(serializer.serialize(page))
+        return Response(serializer.serialize(rows))
+
@@ -3,13 +3,24 @@ Health check and monitoring endpoints for FreshMart
 """
 from rest_framework import status
 from rest_framework.response import Response
+from django.http import HttpResponse
 from rest_framework.views import APIView
 from rest_framework.permissions import AllowAny
-from django.db import connection
+from django.db import connection, connections, close_old_connections
 from django.core.cache import cache
 from django.conf import settings
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import shutil
+import threading
 import time
 import os
+import logging
+from freshmart_project.authentication import CachedJWTAuthentication, MetricsTokenAuthentication
+from freshmart_project.db_router import read_from_replica
+from freshmart_project.metrics import registry, render_prometheus
+from freshmart_project.permissions import IsAdminOrMetricsScraper
+
+logger = logging.getLogger('freshmart')
 
 
 class HealthCheckView(APIView):
@@ -40,40 +51,142 @@ class HealthCheckView(APIView):
         return Response(health_status, status=status_code)
 
 
+class MigrationState:
+    """
+    Cached "are all migrations applied?" flag.
+
+    Building a MigrationExecutor imports every migration module and reads
+    django_migrations, so it is computed on the first readiness probe and
+    then refreshed at most every READINESS_MIGRATION_REFRESH_SECONDS. A
+    failed check reports False and is retried after
+    READINESS_MIGRATION_RETRY_SECONDS instead. Only one thread refreshes at
+    a time; concurrent probes keep serving the cached value.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.applied = None
+        self.checked_at = 0.0
+        self.next_check_at = 0.0
+    
+    @property
+    def refresh_interval(self):
+        return getattr(settings, 'READINESS_MIGRATION_REFRESH_SECONDS', 300)
+    
+    @property
+    def retry_interval(self):
+        return getattr(settings, 'READINESS_MIGRATION_RETRY_SECONDS', 5)
+    
+    def refresh(self):
+        from django.db.migrations.executor import MigrationExecutor
+        try:
+            executor = MigrationExecutor(connection)
+            targets = executor.loader.graph.leaf_nodes()
+            self.applied = not executor.migration_plan(targets)
+        except Exception as e:
+            logger.warning(f"Migration state check failed: {e}")
+            self.applied = False
+            self.next_check_at = time.monotonic() + self.retry_interval
+        else:
+            self.checked_at = time.monotonic()
+            self.next_check_at = self.checked_at + self.refresh_interval
+        return self.applied
+    
+    def get(self):
+        due = time.monotonic() >= self.next_check_at
+        if (self.applied is None or due) and self._lock.acquire(blocking=self.applied is None):
+            try:
+                if self.applied is None or time.monotonic() >= self.next_check_at:
+                    self.refresh()
+            finally:
+                self._lock.release()
+        return self.applied
+
+
+migration_state = MigrationState()
+
+_readiness_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='readiness')
+
+
+def _run_check(check):
+    """Run one check and return (ok, latency_ms)"""
+    started = time.perf_counter()
+    try:
+        ok = bool(check())
+        return ok, round((time.perf_counter() - started) * 1000, 2)
+    finally:
+        # Checks run on pool threads, which own their own DB connections
+        close_old_connections()
+
+
+def check_database():
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+    return True
+
+
+def check_migrations():
+    return migration_state.get()
+
+
+def check_cache():
+    cache.set('readiness_probe', 1, 10)
+    return cache.get('readiness_probe') == 1
+
+
+def check_disk():
+    min_free = getattr(settings, 'READINESS_MIN_FREE_DISK_BYTES', 100 * 1024 * 1024)
+    media_root = settings.MEDIA_ROOT if os.path.isdir(settings.MEDIA_ROOT) else settings.BASE_DIR
+    return shutil.disk_usage(media_root).free >= min_free and os.access(media_root, os.W_OK)
+
+
+READINESS_CHECKS = {
+    'database': check_database,
+    'migrations': check_migrations,
+    'cache': check_cache,
+    'disk': check_disk,
+}
+
+
 class ReadinessCheckView(APIView):
     """
     Readiness check for Kubernetes-style deployments
+
+    Checks run concurrently, each bounded by READINESS_CHECK_TIMEOUT_SECONDS,
+    and report their own latency.
     """
     permission_classes = [AllowAny]
     
     def get(self, request):
-        checks = {
-            'database': False,
-            'migrations': False,
+        timeout = getattr(settings, 'READINESS_CHECK_TIMEOUT_SECONDS', 2)
+        started = time.perf_counter()
+        futures = {
+            name: _readiness_executor.submit(_run_check, check)
+            for name, check in READINESS_CHECKS.items()
         }
         
-        # Check database
-        try:
-            with connection.cursor() as cursor:
-                cursor.execute('SELECT 1')
-            checks['database'] = True
-        except:
-            pass
-        
-        # Check migrations are applied
-        try:
-            from django.db.migrations.executor import MigrationExecutor
-            executor = MigrationExecutor(connection)
-            targets = executor.loader.graph.leaf_nodes()
-            checks['migrations'] = not executor.migration_plan(targets)
-        except:
-            pass
+        checks = {}
+        details = {}
+        for name, future in futures.items():
+            remaining = max(0, timeout - (time.perf_counter() - started))
+            try:
+                ok, latency_ms = future.result(timeout=remaining)
+                detail = {'latency_ms': latency_ms}
+            except FutureTimeoutError:
+                ok = False
+                detail = {'latency_ms': round(timeout * 1000, 2), 'error': 'timeout'}
+            except Exception as e:
+                ok = False
+                detail = {'latency_ms': round((time.perf_counter() - started) * 1000, 2), 'error': str(e)}
+            checks[name] = ok
+            details[name] = detail
         
         all_ready = all(checks.values())
         
         return Response({
             'ready': all_ready,
-            'checks': checks
+            'checks': checks,
+            'details': details,
         }, status=status.HTTP_200_OK if all_ready else status.HTTP_503_SERVICE_UNAVAILABLE)
 
 
@@ -87,32 +200,154 @@ class LivenessCheckView(APIView):
         return Response({'alive': True, 'timestamp': time.time()})
 
 
-class SystemInfoView(APIView):
+class StatisticsSnapshot:
     """
-    System information endpoint - Admin only
+    Periodically refreshed snapshot of the SystemInfoView counters.
+
+    Requests never count tables themselves: they read the snapshot, and when
+    it is older than SYSTEM_INFO_REFRESH_SECONDS a single background thread
+    recomputes it. The first request in each process computes it inline,
+    once. A failed refresh is retried after SYSTEM_INFO_RETRY_SECONDS,
+    doubling with each further failure up to SYSTEM_INFO_REFRESH_SECONDS,
+    so a struggling database is not asked for the counts on every request.
     """
-    permission_classes = [AllowAny]  # Change to IsAdminUser in production
     
-    def get(self, request):
-        from django.db.models import Count, Sum
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refreshing = False
+        self.data = None
+        self.taken_at = None
+        self._taken_monotonic = 0.0
+        self.compute_seconds = 0.0
+        self.failures = 0
+        self._retry_at = 0.0
+    
+    @property
+    def refresh_interval(self):
+        return getattr(settings, 'SYSTEM_INFO_REFRESH_SECONDS', 60)
+    
+    @property
+    def retry_interval(self):
+        return getattr(settings, 'SYSTEM_INFO_RETRY_SECONDS', 5)
+    
+    @property
+    def age(self):
+        """Seconds since the served snapshot was started"""
+        return time.monotonic() - self._taken_monotonic if self.data is not None else None
+    
+    @property
+    def max_age(self):
+        """Oldest a snapshot gets while requests keep coming: the interval plus one refresh"""
+        return self.refresh_interval + self.compute_seconds
+    
+    @read_from_replica()
+    def compute(self):
         from accounts.models import Customer
         from products.models import Product, Category
         from purchases.models import Purchase
         from recommendations.models import Recommendation
         from kiosk.models import KioskSession
         
+        return {
+            'total_customers': Customer.objects.count(),
+            'total_products': Product.objects.filter(is_active=True).count(),
+            'total_categories': Category.objects.count(),
+            'total_purchases': Purchase.objects.filter(status='completed').count(),
+            'total_recommendations': Recommendation.objects.filter(is_active=True).count(),
+            'total_kiosk_sessions': KioskSession.objects.count(),
+        }
+    
+    def refresh(self):
+        started_at = time.time()
+        started = time.monotonic()
+        try:
+            data = self.compute()
+        except Exception as e:
+            self.failures += 1
+            backoff = min(self.refresh_interval, self.retry_interval * 2 ** (self.failures - 1))
+            self._retry_at = time.monotonic() + backoff
+            logger.warning(f"System statistics refresh failed ({self.failures} in a row, retrying in {backoff}s): {e}")
+        else:
+            # The counts are at most as old as the start of the refresh
+            self.data = data
+            self.taken_at = started_at
+            self._taken_monotonic = started
+            self.compute_seconds = time.monotonic() - started
+            self.failures = 0
+        finally:
+            self._refreshing = False
+    
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        finally:
+            connections.close_all()
+    
+    def refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+        threading.Thread(target=self._refresh_in_background, name='system-stats', daemon=True).start()
+    
+    def get(self):
+        now = time.monotonic()
+        if now < self._retry_at:
+            return self.data
+        if self.data is None:
+            with self._lock:
+                if self.data is None and time.monotonic() >= self._retry_at:
+                    self._refreshing = True
+                    self.refresh()
+        elif now - self._taken_monotonic >= self.refresh_interval:
+            self.refresh_async()
+        return self.data
+
+
+system_statistics = StatisticsSnapshot()
+
+
+def _rounded(seconds):
+    return round(seconds, 3) if seconds is not None else None
+
+
+class SystemInfoView(APIView):
+    """
+    System information endpoint - Admin only
+
+    Statistics come from `system_statistics`; the response reports their
+    actual age and the bound it stays within while requests keep coming.
+    """
+    permission_classes = [AllowAny]  # Change to IsAdminUser in production
+    
+    def get(self, request):
+        statistics = system_statistics.get()
+        
         return Response({
             'version': getattr(settings, 'API_VERSION', '1.0.0'),
             'debug': settings.DEBUG,
             'database': {
                 'engine': settings.DATABASES['default']['ENGINE'],
             },
-            'statistics': {
-                'total_customers': Customer.objects.count(),
-                'total_products': Product.objects.filter(is_active=True).count(),
-                'total_categories': Category.objects.count(),
-                'total_purchases': Purchase.objects.filter(status='completed').count(),
-                'total_recommendations': Recommendation.objects.filter(is_active=True).count(),
-                'total_kiosk_sessions': KioskSession.objects.count(),
-            }
+            'statistics': statistics,
+            'statistics_as_of': system_statistics.taken_at,
+            'statistics_age_seconds': _rounded(system_statistics.age),
+            'statistics_max_age_seconds': _rounded(system_statistics.max_age),
         })
+
+
+class MetricsView(APIView):
+    """
+    Prometheus text exposition of the metrics registry, merged across workers
+
+    Admin only; scrapers send `Authorization: Bearer <METRICS_TOKEN>`.
+    """
+    authentication_classes = [MetricsTokenAuthentication, CachedJWTAuthentication]
+    permission_classes = [IsAdminOrMetricsScraper]
+    throttle_classes = []
+    
+    def get(self, request):
+        return HttpResponse(
+            render_prometheus(registry.collect_all()),
+            content_type='text/plain; version=0.0.4; charset=utf-8'
+        )
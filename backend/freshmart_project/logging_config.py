@@ -1,11 +1,42 @@
 """
 Enterprise-grade logging configuration for FreshMart
+
+Loggers are configured from LOGGING as usual by `configure_logging`
+(settings.LOGGING_CONFIG). With LOG_QUEUE_ENABLED (the default) it also
+moves every configured logger's handlers behind a single bounded queue
+drained by a background QueueListener thread: request threads only format
+the message and enqueue it, and console/file I/O and rotation locking
+happen on the listener thread. Each process starts its own listener on its
+first record, so workers forked after django.setup() log too.
+
+On Linux the listener runs at a lower scheduling priority
+(LOG_LISTENER_NICE), so it writes while request threads wait on the
+database or the network instead of taking a full scheduler slice from
+them; at normal priority it raised p99 in benchmark_logging from ~0.3ms
+to ~4ms on one core. A CPU that never idles lets the queue fill, and
+records beyond LOG_QUEUE_MAX_SIZE are dropped and counted
+(freshmart_log_records_dropped_total).
 """
+import atexit
+import json
+import logging
+import logging.config
 import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# Records beyond this many pending are dropped (and counted) rather than
+# blocking the request thread
+LOG_QUEUE_MAX_SIZE = 10000
+# Nice value of the listener thread (Linux only)
+LOG_LISTENER_NICE = 10
+
 # Create logs directory
 LOGS_DIR = BASE_DIR / 'logs'
 LOGS_DIR.mkdir(exist_ok=True)
@@ -23,7 +54,7 @@ LOGGING = {
             'style': '{',
         },
         'json': {
-            'format': '{"level": "%(levelname)s", "time": "%(asctime)s", "module": "%(module)s", "message": "%(message)s"}',
+            '()': 'freshmart_project.logging_config.JSONFormatter',
         },
     },
     'filters': {
@@ -99,6 +130,11 @@ LOGGING = {
             'level': 'INFO',
             'propagate': False,
         },
+        'freshmart.sql': {
+            'handlers': ['api_file', 'console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
         'freshmart.security': {
             'handlers': ['security_file', 'console'],
             'level': 'INFO',
@@ -106,3 +142,143 @@ LOGGING = {
         },
     },
 }
+
+
+_RESERVED_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JSONFormatter(logging.Formatter):
+    """
+    One JSON object per record. Attributes passed via `extra=` are emitted
+    as top-level keys, so middleware can log structured fields.
+    """
+
+    def format(self, record):
+        payload = {
+            'level': record.levelname,
+            'time': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(),
+            'logger': record.name,
+            'module': record.module,
+            'message': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED_RECORD_ATTRS and not key.startswith('_'):
+                payload[key] = value
+        if record.exc_info:
+            payload['exc_info'] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str, ensure_ascii=False)
+
+
+class RoutingQueueHandler(QueueHandler):
+    """
+    Enqueues records together with the handlers of the logger they came
+    from, so one listener thread can serve every logger.
+    """
+
+    def __init__(self, log_queue, targets):
+        super().__init__(log_queue)
+        self.targets = tuple(targets)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        if _listener_pid != os.getpid():
+            ensure_log_listener()
+        try:
+            self.queue.put_nowait((self.targets, record))
+        except queue.Full:
+            self.dropped += 1
+
+
+class RoutingQueueListener(QueueListener):
+    """QueueListener that dispatches each record to the handlers it was queued with"""
+
+    def _monitor(self):
+        if sys.platform.startswith('linux'):
+            # Linux applies setpriority() to a single thread id; elsewhere
+            # it would lower the whole process
+            try:
+                os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), LOG_LISTENER_NICE)
+            except OSError:
+                pass
+        super()._monitor()
+
+    def handle(self, item):
+        targets, record = item
+        record = self.prepare(record)
+        for handler in targets:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+log_queue = queue.Queue(maxsize=LOG_QUEUE_MAX_SIZE)
+_listener = None
+_listener_pid = None
+_listener_lock = threading.Lock()
+_queue_handlers = []
+
+
+def log_queue_depth():
+    """Number of records waiting to be written"""
+    return log_queue.qsize()
+
+
+def queue_handlers():
+    """RoutingQueueHandlers installed by the last configure_logging call"""
+    return list(_queue_handlers)
+
+
+def ensure_log_listener():
+    """Start the listener thread once per process (again after a fork)"""
+    global log_queue, _listener, _listener_pid
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        if _listener_pid is not None:
+            # Forked: the parent's listener and its queued records stay with
+            # the parent; start from an empty queue
+            log_queue = queue.Queue(maxsize=LOG_QUEUE_MAX_SIZE)
+            for handler in _queue_handlers:
+                handler.queue = log_queue
+        _listener = RoutingQueueListener(log_queue)
+        _listener.start()
+        _listener_pid = os.getpid()
+
+
+def stop_log_listener():
+    """Flush pending records and stop this process's listener thread"""
+    global _listener, _listener_pid
+    with _listener_lock:
+        if _listener is not None and _listener_pid == os.getpid():
+            _listener.stop()
+        _listener = None
+        _listener_pid = None
+
+
+def configure_logging(config, queued=None):
+    """
+    settings.LOGGING_CONFIG entry point: apply `config`, then, if `queued`
+    (default settings.LOG_QUEUE_ENABLED), route every configured logger
+    through the shared queue.
+    """
+    from django.conf import settings
+
+    stop_log_listener()
+    logging.config.dictConfig(config)
+    _queue_handlers.clear()
+    if queued is None:
+        queued = getattr(settings, 'LOG_QUEUE_ENABLED', True)
+    if not queued:
+        return
+
+    for name in config.get('loggers', {}):
+        logger = logging.getLogger(name)
+        targets = [h for h in logger.handlers if not isinstance(h, QueueHandler)]
+        if targets:
+            for handler in targets:
+                logger.removeHandler(handler)
+            handler = RoutingQueueHandler(log_queue, targets)
+            logger.addHandler(handler)
+            _queue_handlers.append(handler)
+
+
+atexit.register(stop_log_listener)
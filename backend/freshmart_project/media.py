@@ -0,0 +1,185 @@
+"""
+Media storage and serving for FreshMart
+
+Uploads are stored under content-hashed names (`products/apple.3f2a9c1b7d4e.jpg`),
+so a URL always refers to the same bytes and can be cached forever;
+replacing an image produces a new URL. `MediaView` serves MEDIA_ROOT with:
+
+* `Cache-Control: immutable` for content-hashed files, revalidation for
+  anything else (files uploaded before hashing was introduced);
+* ETag/If-None-Match and Last-Modified/If-Modified-Since (304s), so
+  kiosks re-fetching the same QR codes and images get empty responses;
+* single byte ranges (206/416);
+* offload to the front-end server when MEDIA_SENDFILE is set: nginx
+  (`X-Accel-Redirect` to the internal MEDIA_ACCEL_REDIRECT_LOCATION) or
+  Apache/lighttpd (`X-Sendfile`). Otherwise the file is streamed with
+  FileResponse, which WSGI servers send with sendfile(2).
+"""
+import hashlib
+import mimetypes
+import os
+import re
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_http_date_safe
+from django.views import View
+
+HASH_LENGTH = 12
+
+# `name.<12 hex>.ext` from HashedFileSystemStorage, or a directory named by
+# a full SHA-256 (image derivatives)
+CONTENT_HASHED = re.compile(r'\.[0-9a-f]{%d}\.[^./]+$|(^|/)[0-9a-f]{64}/' % HASH_LENGTH)
+RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def is_content_hashed(name):
+    return CONTENT_HASHED.search(name) is not None
+
+
+class HashedFileSystemStorage(FileSystemStorage):
+    """
+    Saves files as `<name>.<hash>.<ext>` using a prefix of the content's
+    SHA-256. Saving the same bytes twice reuses the existing file.
+    """
+
+    def _save(self, name, content):
+        if is_content_hashed(name):
+            return super()._save(name, content)
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        root, ext = os.path.splitext(name)
+        name = f'{root}.{digest.hexdigest()[:HASH_LENGTH]}{ext}'
+        if self.exists(name):
+            return name
+        return super()._save(name, content)
+
+    def get_available_name(self, name, max_length=None):
+        # Hashed names identify their content; an existing file is the same file
+        if is_content_hashed(name):
+            return name
+        return super().get_available_name(name, max_length)
+
+
+def etag_for(name, stat):
+    if is_content_hashed(name):
+        return f'"{os.path.basename(name)}"'
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def etag_matches(header, etag):
+    """If-None-Match / If-Range comparison (weak, as RFC 9110 requires for GET)"""
+    if header.strip() == '*':
+        return True
+    return etag in (tag.strip().removeprefix('W/') for tag in header.split(','))
+
+
+def parse_range(header, size):
+    """(start, end) of a single `bytes=` range, None to ignore it, or False if unsatisfiable"""
+    match = RANGE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        # Malformed and multi-range requests get the whole file
+        return None
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+        if last and int(last) < start:
+            return None
+    else:
+        start, end = max(0, size - int(last)), size - 1
+        if int(last) == 0:
+            return False
+    if start >= size:
+        return False
+    return start, end
+
+
+def read_range(path, start, end, block_size=FileResponse.block_size):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = f.read(min(block_size, remaining))
+            if not chunk:
+                return
+            remaining -= len(chunk)
+            yield chunk
+
+
+class MediaView(View):
+    """Serve an uploaded file from MEDIA_ROOT"""
+    http_method_names = ['get', 'head']
+
+    def get(self, request, path):
+        try:
+            full_path = safe_join(settings.MEDIA_ROOT, path)
+            stat = os.stat(full_path)
+        except (OSError, ValueError):
+            raise Http404('Media file not found')
+        if not os.path.isfile(full_path):
+            raise Http404('Media file not found')
+
+        etag = etag_for(path, stat)
+        headers = {
+            'ETag': etag,
+            'Last-Modified': http_date(stat.st_mtime),
+            'Cache-Control': IMMUTABLE if is_content_hashed(path) else (
+                f'public, max-age={settings.MEDIA_CACHE_MAX_AGE}, must-revalidate'
+            ),
+        }
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match is not None:
+            not_modified = etag_matches(if_none_match, etag)
+        else:
+            since = parse_http_date_safe(request.headers.get('If-Modified-Since', ''))
+            not_modified = since is not None and int(stat.st_mtime) <= since
+        if not_modified:
+            response = HttpResponseNotModified()
+            for header, value in headers.items():
+                response[header] = value
+            return response
+
+        content_type, encoding = mimetypes.guess_type(full_path)
+        content_type = content_type or 'application/octet-stream'
+
+        sendfile = getattr(settings, 'MEDIA_SENDFILE', None)
+        if sendfile:
+            # The front-end server handles ranges and conditional requests itself
+            response = HttpResponse(content_type=content_type)
+            if sendfile == 'x-accel-redirect':
+                location = settings.MEDIA_ACCEL_REDIRECT_LOCATION.rstrip('/')
+                response['X-Accel-Redirect'] = f'{location}/{quote(path)}'
+            else:
+                response['X-Sendfile'] = full_path
+        else:
+            byte_range = None
+            range_header = request.headers.get('Range')
+            if range_header and etag_matches(request.headers.get('If-Range', etag), etag):
+                byte_range = parse_range(range_header, stat.st_size)
+            if byte_range is False:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+            if byte_range:
+                start, end = byte_range
+                response = StreamingHttpResponse(read_range(full_path, start, end), status=206,
+                                                 content_type=content_type)
+                response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+                response['Content-Length'] = str(end - start + 1)
+            else:
+                response = FileResponse(open(full_path, 'rb'), content_type=content_type)
+            response['Accept-Ranges'] = 'bytes'
+
+        if encoding:
+            response['Content-Encoding'] = encoding
+        for header, value in headers.items():
+            response[header] = value
+        return response
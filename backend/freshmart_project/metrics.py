@@ -0,0 +1,324 @@
+"""
+In-process metrics registry for FreshMart API
+
+Each worker process records into its own `registry`: plain dicts updated
+under one lock, so an observation costs a few microseconds. A daemon thread
+writes the process's state to METRICS_DIR/<pid>.json every
+METRICS_FLUSH_SECONDS, and the /metrics/ endpoint merges those files with
+the live state of the process serving the scrape. Every worker is
+therefore visible whichever one answers. Output is Prometheus text format.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+from django.conf import settings
+
+logger = logging.getLogger('freshmart')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SQL_TIME_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0)
+SQL_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (128, 512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+METRIC_HELP = {
+    'freshmart_http_requests_total': ('counter', 'HTTP requests by view, method and status'),
+    'freshmart_http_request_duration_seconds': ('histogram', 'Request latency by view'),
+    'freshmart_http_request_size_bytes': ('histogram', 'Request body size by view'),
+    'freshmart_http_response_size_bytes': ('histogram', 'Response body size by view (non-streaming)'),
+    'freshmart_db_queries_per_request': ('histogram', 'SQL queries executed per request'),
+    'freshmart_db_query_seconds_per_request': ('histogram', 'Total SQL time per request'),
+    'freshmart_auth_user_cache_hits_total': ('counter', 'JWT user cache hits'),
+    'freshmart_auth_user_cache_misses_total': ('counter', 'JWT user cache misses'),
+    'freshmart_log_queue_depth': ('gauge', 'Log records waiting for the listener thread'),
+    'freshmart_log_records_dropped_total': ('counter', 'Log records dropped because the queue was full'),
+    'freshmart_catalog_cache_hits_total': ('counter', 'Catalog cache hits by payload kind'),
+    'freshmart_catalog_cache_misses_total': ('counter', 'Catalog cache misses by payload kind'),
+    'freshmart_worker_queue_depth': ('gauge', 'Work waiting in background worker pools, by pool'),
+    'freshmart_recommendation_events_buffered': ('gauge', 'Recommendation events waiting to be written, by kind'),
+}
+
+# Callables returning [(name, labels_dict, value)] for values owned by other
+# modules (cache counters, queue depths). Evaluated at flush and scrape time.
+_collectors = []
+
+
+def register_collector(func):
+    """Register a collector; usable as a decorator"""
+    _collectors.append(func)
+    return func
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+class QueryStats:
+    """connection.execute_wrapper that counts queries and their total time"""
+
+    __slots__ = ('count', 'seconds')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - started
+
+
+class MetricsRegistry:
+    """Counters and fixed-bucket histograms for one process"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self._flusher_pid = None
+
+    def inc(self, name, labels, amount=1):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._observe(key, value, buckets)
+
+    def _observe(self, key, value, buckets):
+        histogram = self.histograms.get(key)
+        if histogram is None:
+            histogram = self.histograms[key] = [buckets, [0] * (len(buckets) + 1), 0.0, 0]
+        histogram[1][bisect_left(buckets, value)] += 1
+        histogram[2] += value
+        histogram[3] += 1
+
+    def observe_request(self, view, method, status_code, duration, request_size,
+                        response_size, queries):
+        """Record one request under a single lock acquisition"""
+        labels = (('view', view),)
+        request_key = ('freshmart_http_requests_total', (('method', method), ('status', str(status_code)), ('view', view)))
+        with self._lock:
+            self.counters[request_key] = self.counters.get(request_key, 0) + 1
+            self._observe(('freshmart_http_request_duration_seconds', labels), duration, LATENCY_BUCKETS)
+            self._observe(('freshmart_http_request_size_bytes', labels), request_size, SIZE_BUCKETS)
+            if response_size is not None:
+                self._observe(('freshmart_http_response_size_bytes', labels), response_size, SIZE_BUCKETS)
+            self._observe(('freshmart_db_queries_per_request', labels), queries.count, SQL_COUNT_BUCKETS)
+            self._observe(('freshmart_db_query_seconds_per_request', labels), queries.seconds, SQL_TIME_BUCKETS)
+        if self._flusher_pid != os.getpid():
+            self.ensure_flusher()
+
+    def snapshot(self):
+        """JSON-serialisable state of this process, collectors included"""
+        with self._lock:
+            counters = [[name, list(labels), value] for (name, labels), value in self.counters.items()]
+            histograms = [
+                [name, list(labels), list(buckets), list(counts), total, count]
+                for (name, labels), (buckets, counts, total, count) in self.histograms.items()
+            ]
+        gauges = []
+        for collector in _collectors:
+            for name, labels, value in collector():
+                kind = METRIC_HELP.get(name, ('gauge',))[0]
+                target = counters if kind == 'counter' else gauges
+                target.append([name, sorted(labels.items()), value])
+        return {
+            'pid': os.getpid(),
+            'written_at': time.time(),
+            'counters': counters,
+            'histograms': histograms,
+            'gauges': gauges,
+        }
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    # Multi-process support
+
+    @property
+    def directory(self):
+        location = getattr(settings, 'METRICS_DIR', None)
+        return Path(location) if location else None
+
+    def ensure_flusher(self):
+        """Start the flush thread once per process (again after a fork)"""
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+        if self.directory is not None:
+            threading.Thread(target=self._flush_forever, name='metrics-flush', daemon=True).start()
+
+    def _flush_forever(self):
+        interval = getattr(settings, 'METRICS_FLUSH_SECONDS', 5)
+        while True:
+            time.sleep(interval)
+            try:
+                self.flush()
+            except OSError as e:
+                logger.warning(f"Metrics flush failed: {e}")
+
+    def flush(self):
+        """Atomically write this process's snapshot to METRICS_DIR/<pid>.json"""
+        directory = self.directory
+        if directory is None:
+            return
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f'{os.getpid()}.json'
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self.snapshot()))
+        os.replace(tmp_path, path)
+
+    def collect_all(self):
+        """Snapshots of every live worker; this process's is taken fresh"""
+        snapshots = [self.snapshot()]
+        directory = self.directory
+        if directory is None or not directory.is_dir():
+            return snapshots
+        for path in directory.glob('*.json'):
+            try:
+                pid = int(path.stem)
+            except ValueError:
+                continue
+            if pid == os.getpid():
+                continue
+            if not _pid_alive(pid):
+                path.unlink(missing_ok=True)
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+registry = MetricsRegistry()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def render_prometheus(snapshots):
+    """Merge per-process snapshots into Prometheus text exposition format"""
+    counters = {}
+    histograms = {}
+    gauges = {}
+    for snap in snapshots:
+        for name, labels, value in snap['counters']:
+            key = (name, tuple(map(tuple, labels)))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, buckets, counts, total, count in snap['histograms']:
+            key = (name, tuple(map(tuple, labels)))
+            merged = histograms.get(key)
+            if merged is None or merged[0] != buckets:
+                histograms[key] = [buckets, list(counts), total, count]
+            else:
+                merged[1] = [a + b for a, b in zip(merged[1], counts)]
+                merged[2] += total
+                merged[3] += count
+        for name, labels, value in snap['gauges']:
+            # Gauges are per process; keep them apart with a pid label
+            gauges[(name, tuple(map(tuple, labels)) + (('pid', str(snap['pid'])),))] = value
+
+    lines = []
+    emitted = set()
+
+    def header(name):
+        if name not in emitted:
+            emitted.add(name)
+            kind, help_text = METRIC_HELP.get(name, ('untyped', name))
+            lines.append(f'# HELP {name} {help_text}')
+            lines.append(f'# TYPE {name} {kind}')
+
+    for (name, labels), value in sorted(counters.items()):
+        header(name)
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+    for (name, labels), (buckets, counts, total, count) in sorted(histograms.items()):
+        header(name)
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{_format_labels(labels + (("le", bound),))} {cumulative}')
+        lines.append(f'{name}_bucket{_format_labels(labels + (("le", "+Inf"),))} {count}')
+        lines.append(f'{name}_sum{_format_labels(labels)} {total}')
+        lines.append(f'{name}_count{_format_labels(labels)} {count}')
+    for (name, labels), value in sorted(gauges.items()):
+        header(name)
+        lines.append(f'{name}{_format_labels(labels)} {value}')
+    return '\n'.join(lines) + '\n'
+
+
+@register_collector
+def _collect_user_cache():
+    from freshmart_project.authentication import user_cache
+    return [
+        ('freshmart_auth_user_cache_hits_total', {}, user_cache.hits),
+        ('freshmart_auth_user_cache_misses_total', {}, user_cache.misses),
+    ]
+
+
+@register_collector
+def _collect_log_queue():
+    from freshmart_project.logging_config import log_queue_depth, queue_handlers
+    return [
+        ('freshmart_log_queue_depth', {}, log_queue_depth()),
+        ('freshmart_log_records_dropped_total', {}, sum(h.dropped for h in queue_handlers())),
+    ]
+
+
+@register_collector
+def _collect_catalog_cache():
+    from products.cache import lookup_counts
+    return [
+        sample
+        for kind, (hits, misses) in lookup_counts().items()
+        for sample in (
+            ('freshmart_catalog_cache_hits_total', {'kind': kind}, hits),
+            ('freshmart_catalog_cache_misses_total', {'kind': kind}, misses),
+        )
+    ]
+
+
+@register_collector
+def _collect_worker_queues():
+    from imaging import derivatives
+    from products import similarity
+    from recommendations import engine
+    from recommendations.events import event_buffer
+    clicks, impressions = event_buffer.pending()
+    return [
+        ('freshmart_worker_queue_depth', {'pool': 'image_variants'}, derivatives.queue_depth()),
+        ('freshmart_worker_queue_depth', {'pool': 'recommendations'}, engine.queue_depth()),
+        ('freshmart_worker_queue_depth', {'pool': 'similarity'}, similarity.queue_depth()),
+        ('freshmart_recommendation_events_buffered', {'kind': 'clicks'}, clicks),
+        ('freshmart_recommendation_events_buffered', {'kind': 'impressions'}, impressions),
+    ]
@@ -1,29 +1,218 @@
 """
 Enterprise-grade middleware for FreshMart API
 """
+import inspect
 import time
 import logging
+import random
 import uuid
+from contextlib import ExitStack
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
 from django.utils.deprecation import MiddlewareMixin
+from freshmart_project.db_router import begin_request, end_request
+from freshmart_project.metrics import QueryStats, registry
+from freshmart_project.profiling import QueryProfile
 
 api_logger = logging.getLogger('freshmart.api')
+sql_logger = logging.getLogger('freshmart.sql')
 security_logger = logging.getLogger('freshmart.security')
 
 
+def wrap_connections(stack, wrapper):
+    """Install `wrapper` on this thread's connections until `stack` closes"""
+    for conn in connections.all():
+        stack.enter_context(conn.execute_wrapper(wrapper))
+
+
+class AsyncCapableMiddleware:
+    """
+    Base for middleware that runs natively under both WSGI and ASGI, so
+    async views are not pushed onto a thread. Subclasses implement
+    `handle` and `ahandle`.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.is_async:
+            return self.ahandle(request)
+        return self.handle(request)
+
+
+class MetricsMiddleware(AsyncCapableMiddleware):
+    """
+    Records per-view latency, body sizes and SQL query count/time into the
+    metrics registry. Placed first in MIDDLEWARE so it times the full stack.
+    """
+    
+    def handle(self, request):
+        queries = QueryStats()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            wrap_connections(stack, queries)
+            response = self.get_response(request)
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+    
+    async def ahandle(self, request):
+        queries = QueryStats()
+        started = time.perf_counter()
+        # The async ORM runs queries on the request's thread-sensitive
+        # worker thread, which owns the connections to wrap
+        stack = ExitStack()
+        await sync_to_async(wrap_connections)(stack, queries)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        self.record(request, response, time.perf_counter() - started, queries)
+        return response
+    
+    def record(self, request, response, duration, queries):
+        match = request.resolver_match
+        view = (match.view_name or match.route) if match else 'unmatched'
+        try:
+            request_size = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            request_size = 0
+        response_size = None if response.streaming else len(response.content)
+        
+        registry.observe_request(
+            view, request.method, response.status_code, duration,
+            request_size, response_size, queries
+        )
+
+
+class DatabaseRoutingMiddleware(AsyncCapableMiddleware):
+    """
+    Gives each request fresh primary/replica routing state. Requests with
+    unsafe methods read from the primary throughout; others switch to it
+    after their first write.
+    """
+    
+    UNSAFE_METHODS = ('POST', 'PUT', 'PATCH', 'DELETE')
+    
+    def handle(self, request):
+        token = begin_request(pinned=request.method in self.UNSAFE_METHODS)
+        try:
+            return self.get_response(request)
+        finally:
+            end_request(token)
+    
+    async def ahandle(self, request):
+        token = begin_request(pinned=request.method in self.UNSAFE_METHODS)
+        try:
+            return await self.get_response(request)
+        finally:
+            end_request(token)
+
+
+class SQLProfilerMiddleware(AsyncCapableMiddleware):
+    """
+    Opt-in (SQL_PROFILER_ENABLED) per-request SQL profiler and N+1 detector
+
+    Logs a structured report to `freshmart.sql` when a request exceeds
+    SQL_PROFILER_MAX_QUERIES, SQL_PROFILER_MAX_TIME_MS, or repeats one query
+    shape SQL_PROFILER_DUPLICATE_THRESHOLD times. With
+    SQL_PROFILER_HEADERS (default: DEBUG) the totals are also returned in
+    X-DB-Queries / X-DB-Time.
+    """
+    
+    def __init__(self, get_response):
+        if not getattr(settings, 'SQL_PROFILER_ENABLED', False):
+            raise MiddlewareNotUsed()
+        super().__init__(get_response)
+        self.max_queries = getattr(settings, 'SQL_PROFILER_MAX_QUERIES', 20)
+        self.max_time_ms = getattr(settings, 'SQL_PROFILER_MAX_TIME_MS', 200)
+        self.duplicate_threshold = getattr(settings, 'SQL_PROFILER_DUPLICATE_THRESHOLD', 5)
+        self.add_headers = getattr(settings, 'SQL_PROFILER_HEADERS', settings.DEBUG)
+    
+    def new_profile(self):
+        # Skip our own frames and the metrics execute_wrapper when locating call sites
+        return QueryProfile(skip_files={__file__, inspect.getfile(QueryStats)})
+    
+    def handle(self, request):
+        profile = self.new_profile()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            wrap_connections(stack, profile)
+            response = self.get_response(request)
+        return self.report(request, response, time.perf_counter() - started, profile)
+    
+    async def ahandle(self, request):
+        profile = self.new_profile()
+        started = time.perf_counter()
+        stack = ExitStack()
+        await sync_to_async(wrap_connections)(stack, profile)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(stack.close)()
+        return self.report(request, response, time.perf_counter() - started, profile)
+    
+    def report(self, request, response, duration, profile):
+        duration_ms = round(duration * 1000, 2)
+        
+        if self.add_headers:
+            response['X-DB-Queries'] = str(profile.count)
+            response['X-DB-Time'] = f'{profile.time_ms:.2f}ms'
+        
+        duplicates = profile.duplicates(self.duplicate_threshold)
+        if duplicates or profile.count > self.max_queries or profile.time_ms > self.max_time_ms:
+            match = request.resolver_match
+            sql_logger.warning(
+                f"[{getattr(request, 'request_id', 'unknown')}] {request.method} {request.path} - "
+                f"{profile.count} queries in {profile.time_ms}ms, "
+                f"{len(duplicates)} repeated query shapes",
+                extra={
+                    'request_id': getattr(request, 'request_id', None),
+                    'method': request.method,
+                    'path': request.path,
+                    'view': match.view_name if match else None,
+                    'status': response.status_code,
+                    'duration_ms': duration_ms,
+                    'db_queries': profile.count,
+                    'db_time_ms': profile.time_ms,
+                    'duplicates': duplicates,
+                }
+            )
+        return response
+
+
 class RequestLoggingMiddleware(MiddlewareMixin):
     """
     Middleware to log all API requests with timing information
+
+    Successful requests are sampled at API_LOG_SAMPLE_RATE; error responses
+    and requests slower than API_LOG_SLOW_REQUEST_SECONDS are always logged.
     """
     
     def process_request(self, request):
         request.start_time = time.time()
         request.request_id = str(uuid.uuid4())[:8]
+        request.log_sampled = random.random() < getattr(settings, 'API_LOG_SAMPLE_RATE', 1.0)
         
         # Log incoming request
-        api_logger.info(
-            f"[{request.request_id}] {request.method} {request.path} - "
-            f"User: {request.user if hasattr(request, 'user') and request.user.is_authenticated else 'Anonymous'}"
-        )
+        if request.log_sampled:
+            user = request.user if hasattr(request, 'user') and request.user.is_authenticated else 'Anonymous'
+            api_logger.info(
+                f"[{request.request_id}] {request.method} {request.path} - User: {user}",
+                extra={
+                    'request_id': request.request_id,
+                    'method': request.method,
+                    'path': request.path,
+                    'user': str(user),
+                }
+            )
     
     def process_response(self, request, response):
         if hasattr(request, 'start_time'):
@@ -31,10 +220,20 @@ class RequestLoggingMiddleware(MiddlewareMixin):
             request_id = getattr(request, 'request_id', 'unknown')
             
             # Log response with timing
-            api_logger.info(
-                f"[{request_id}] {request.method} {request.path} - "
-                f"Status: {response.status_code} - Duration: {duration:.3f}s"
-            )
+            if (getattr(request, 'log_sampled', True)
+                    or response.status_code >= 400
+                    or duration >= getattr(settings, 'API_LOG_SLOW_REQUEST_SECONDS', 1.0)):
+                api_logger.info(
+                    f"[{request_id}] {request.method} {request.path} - "
+                    f"Status: {response.status_code} - Duration: {duration:.3f}s",
+                    extra={
+                        'request_id': request_id,
+                        'method': request.method,
+                        'path': request.path,
+                        'status': response.status_code,
+                        'duration_ms': round(duration * 1000, 2),
+                    }
+                )
             
             # Add request ID to response headers
             response['X-Request-ID'] = request_id
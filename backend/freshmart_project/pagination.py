@@ -0,0 +1,112 @@
+"""
+Pagination classes for FreshMart API
+"""
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination, _reverse_ordering
+
+
+class CreatedAtCursorPagination(CursorPagination):
+    """
+    Keyset pagination on (created_at, id), newest first.
+
+    Unlike PageNumberPagination this never runs COUNT(*) or OFFSET, so
+    every page costs the same regardless of how deep the client goes.
+
+    DRF's CursorPagination positions cursors on the first ordering field
+    alone and steps over ties with an offset, so `previous` links inside a
+    run of equal timestamps (bulk-created rows) come back empty. Here the
+    position is the (timestamp, id) pair, which is unique.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = ('-created_at', '-id')
+
+    def keyset(self):
+        """(field, tie-break field, descending) from `ordering`"""
+        field, tie_break = (order.lstrip('-') for order in self.ordering)
+        descending = self.ordering[0].startswith('-')
+        assert len(self.ordering) == 2 and self.ordering[1].startswith('-') == descending, (
+            f'{type(self).__name__}.ordering must be two fields in the same direction'
+        )
+        return field, tie_break, descending
+
+    def decode_cursor(self, request):
+        cursor = super().decode_cursor(request)
+        if cursor is not None and cursor.position is not None and '|' not in cursor.position:
+            # Cursors issued before positions carried the id
+            raise NotFound(self.invalid_cursor_message)
+        return cursor
+
+    def paginate_queryset(self, queryset, request, view=None):
+        # DRF's implementation with the position filter on both fields
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+
+        self.cursor = self.decode_cursor(request)
+        if self.cursor is None:
+            (offset, reverse, current_position) = (0, False, None)
+        else:
+            (offset, reverse, current_position) = self.cursor
+
+        if reverse:
+            queryset = queryset.order_by(*_reverse_ordering(self.ordering))
+        else:
+            queryset = queryset.order_by(*self.ordering)
+
+        if current_position is not None:
+            field, tie_break, descending = self.keyset()
+            value, pk = current_position.rsplit('|', 1)
+            lookup = 'lt' if reverse != descending else 'gt'
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value}) | Q(**{field: value, f'{tie_break}__{lookup}': pk})
+            )
+
+        # One extra row tells whether a following page exists
+        results = list(queryset[offset:offset + self.page_size + 1])
+        self.page = list(results[:self.page_size])
+
+        if len(results) > len(self.page):
+            has_following_position = True
+            following_position = self._get_position_from_instance(results[-1], self.ordering)
+        else:
+            has_following_position = False
+            following_position = None
+
+        if reverse:
+            self.page = list(reversed(self.page))
+            self.has_next = (current_position is not None) or (offset > 0)
+            self.has_previous = has_following_position
+            if self.has_next:
+                self.next_position = current_position
+            if self.has_previous:
+                self.previous_position = following_position
+        else:
+            self.has_next = has_following_position
+            self.has_previous = (current_position is not None) or (offset > 0)
+            if self.has_next:
+                self.next_position = following_position
+            if self.has_previous:
+                self.previous_position = current_position
+
+        if (self.has_previous or self.has_next) and self.template is not None:
+            self.display_page_controls = True
+
+        return self.page
+
+    def _get_position_from_instance(self, instance, ordering):
+        field, tie_break, _ = self.keyset()
+        if isinstance(instance, dict):
+            return f'{instance[field]}|{instance[tie_break]}'
+        return f'{getattr(instance, field)}|{getattr(instance, tie_break)}'
+
+
+class StartedAtCursorPagination(CreatedAtCursorPagination):
+    """Keyset pagination on (started_at, id) for kiosk sessions"""
+    ordering = ('-started_at', '-id')
@@ -3,6 +3,8 @@ Custom permissions for FreshMart API
 """
 from rest_framework import permissions
 
+from freshmart_project.authentication import METRICS_AUTH
+
 
 class IsOwnerOrAdmin(permissions.BasePermission):
     """
@@ -43,6 +45,16 @@ class IsAdminUser(permissions.BasePermission):
         return request.user and request.user.is_authenticated and request.user.is_staff
 
 
+class IsAdminOrMetricsScraper(permissions.BasePermission):
+    """
+    Allow admin users, and scrapers authenticated by MetricsTokenAuthentication.
+    """
+    def has_permission(self, request, view):
+        if request.auth == METRICS_AUTH:
+            return True
+        return request.user and request.user.is_authenticated and request.user.is_staff
+
+
 class IsAuthenticatedCustomer(permissions.BasePermission):
     """
     Custom permission to only allow authenticated customers (non-admin users).
@@ -0,0 +1,106 @@
+"""
+Per-request SQL profiling for FreshMart API
+
+`QueryProfile` is a connection.execute_wrapper that records every query's
+shape (SQL with IN-lists collapsed), duration and the first application
+frame that issued it. Repeated shapes within one request are the signature
+of an N+1 loop; `duplicates()` lists them with their call sites.
+"""
+import re
+import sys
+import sysconfig
+import time
+from pathlib import Path
+
+from django.conf import settings
+
+_IN_LIST = re.compile(r'IN \((?:%s, )*%s\)')
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+\b')
+
+# Frames from the stdlib and installed packages are skipped when looking for
+# a call site
+_LIBRARY_DIRS = tuple({
+    sysconfig.get_paths()[name] + '/'
+    for name in ('stdlib', 'platstdlib', 'purelib', 'platlib')
+})
+_THIS_FILE = __file__
+
+
+def query_shape(sql):
+    """Normalise SQL so queries differing only in literals/IN-list length match"""
+    return _NUMBER.sub('N', _STRING.sub('S', _IN_LIST.sub('IN (...)', sql)))
+
+
+def application_call_site(skip_files=()):
+    """'path:line in function' for the innermost frame outside Django/stdlib"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename != _THIS_FILE and filename not in skip_files
+                and not filename.startswith(_LIBRARY_DIRS) and not filename.startswith('<')):
+            try:
+                filename = str(Path(filename).relative_to(settings.BASE_DIR))
+            except ValueError:
+                pass
+            return f'{filename}:{frame.f_lineno} in {frame.f_code.co_name}'
+        frame = frame.f_back
+    return 'unknown'
+
+
+class QueryProfile:
+    """Per-request query recorder; pass to connection.execute_wrapper"""
+
+    MAX_CALL_SITES = 3
+
+    def __init__(self, skip_files=()):
+        self.count = 0
+        self.seconds = 0.0
+        self.shapes = {}
+        self.skip_files = frozenset(skip_files)
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.count += 1
+            self.seconds += elapsed
+            entry = self.shapes.get(sql)
+            if entry is None:
+                entry = self.shapes[sql] = [0, 0.0, []]
+            entry[0] += 1
+            entry[1] += elapsed
+            if len(entry[2]) < self.MAX_CALL_SITES:
+                site = application_call_site(self.skip_files)
+                if site not in entry[2]:
+                    entry[2].append(site)
+
+    def duplicates(self, min_count):
+        """Query shapes executed at least `min_count` times, worst first"""
+        merged = {}
+        for sql, (count, seconds, sites) in self.shapes.items():
+            shape = query_shape(sql)
+            entry = merged.setdefault(shape, [0, 0.0, []])
+            entry[0] += count
+            entry[1] += seconds
+            entry[2].extend(s for s in sites if s not in entry[2])
+        return sorted(
+            (
+                {
+                    'sql': shape,
+                    'count': count,
+                    'time_ms': round(seconds * 1000, 2),
+                    'call_sites': sites[:self.MAX_CALL_SITES],
+                }
+                for shape, (count, seconds, sites) in merged.items()
+                if count >= min_count
+            ),
+            key=lambda d: (d['count'], d['time_ms']),
+            reverse=True,
+        )
+
+    @property
+    def time_ms(self):
+        return round(self.seconds * 1000, 2)
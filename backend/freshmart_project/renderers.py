@@ -0,0 +1,117 @@
+"""
+JSON renderer for FreshMart API
+
+FastJSONRenderer writes the same bytes as DRF's JSONRenderer with the
+default settings (compact separators, UTF-8, decimals as floats, ISO 8601
+datetimes with a `Z` suffix), using orjson when it is installed. orjson
+encodes str/int/float/bool/list/dict/UUID natively and hands everything else
+(Decimal, datetime, lazy strings, querysets) to DRF's JSONEncoder.default,
+so the conversions are DRF's own.
+
+Output that orjson cannot reproduce falls back to the DRF renderer:
+indented output, non-default UNICODE_JSON/COMPACT_JSON, dict keys that are
+not strings, integers beyond 64 bits and non-finite floats (orjson writes
+null, DRF raises or writes NaN depending on STRICT_JSON). Floats that Python
+writes in exponent form (below 1e-4 or from 1e16) are rewritten to Python's
+repr.
+"""
+import datetime
+import math
+import re
+import uuid
+from decimal import Decimal
+
+from django.utils.functional import Promise
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+# Numbers that orjson and repr() format differently contain an exponent or
+# start 0.0000. The regex starts with a literal so the scan stays fast; text
+# inside strings that matches only costs the full rewrite below.
+_EXPONENT = re.compile(rb'e-?[0-9]')
+_TOKEN = re.compile(rb'"(?:[^"\\]|\\.)*"|-?[0-9]+(?:\.[0-9]+)?(?:e-?[0-9]+)?')
+
+
+def _python_float(match):
+    token = match.group(0)
+    if token[0] == 0x22 or (b'e' not in token and b'0.0000' not in token):
+        return token
+    return repr(float(token)).encode()
+
+
+_SCALARS = frozenset((str, int, bool, type(None)))
+# Values JSONEncoder.default turns into something other than a number
+_NON_NUMERIC = (str, int, datetime.date, datetime.time, datetime.timedelta, uuid.UUID, Promise)
+
+
+def _unusual_floats(data):
+    """
+    (fall back, exponent form): whether `data` holds a number that orjson
+    writes as null (NaN, infinity) or a value only the DRF encoder can vouch
+    for, and whether a float or Decimal has an exponent form in repr()
+    """
+    exponent = False
+    stack = [data]
+    while stack:
+        value = stack.pop()
+        kind = type(value)
+        if kind in _SCALARS:
+            continue
+        if kind is dict or kind is not list and isinstance(value, dict):
+            stack.extend(value.values())
+        elif kind is list or isinstance(value, (list, tuple)):
+            stack.extend(value)
+        elif kind is float or isinstance(value, float):
+            if not math.isfinite(value):
+                return True, exponent
+            exponent = exponent or (value != 0 and not 1e-4 <= abs(value) < 1e16)
+        elif kind is Decimal:
+            # Encoded as float(value); the bounds err towards the rewrite
+            if not value.is_finite():
+                return True, exponent
+            exponent = exponent or (value != 0 and not -4 <= value.adjusted() < 15)
+        elif not isinstance(value, _NON_NUMERIC):
+            return True, exponent
+    return False, exponent
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer that encodes with orjson when available"""
+    _default = JSONEncoder().default
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None or data is None
+            or self.encoder_class is not JSONEncoder
+            or not api_settings.UNICODE_JSON or not api_settings.COMPACT_JSON
+            or self.get_indent(accepted_media_type, renderer_context or {})
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+        try:
+            ret = orjson.dumps(
+                data,
+                default=self._default,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS,
+            )
+        except TypeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if b'null' in ret:
+            # orjson writes NaN and infinities as null; the walk that finds
+            # them also settles the exponent check
+            fall_back, exponent = _unusual_floats(data)
+            if fall_back:
+                return super().render(data, accepted_media_type, renderer_context)
+        else:
+            exponent = b'0.0000' in ret or _EXPONENT.search(ret)
+        if exponent:
+            ret = _TOKEN.sub(_python_float, ret)
+        # Same escaping as JSONRenderer: U+2028/U+2029 are not valid in JavaScript strings
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
@@ -0,0 +1,79 @@
+"""
+Local read-replica stand-in for FreshMart
+
+In development and single-host deployments the `replica` alias points at a
+SQLite file that is refreshed from the primary with SQLite's online backup
+API. Readers of the replica always see a complete, consistent snapshot, as
+old as the last sync.
+
+Syncing is not started by the web workers: run `manage.py sync_replica
+--interval N` once per host (or `sync_replica` from a scheduler). Each copy
+holds an exclusive lock on `<replica>.lock`, so overlapping runs skip
+instead of copying into the same file at once.
+"""
+import os
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows
+    fcntl = None
+    import msvcrt
+
+
+def is_local_replica():
+    """True when the replica alias is a SQLite file separate from the primary"""
+    alias = getattr(settings, 'REPLICA_DATABASE_ALIAS', None)
+    replica = settings.DATABASES.get(alias) if alias else None
+    primary = settings.DATABASES[DEFAULT_DB_ALIAS]
+    return (
+        replica is not None
+        and 'sqlite' in replica['ENGINE'] and 'sqlite' in primary['ENGINE']
+        and str(replica['NAME']) != str(primary['NAME'])
+    )
+
+
+@contextmanager
+def _exclusive_lock(path):
+    """Yields True while holding a non-blocking exclusive lock on `path`, False if another process holds it"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        except OSError:
+            yield False
+            return
+        yield True
+    finally:
+        # Closing the descriptor releases the lock
+        os.close(fd)
+
+
+def sync_sqlite_replica(source=None, target=None):
+    """
+    Copy the primary database into the replica file. Returns the number of
+    seconds the copy took, or None if another process is copying.
+    """
+    alias = settings.REPLICA_DATABASE_ALIAS
+    source = str(source or settings.DATABASES[DEFAULT_DB_ALIAS]['NAME'])
+    target = str(target or settings.DATABASES[alias]['NAME'])
+    with _exclusive_lock(f'{target}.lock') as locked:
+        if not locked:
+            return None
+        started = time.perf_counter()
+        src = sqlite3.connect(source, timeout=30)
+        dst = sqlite3.connect(target, timeout=30)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+        return time.perf_counter() - started
@@ -53,9 +53,13 @@ INSTALLED_APPS = [
     'purchases',
     'kiosk',
     'packages',
+    'benchmarks',
+    'imaging',
 ]
 
 MIDDLEWARE = [
+    'freshmart_project.middleware.MetricsMiddleware',
+    'freshmart_project.middleware.DatabaseRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -67,6 +71,7 @@ MIDDLEWARE = [
     
     # Custom enterprise middleware
     'freshmart_project.middleware.RequestLoggingMiddleware',
+    'freshmart_project.middleware.SQLProfilerMiddleware',
     'freshmart_project.middleware.SecurityHeadersMiddleware',
     'freshmart_project.middleware.AuthenticationLoggingMiddleware',
     'freshmart_project.middleware.APIVersionMiddleware',
@@ -127,17 +132,49 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'freshmart_project.wsgi.application'
 
+# Overrides settings that would make tests depend on background threads or
+# state outside the test database (see freshmart_project.test_runner)
+TEST_RUNNER = 'freshmart_project.test_runner.FreshMartTestRunner'
+
 
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# freshmart_project.sqlite is django.db.backends.sqlite3 plus tuned PRAGMAs
+# (WAL, busy_timeout, mmap, ...) and BEGIN IMMEDIATE transactions; see
+# freshmart_project/sqlite/base.py. Connections persist for CONN_MAX_AGE.
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'freshmart_project.sqlite',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'PRAGMAS': {
+            'busy_timeout': 5000,
+        },
+    },
+    # Read replica for catalog and analytics reads (see db_router). Locally
+    # this is a SQLite copy of the primary refreshed by `manage.py sync_replica`;
+    # under the test runner it mirrors the test database.
+    'replica': {
+        'ENGINE': 'freshmart_project.sqlite',
+        'NAME': BASE_DIR / 'db.replica.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'PRAGMAS': {
+            'query_only': 'ON',
+        },
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+DATABASE_ROUTERS = ['freshmart_project.db_router.ReplicaRouter']
+REPLICA_DATABASE_ALIAS = 'replica'
+# Apps whose reads go to the replica during requests (until the request writes)
+REPLICA_CATALOG_APPS = ('products', 'packages')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -180,6 +217,53 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads get content-hashed names so media URLs can be cached as immutable
+STORAGES = {
+    'default': {'BACKEND': 'freshmart_project.media.HashedFileSystemStorage'},
+    'staticfiles': {'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage'},
+}
+
+# Media serving (freshmart_project.media.MediaView). Files without a content
+# hash in their name are revalidated after MEDIA_CACHE_MAX_AGE seconds.
+# MEDIA_SENDFILE hands the transfer to the front-end server:
+#   'x-accel-redirect' - nginx, with an `internal` location aliased to
+#                        MEDIA_ROOT at MEDIA_ACCEL_REDIRECT_LOCATION
+#   'x-sendfile'       - Apache mod_xsendfile / lighttpd
+MEDIA_CACHE_MAX_AGE = 3600
+MEDIA_SENDFILE = None
+MEDIA_ACCEL_REDIRECT_LOCATION = '/protected-media/'
+
+# Image derivatives (imaging app): downscaled WebP + JPEG/PNG copies of
+# uploaded images, rendered by a background worker pool
+IMAGE_VARIANT_WIDTHS = (100, 300, 600)
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_WORKERS = 2
+
+# Recommendations: popular-product lists per customer segment served to
+# customers without personalized rows (recommendations.cold_start), and the
+# worker pool that generates personalized rows in the background
+RECOMMENDATION_COLD_START_SIZE = 10
+RECOMMENDATION_COLD_START_TIMEOUT = 6 * 60 * 60
+RECOMMENDATION_WORKERS = 2
+
+# How recommendations are stored (recommendations.storage): 'rows', one row
+# per (customer, product), or 'packed', one ordered list per customer
+RECOMMENDATION_STORAGE = 'rows'
+
+# Recommendation clicks and impressions are buffered per process and written
+# in batches (recommendations.events): every RECOMMENDATION_EVENT_FLUSH_SECONDS
+# (0 writes each event at once) or when this many clicks are waiting. A batch
+# that fails to write is retried with backoff, and dropped after this many
+# failed flushes in a row
+RECOMMENDATION_EVENT_FLUSH_SECONDS = 2
+RECOMMENDATION_EVENT_BUFFER_SIZE = 500
+RECOMMENDATION_EVENT_FLUSH_ATTEMPTS = 5
+
+# Recommendation table retention (compact_recommendations): active rows kept
+# per customer, and how long inactive rows without clicks are kept
+RECOMMENDATION_MAX_ACTIVE = 10
+RECOMMENDATION_RETENTION_DAYS = 30
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -189,7 +273,7 @@ AUTH_USER_MODEL = 'accounts.Customer'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'freshmart_project.authentication.CachedJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
@@ -197,8 +281,8 @@ REST_FRAMEWORK = {
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 20,
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'freshmart_project.throttling.SharedAnonRateThrottle',
+        'freshmart_project.throttling.SharedUserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
@@ -206,11 +290,36 @@ REST_FRAMEWORK = {
         'login': '5/minute',
     },
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'freshmart_project.renderers.FastJSONRenderer',
     ],
     'EXCEPTION_HANDLER': 'freshmart_project.exceptions.custom_exception_handler',
 }
 
+# Lifetime of cached catalog payloads (products.cache). Catalog writes bump
+# the catalog version immediately; the timeout bounds staleness in other
+# processes when the cache is not shared.
+CATALOG_CACHE_TIMEOUT = 60
+
+# How often a process checks the promotions version (one aggregate query)
+# for promotion edits made by other processes (products.pricing). Edits in
+# the same process apply immediately; checkout always checks.
+PRICING_VERSION_CHECK_SECONDS = 1
+
+# Run a background thread per process that refreshes prices and bumps the
+# catalog version whenever a promotion starts or ends (products.scheduler)
+PROMOTION_SCHEDULER_ENABLED = True
+
+# Neighbors precomputed per product for "similar products" and the
+# recommendation engine (products.similarity)
+SIMILAR_PRODUCTS_COUNT = 10
+
+# Throttle state shared by all worker processes on the host (sliding-window
+# counters, kept out of the application database)
+THROTTLE_STORE = {
+    'BACKEND': 'freshmart_project.throttling.SQLiteThrottleStore',
+    'LOCATION': BASE_DIR / 'throttle.sqlite3',
+}
+
 # JWT Settings - Enhanced Security
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
@@ -229,6 +338,11 @@ SIMPLE_JWT = {
     'JTI_CLAIM': 'jti',
 }
 
+# Authenticated-user cache used by CachedJWTAuthentication (per process).
+# Other workers see profile changes/deactivation after at most the TTL.
+AUTH_USER_CACHE_TTL_SECONDS = 30
+AUTH_USER_CACHE_MAX_ENTRIES = 10000
+
 # Security Settings
 SECURE_CONTENT_TYPE_NOSNIFF = True
 SECURE_BROWSER_XSS_FILTER = True
@@ -242,8 +356,45 @@ SESSION_COOKIE_SAMESITE = 'Lax'
 # API Version
 API_VERSION = '1.0.0'
 
-# Import logging configuration
+# Readiness probe
+READINESS_MIGRATION_REFRESH_SECONDS = 300  # Re-check applied migrations at most this often
+READINESS_MIGRATION_RETRY_SECONDS = 5  # Retry a failed migration check after this long
+READINESS_CHECK_TIMEOUT_SECONDS = 2  # Budget for all checks, which run concurrently
+READINESS_MIN_FREE_DISK_BYTES = 100 * 1024 * 1024
+
+# /api/system/info/ statistics are served from a snapshot refreshed in the
+# background once it is this old (seconds; the response reports the real age)
+SYSTEM_INFO_REFRESH_SECONDS = 60
+# A failed refresh is retried after this long, doubling up to the interval
+SYSTEM_INFO_RETRY_SECONDS = 5
+
+# Import logging configuration. LOG_QUEUE_ENABLED moves handlers behind a
+# low-priority queue listener thread so request threads never write logs
 from freshmart_project.logging_config import LOGGING
+LOGGING_CONFIG = 'freshmart_project.logging_config.configure_logging'
+LOG_QUEUE_ENABLED = True
+
+# Fraction of successful (< 400, not slow) requests logged by
+# RequestLoggingMiddleware; errors and slow requests are always logged
+API_LOG_SAMPLE_RATE = 1.0
+API_LOG_SLOW_REQUEST_SECONDS = 1.0
+
+# Metrics (/metrics/): each worker writes its counters to METRICS_DIR every
+# METRICS_FLUSH_SECONDS so a scrape of any worker covers all of them.
+# Set METRICS_DIR to None for single-process, in-memory only metrics.
+METRICS_DIR = BASE_DIR / 'metrics'
+METRICS_FLUSH_SECONDS = 5
+# /metrics/ is admin only; scrapers may send "Authorization: Bearer <token>"
+# with this token instead (None disables token access)
+METRICS_TOKEN = None
+
+# SQL profiler / N+1 detector (SQLProfilerMiddleware). Off unless enabled;
+# reports go to logs/api.log via the freshmart.sql logger
+SQL_PROFILER_ENABLED = False
+SQL_PROFILER_MAX_QUERIES = 20
+SQL_PROFILER_MAX_TIME_MS = 200
+SQL_PROFILER_DUPLICATE_THRESHOLD = 5
+SQL_PROFILER_HEADERS = DEBUG
 
 # Data validation settings
 DATA_UPLOAD_MAX_MEMORY_SIZE = 5242880  # 5MB
@@ -0,0 +1,41 @@
+"""
+SQLite backend with a production connection profile for FreshMart
+
+Use as ENGINE 'freshmart_project.sqlite'. Every new connection applies the
+PRAGMAs from DATABASES[alias]['PRAGMAS'] (merged over DEFAULT_PRAGMAS), and
+atomic blocks start with BEGIN IMMEDIATE (DATABASES[alias]['TRANSACTION_MODE'])
+so concurrent writers queue on busy_timeout instead of failing with
+"database is locked" when a read lock cannot be upgraded.
+"""
+from django.db.backends.sqlite3 import base
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',          # readers never block the writer and vice versa
+    'synchronous': 'NORMAL',        # durable at checkpoints; safe with WAL
+    'busy_timeout': 5000,           # ms to wait for a lock before SQLITE_BUSY
+    'mmap_size': 268435456,         # 256 MiB memory-mapped reads
+    'cache_size': -65536,           # 64 MiB page cache (negative = KiB)
+    'temp_store': 'MEMORY',
+}
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """django.db.backends.sqlite3 with PRAGMAs on connect and IMMEDIATE transactions"""
+
+    @property
+    def pragmas(self):
+        return {**DEFAULT_PRAGMAS, **self.settings_dict.get('PRAGMAS', {})}
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            if value is not None:
+                conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        mode = self.settings_dict.get('TRANSACTION_MODE', 'IMMEDIATE')
+        if mode:
+            self.cursor().execute(f'BEGIN {mode}')
+        else:
+            super()._start_transaction_under_autocommit()
@@ -0,0 +1,29 @@
+"""
+Test runner for FreshMart
+
+Django's DiscoverRunner with TEST_SETTINGS applied for the whole run, so
+tests never depend on process-wide background threads or on state kept
+outside the test database.
+"""
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+TEST_SETTINGS = {
+    # Write recommendation clicks and impressions at once, inside the test
+    'RECOMMENDATION_EVENT_FLUSH_SECONDS': 0,
+    # Keep throttle counters in memory, away from the host's shared file
+    'THROTTLE_STORE': {'BACKEND': 'freshmart_project.throttling.LocMemThrottleStore'},
+}
+
+
+class FreshMartTestRunner(DiscoverRunner):
+    """DiscoverRunner with TEST_SETTINGS"""
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._test_settings = override_settings(**TEST_SETTINGS)
+        self._test_settings.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._test_settings.disable()
+        super().teardown_test_environment(**kwargs)
@@ -0,0 +1,707 @@
+import base64
+import hashlib
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from unittest import mock, skipUnless
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.files.base import ContentFile
+from django.db import connection, connections, router
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from accounts.models import Customer
+from kiosk.models import KioskInteraction, KioskSession
+from products.cache import get_or_build
+from products.models import Brand, Category, Product, ProductReview
+from products.serializers import ProductListRowSerializer, ProductListSerializer
+from purchases.models import Purchase, PurchaseItem
+from purchases.serializers import PurchaseRowSerializer, PurchaseSerializer
+from . import db_router, logging_config
+from .health import MigrationState, StatisticsSnapshot
+from .media import HashedFileSystemStorage
+from .middleware import DatabaseRoutingMiddleware, SQLProfilerMiddleware
+from .profiling import query_shape
+from .renderers import FastJSONRenderer
+from .replica import _exclusive_lock, sync_sqlite_replica
+from .throttling import LocMemThrottleStore, SQLiteThrottleStore, get_throttle_store
+
+
+class ThrottleStoreTests(SimpleTestCase):
+    """Throttle store selection and the SQLite store's transactions"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = Path(directory.name) / 'throttle.sqlite3'
+
+    def test_tests_use_in_memory_store(self):
+        self.assertIsInstance(get_throttle_store(), LocMemThrottleStore)
+
+    def test_store_follows_override_settings(self):
+        default = get_throttle_store()
+        with override_settings(THROTTLE_STORE={
+            'BACKEND': 'freshmart_project.throttling.SQLiteThrottleStore',
+            'LOCATION': self.location,
+        }):
+            store = get_throttle_store()
+            self.assertIsInstance(store, SQLiteThrottleStore)
+            self.assertEqual(store.location, str(self.location))
+        self.assertIsNot(get_throttle_store(), default)
+        self.assertIsInstance(get_throttle_store(), LocMemThrottleStore)
+
+    def test_sqlite_store_limits_hits(self):
+        store = SQLiteThrottleStore(self.location)
+        self.assertEqual(store.hit('key', 2, 60, now=600), (True, 0))
+        self.assertEqual(store.hit('key', 2, 60, now=601), (True, 0))
+        allowed, wait = store.hit('key', 2, 60, now=602)
+        self.assertFalse(allowed)
+        self.assertEqual(wait, 58)
+
+    def test_failed_begin_raises_its_own_error(self):
+        store = SQLiteThrottleStore(self.location)
+        # Give up on the lock at once instead of after the 5s timeout
+        store._local.conn = sqlite3.connect(str(self.location), timeout=0, isolation_level=None)
+        other = sqlite3.connect(str(self.location), isolation_level=None)
+        self.addCleanup(other.close)
+        other.execute('BEGIN IMMEDIATE')
+        with self.assertRaisesRegex(sqlite3.OperationalError, 'locked'):
+            store.hit('key', 2, 60)
+        other.execute('ROLLBACK')
+        self.assertEqual(store.hit('key', 2, 60, now=600), (True, 0))
+
+
+@override_settings(READINESS_MIGRATION_REFRESH_SECONDS=300, READINESS_MIGRATION_RETRY_SECONDS=5)
+class MigrationStateTests(TestCase):
+    """Readiness migration checks are cached after success and retried soon after failure"""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('freshmart_project.health.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.state = MigrationState()
+
+    def test_success_is_cached_for_refresh_interval(self):
+        self.assertTrue(self.state.get())
+        with mock.patch.object(self.state, 'refresh') as refresh:
+            self.now += 299
+            self.assertTrue(self.state.get())
+            refresh.assert_not_called()
+            self.now += 1
+            self.state.get()
+            refresh.assert_called_once()
+
+    def test_failure_is_retried_after_backoff(self):
+        with mock.patch('django.db.migrations.executor.MigrationExecutor', side_effect=RuntimeError('down')):
+            self.assertFalse(self.state.get())
+        self.assertEqual(self.state.checked_at, 0.0)
+
+        self.now += 4
+        with mock.patch.object(self.state, 'refresh') as refresh:
+            self.assertFalse(self.state.get())
+            refresh.assert_not_called()
+
+        self.now += 1
+        self.assertTrue(self.state.get())
+        self.assertEqual(self.state.checked_at, self.now)
+
+
+@override_settings(METRICS_DIR=None, METRICS_TOKEN='scrape-secret')
+class MetricsViewTests(TestCase):
+    """/metrics/ is limited to admins and the scrape token, and exports cache and queue metrics"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def login(self, is_staff):
+        user = Customer.objects.create_user(username='metrics', email='metrics@example.com',
+                                            password='password123', is_staff=is_staff)
+        self.client.force_authenticate(user)
+
+    def test_anonymous_is_rejected(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 401)
+
+    def test_wrong_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer not-the-token')
+        self.assertEqual(self.client.get('/metrics/').status_code, 401)
+
+    def test_customer_is_forbidden(self):
+        self.login(is_staff=False)
+        self.assertEqual(self.client.get('/metrics/').status_code, 403)
+
+    def test_admin_is_allowed(self):
+        self.login(is_staff=True)
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)
+
+    def test_token_exports_cache_and_queue_metrics(self):
+        get_or_build(('metrics-test',), lambda: {'built': True})
+        get_or_build(('metrics-test',), lambda: {'built': True})
+        self.client.credentials(HTTP_AUTHORIZATION='Bearer scrape-secret')
+        response = self.client.get('/metrics/')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('freshmart_catalog_cache_hits_total{kind="metrics-test"} 1', body)
+        self.assertIn('freshmart_catalog_cache_misses_total{kind="metrics-test"} 1', body)
+        for pool in ('image_variants', 'recommendations', 'similarity'):
+            self.assertIn(f'freshmart_worker_queue_depth{{pool="{pool}",pid=', body)
+        self.assertIn('freshmart_recommendation_events_buffered{kind="clicks",pid=', body)
+
+
+class LogQueueTests(SimpleTestCase):
+    """Logging is queued by default and starts its listener in the process that logs"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = Path(directory.name) / 'test.log'
+        self.addCleanup(logging_config.configure_logging, settings.LOGGING)
+        self.config = {
+            'version': 1,
+            'disable_existing_loggers': False,
+            'handlers': {'file': {'class': 'logging.FileHandler', 'filename': str(self.path)}},
+            'loggers': {'freshmart.logqueue': {'handlers': ['file'], 'level': 'INFO', 'propagate': False}},
+        }
+        self.logger = logging.getLogger('freshmart.logqueue')
+
+    def lines(self):
+        return self.path.read_text().splitlines()
+
+    def test_queued_by_default(self):
+        logging_config.configure_logging(self.config)
+        self.assertEqual(len(logging_config.queue_handlers()), 1)
+        self.logger.info('queued')
+        logging_config.stop_log_listener()
+        self.assertEqual(self.lines(), ['queued'])
+
+    @override_settings(LOG_QUEUE_ENABLED=False)
+    def test_synchronous_when_disabled(self):
+        logging_config.configure_logging(self.config)
+        self.assertEqual(logging_config.queue_handlers(), [])
+        self.logger.info('direct')
+        self.assertEqual(self.lines(), ['direct'])
+
+    def test_listener_starts_on_first_record(self):
+        logging_config.configure_logging(self.config, queued=True)
+        self.assertIsNone(logging_config._listener)
+        self.logger.info('queued')
+        self.assertEqual(logging_config._listener_pid, os.getpid())
+        logging_config.stop_log_listener()
+        self.assertEqual(self.lines(), ['queued'])
+
+    @skipUnless(sys.platform.startswith('linux'), 'per-thread priority is Linux only')
+    def test_listener_runs_at_lower_priority(self):
+        logging_config.configure_logging(self.config, queued=True)
+        self.logger.info('queued')
+        # The listener lowers its priority before it handles any record
+        deadline = time.monotonic() + 5
+        while not self.lines() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        thread = logging_config._listener._thread
+        self.assertEqual(os.getpriority(os.PRIO_PROCESS, thread.native_id),
+                         min(os.nice(0) + logging_config.LOG_LISTENER_NICE, 19))
+        self.assertEqual(os.getpriority(os.PRIO_PROCESS, threading.get_native_id()), os.nice(0))
+        logging_config.stop_log_listener()
+
+    def test_forked_process_starts_its_own_listener(self):
+        logging_config.configure_logging(self.config, queued=True)
+        self.logger.info('parent')
+        pid = os.fork()
+        if pid == 0:
+            try:
+                self.logger.info('child')
+                logging_config.stop_log_listener()
+            finally:
+                os._exit(0)
+        os.waitpid(pid, 0)
+        logging_config.stop_log_listener()
+        self.assertEqual(sorted(self.lines()), ['child', 'parent'])
+
+
+@override_settings(SYSTEM_INFO_REFRESH_SECONDS=60, SYSTEM_INFO_RETRY_SECONDS=5)
+class StatisticsSnapshotTests(SimpleTestCase):
+    """System statistics report their real age and back off after failures"""
+
+    def setUp(self):
+        self.now = 1000.0
+        patcher = mock.patch('freshmart_project.health.time.monotonic', side_effect=lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.snapshot = StatisticsSnapshot()
+
+    def slow_compute(self):
+        self.now += 2.5
+        return {'total_customers': 1}
+
+    def test_max_age_includes_refresh_time(self):
+        with mock.patch.object(self.snapshot, 'compute', side_effect=self.slow_compute):
+            self.assertEqual(self.snapshot.get(), {'total_customers': 1})
+        self.assertEqual(self.snapshot.max_age, 62.5)
+        self.assertEqual(self.snapshot.age, 2.5)
+        self.now += 30
+        self.assertEqual(self.snapshot.age, 32.5)
+
+    def test_failures_back_off(self):
+        compute = mock.Mock(side_effect=RuntimeError('database is locked'))
+        with mock.patch.object(self.snapshot, 'compute', compute):
+            self.assertIsNone(self.snapshot.get())
+            self.assertIsNone(self.snapshot.get())
+            self.assertEqual(compute.call_count, 1)
+
+            self.now += 5
+            self.snapshot.get()
+            self.assertEqual(compute.call_count, 2)
+            # Doubled: not again for 10s
+            self.now += 9
+            self.snapshot.get()
+            self.assertEqual(compute.call_count, 2)
+            self.now += 1
+            self.snapshot.get()
+            self.assertEqual(compute.call_count, 3)
+
+        with mock.patch.object(self.snapshot, 'compute', side_effect=self.slow_compute):
+            self.now += 20
+            self.assertEqual(self.snapshot.get(), {'total_customers': 1})
+        self.assertEqual(self.snapshot.failures, 0)
+
+    def test_background_refresh_not_retried_before_backoff(self):
+        with mock.patch.object(self.snapshot, 'compute', side_effect=self.slow_compute):
+            self.snapshot.get()
+        self.now += 60
+        with mock.patch.object(self.snapshot, 'compute', side_effect=RuntimeError('down')), \
+                mock.patch.object(self.snapshot, 'refresh_async', side_effect=self.snapshot.refresh) as refresh:
+            self.assertEqual(self.snapshot.get(), {'total_customers': 1})
+            self.assertEqual(self.snapshot.get(), {'total_customers': 1})
+            self.assertEqual(refresh.call_count, 1)
+
+
+class FastJSONRendererTests(SimpleTestCase):
+    """FastJSONRenderer writes what JSONRenderer writes, errors included"""
+
+    def assertSameOutput(self, data):
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_floats_match_repr(self):
+        data = {
+            'values': [0.0, -0.0, 0.5, 0.0001, 0.00001, 1.5e-7, -2.5e-12, 123456.789, 1e15, 1e16, -3e300],
+            'decimals': [Decimal('0.00001'), Decimal('1E+20'), Decimal('2.50')],
+            'text': 'size 1e-5, not a number',
+        }
+        self.assertSameOutput(data)
+        # With a null in the output the values are checked on the data instead
+        self.assertSameOutput({**data, 'missing': None})
+
+    def test_exponent_inside_strings_only(self):
+        self.assertSameOutput({'code': 'e-5', 'name': 'lime 0.00001', 'price': 0.5})
+        self.assertSameOutput({'code': 'e-5', 'name': 'lime 0.00001', 'price': 0.5, 'image': None})
+
+    def test_non_finite_floats_raise_like_json_renderer(self):
+        for value in (float('nan'), float('inf'), -float('inf'), Decimal('NaN')):
+            with self.subTest(value=value):
+                data = {'results': [{'rating': value, 'image': None}]}
+                with self.assertRaises(ValueError):
+                    JSONRenderer().render(data)
+                with self.assertRaises(ValueError):
+                    FastJSONRenderer().render(data)
+
+    def test_non_finite_floats_without_strict_json(self):
+        renderer = FastJSONRenderer()
+        renderer.strict = False
+        data = {'rating': float('nan'), 'image': None}
+        self.assertEqual(renderer.render(data), b'{"rating":NaN,"image":null}')
+
+
+class RowSerializerTests(TestCase):
+    """Row serializers return what their DRF serializers return"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Dairy')
+        brand = Brand.objects.create(name='Farm')
+        self.products = [
+            Product.objects.create(name='Milk', description='', category=category, brand=brand,
+                                   price=Decimal('1.20'), stock_quantity=5,
+                                   image_url='https://example.com/milk.png'),
+            Product.objects.create(name='Cheese', description='', category=category,
+                                   price=Decimal('4.00'), stock_quantity=0),
+        ]
+        customer = Customer.objects.create_user(username='shopper', email='shopper@example.com',
+                                                password='password123')
+        purchase = Purchase.objects.create(customer=customer, total_amount=Decimal('6.40'), status='completed')
+        for product in self.products:
+            PurchaseItem.objects.create(purchase=purchase, product=product, quantity=2,
+                                        price_at_purchase=product.price)
+        self.context = {'request': Request(RequestFactory().get('/api/'))}
+
+    def assertSameData(self, row_serializer_class, serializer_class, queryset):
+        row_serializer = row_serializer_class(self.context)
+        rows = row_serializer.serialize(row_serializer.rows(queryset))
+        expected = serializer_class(queryset, many=True, context=self.context).data
+        self.assertEqual(JSONRenderer().render(rows), JSONRenderer().render(expected))
+
+    def test_products_with_and_without_brand_and_image(self):
+        self.assertSameData(ProductListRowSerializer, ProductListSerializer, Product.objects.order_by('pk'))
+
+    def test_purchases_with_items(self):
+        self.assertSameData(PurchaseRowSerializer, PurchaseSerializer, Purchase.objects.order_by('pk'))
+
+
+class ReplicaRoutingTests(SimpleTestCase):
+    """Catalog reads use the replica only inside requests that have not written"""
+
+    def setUp(self):
+        # Start outside any request, whatever earlier tests left in this context
+        token = db_router._state.set(None)
+        self.addCleanup(db_router._state.reset, token)
+        patcher = mock.patch('freshmart_project.db_router.replica_alias', return_value='replica')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def request(self, method='get', write=False):
+        """Send one request through DatabaseRoutingMiddleware; returns the read aliases it saw"""
+        seen = []
+
+        def view(request):
+            seen.append(router.db_for_read(Product))
+            if write:
+                router.db_for_write(Product)
+                seen.append(router.db_for_read(Product))
+            return HttpResponse()
+
+        DatabaseRoutingMiddleware(view)(getattr(RequestFactory(), method)('/api/products/'))
+        return seen
+
+    def test_catalog_reads_use_replica(self):
+        self.assertEqual(self.request(), ['replica'])
+
+    def test_other_apps_read_primary(self):
+        token = db_router.begin_request()
+        self.addCleanup(db_router.end_request, token)
+        self.assertEqual(router.db_for_read(Customer), 'default')
+        with db_router.read_from_replica():
+            self.assertEqual(router.db_for_read(Customer), 'replica')
+
+    def test_first_write_pins_request_to_primary(self):
+        self.assertEqual(self.request(write=True), ['replica', 'default'])
+
+    def test_unsafe_methods_read_primary(self):
+        self.assertEqual(self.request(method='post'), ['default'])
+
+    def test_state_resets_between_requests(self):
+        self.request(write=True)
+        self.assertEqual(self.request(), ['replica'])
+        self.assertIsNone(db_router._state.get())
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(router.db_for_read(Product), 'default')
+        with db_router.read_from_replica():
+            self.assertEqual(router.db_for_read(Product), 'replica')
+        self.assertEqual(router.db_for_read(Product), 'default')
+
+
+class ReplicaAliasTests(SimpleTestCase):
+    """replica_alias() falls back to the primary until the replica is usable"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.primary = Path(directory.name) / 'primary.sqlite3'
+        self.replica = Path(directory.name) / 'replica.sqlite3'
+        files = {
+            'default': mock.Mock(settings_dict={'ENGINE': 'freshmart_project.sqlite', 'NAME': str(self.primary)}),
+            'replica': mock.Mock(settings_dict={'ENGINE': 'freshmart_project.sqlite', 'NAME': str(self.replica)}),
+        }
+        for patcher in (
+            mock.patch.object(db_router, 'connections', files),
+            mock.patch.object(db_router, '_replica_seen', False),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_mirrored_replica_under_test_runner(self):
+        with mock.patch.object(db_router, 'connections', connections):
+            self.assertIsNone(db_router.replica_alias())
+
+    def test_missing_or_empty_replica_file(self):
+        self.assertIsNone(db_router.replica_alias())
+        self.replica.touch()
+        self.assertIsNone(db_router.replica_alias())
+
+    def test_synced_replica(self):
+        with sqlite3.connect(self.primary) as conn:
+            conn.execute('CREATE TABLE item (name TEXT)')
+            conn.execute("INSERT INTO item VALUES ('milk')")
+        conn.close()
+        self.assertIsNotNone(sync_sqlite_replica(self.primary, self.replica))
+        self.assertEqual(db_router.replica_alias(), 'replica')
+        conn = sqlite3.connect(self.replica)
+        self.addCleanup(conn.close)
+        self.assertEqual(conn.execute('SELECT name FROM item').fetchall(), [('milk',)])
+
+    def test_sync_skipped_while_another_process_copies(self):
+        with _exclusive_lock(f'{self.replica}.lock') as locked:
+            self.assertTrue(locked)
+            self.assertIsNone(sync_sqlite_replica(self.primary, self.replica))
+        self.assertIsNotNone(sync_sqlite_replica(self.primary, self.replica))
+
+
+class MediaViewTests(SimpleTestCase):
+    """Media files are served with cache validators, ranges and offload headers"""
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.root = Path(directory.name) / 'media'
+        (self.root / 'products').mkdir(parents=True)
+        (Path(directory.name) / 'secret.txt').write_text('secret')
+        self.storage = HashedFileSystemStorage(location=self.root)
+        self.content = bytes(range(256)) * 4
+        self.name = self.storage.save('products/apple.png', ContentFile(self.content))
+        override = override_settings(MEDIA_ROOT=str(self.root))
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def get(self, path=None, **headers):
+        return self.client.get(f'/media/{path or self.name}', headers=headers)
+
+    def test_saved_files_get_content_hashed_names(self):
+        digest = hashlib.sha256(self.content).hexdigest()[:12]
+        self.assertEqual(self.name, f'products/apple.{digest}.png')
+        # Same bytes, same file
+        self.assertEqual(self.storage.save('products/apple.png', ContentFile(self.content)), self.name)
+        self.assertEqual(len(os.listdir(self.root / 'products')), 1)
+        other = self.storage.save('products/apple.png', ContentFile(b'new image'))
+        self.assertNotEqual(other, self.name)
+
+    def test_hashed_file_is_immutable(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), self.content)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['ETag'], f'"{os.path.basename(self.name)}"')
+        self.assertEqual(response['Content-Type'], 'image/png')
+
+    def test_unhashed_file_is_revalidated(self):
+        (self.root / 'legacy.png').write_bytes(b'old')
+        response = self.get('legacy.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('must-revalidate', response['Cache-Control'])
+
+    def test_matching_etag_is_not_modified(self):
+        etag = self.get()['ETag']
+        response = self.get(If_None_Match=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(self.get(If_None_Match='"other"').status_code, 200)
+
+    def test_byte_range(self):
+        response = self.get(Range='bytes=10-19')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], f'bytes 10-19/{len(self.content)}')
+        self.assertEqual(b''.join(response.streaming_content), self.content[10:20])
+
+        response = self.get(Range='bytes=-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), self.content[-4:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(Range=f'bytes={len(self.content)}-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f'bytes */{len(self.content)}')
+
+    @override_settings(MEDIA_SENDFILE='x-accel-redirect', MEDIA_ACCEL_REDIRECT_LOCATION='/protected-media/')
+    def test_accel_redirect(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], f'/protected-media/{self.name}')
+        self.assertEqual(response.content, b'')
+        self.assertIn('immutable', response['Cache-Control'])
+
+    @override_settings(MEDIA_SENDFILE='x-sendfile')
+    def test_sendfile(self):
+        response = self.get()
+        self.assertEqual(response['X-Sendfile'], str(self.root / self.name))
+        self.assertEqual(response.content, b'')
+
+    def test_path_traversal_rejected(self):
+        for path in ('../secret.txt', '..%2fsecret.txt', 'products/../../secret.txt', str(self.root.parent / 'secret.txt')):
+            with self.subTest(path=path):
+                # safe_join raises SuspiciousFileOperation, as for django.views.static.serve
+                response = self.get(path)
+                self.assertEqual(response.status_code, 400)
+                self.assertNotIn(b'secret', response.content)
+
+    def test_missing_file_and_directory(self):
+        self.assertEqual(self.get('products/missing.png').status_code, 404)
+        self.assertEqual(self.get('products').status_code, 404)
+
+
+class CursorPaginationTests(TestCase):
+    """Cursor-paginated lists return every row once at a constant query count per page"""
+
+    def setUp(self):
+        cache.clear()
+        # Every row shares one timestamp: only the id tie-break orders them
+        self.timestamp = timezone.now()
+        self.admin = Customer.objects.create_user(username='admin', email='admin@example.com',
+                                                  password='password123', is_staff=True)
+        self.customer = Customer.objects.create_user(username='shopper', email='shopper@example.com',
+                                                     password='password123')
+        category = Category.objects.create(name='Pantry')
+        for index in range(7):
+            product = Product.objects.create(name=f'Rice {index}', description='', category=category,
+                                             price=Decimal('2.00'), stock_quantity=10)
+            ProductReview.objects.create(product=product, customer=self.customer, rating=4)
+            purchase = Purchase.objects.create(customer=self.customer, total_amount=Decimal('4.00'),
+                                               status='completed')
+            PurchaseItem.objects.create(purchase=purchase, product=product, quantity=2,
+                                        price_at_purchase=Decimal('2.00'))
+            session = KioskSession.objects.create(session_id=f'kiosk-{index}', customer=self.customer)
+            KioskInteraction.objects.create(session=session, interaction_type='product_view',
+                                            product_id=product.pk)
+            Customer.objects.create_user(username=f'customer{index}', email=f'customer{index}@example.com',
+                                         password='password123')
+        for model in (Product, Purchase, Customer):
+            model.objects.update(created_at=self.timestamp)
+        KioskSession.objects.update(started_at=self.timestamp)
+        self.client = APIClient()
+
+    def walk(self, path, user, page_size=3):
+        """Follow `next` from the first page; returns the ids in page order"""
+        self.client.force_authenticate(user)
+        url = f'{path}?page_size={page_size}'
+        # Warm the per-process caches so the first page costs what the others do
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as first_page:
+            response = self.client.get(url)
+        ids = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            body = response.json()
+            self.assertNotIn('count', body)
+            self.assertLessEqual(len(body['results']), page_size)
+            ids.extend(row['id'] for row in body['results'])
+            if not body['next']:
+                return ids
+            with self.assertNumQueries(len(first_page)):
+                response = self.client.get(body['next'])
+
+    def assertWalks(self, path, user, queryset):
+        expected = list(queryset.order_by('-pk').values_list('pk', flat=True))
+        self.assertEqual(self.walk(path, user), expected)
+
+    def test_customer_purchases(self):
+        self.assertWalks('/api/purchases/', self.customer, Purchase.objects.filter(customer=self.customer))
+
+    def test_admin_purchases(self):
+        self.assertWalks('/api/purchases/admin/all/', self.admin, Purchase.objects.all())
+
+    def test_admin_customers(self):
+        self.assertWalks('/api/accounts/admin/customers/', self.admin, Customer.objects.all())
+
+    def test_admin_products(self):
+        self.assertWalks('/api/products/admin/all/', self.admin, Product.objects.all())
+
+    def test_admin_kiosk_sessions(self):
+        self.assertWalks('/api/kiosk/admin/sessions/', self.admin, KioskSession.objects.all())
+
+    def test_previous_links_walk_back(self):
+        # Two runs of equal timestamps, so pages cross from one to the other
+        Purchase.objects.filter(pk__in=Purchase.objects.order_by('pk').values('pk')[:4]).update(
+            created_at=self.timestamp - timedelta(hours=1)
+        )
+        self.client.force_authenticate(self.admin)
+        pages = [self.client.get('/api/purchases/admin/all/?page_size=2').json()]
+        self.assertIsNone(pages[0]['previous'])
+        while pages[-1]['next']:
+            pages.append(self.client.get(pages[-1]['next']).json())
+        self.assertEqual([row['id'] for page in pages for row in page['results']],
+                         list(Purchase.objects.order_by('-created_at', '-pk').values_list('pk', flat=True)))
+
+        page = pages[-1]
+        for expected in reversed(pages[:-1]):
+            page = self.client.get(page['previous']).json()
+            self.assertEqual([row['id'] for row in page['results']], [row['id'] for row in expected['results']])
+        self.assertIsNone(page['previous'])
+
+    def test_cursor_without_id_is_invalid(self):
+        self.client.force_authenticate(self.admin)
+        cursor = base64.b64encode(f'p={self.timestamp}'.encode()).decode()
+        response = self.client.get('/api/purchases/admin/all/', {'cursor': cursor})
+        self.assertEqual(response.status_code, 404)
+
+
+class SQLProfilerTests(TestCase):
+    """The SQL profiler reports query totals and repeated query shapes when enabled"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Dairy')
+        self.products = [
+            Product.objects.create(name=f'Milk {index}', description='', category=category,
+                                   price=Decimal('1.00'), stock_quantity=5)
+            for index in range(6)
+        ]
+
+    def n_plus_one_view(self, request):
+        for product in self.products:
+            Product.objects.get(pk=product.pk)
+        return HttpResponse()
+
+    def profile(self, **settings):
+        with override_settings(SQL_PROFILER_ENABLED=True, SQL_PROFILER_HEADERS=True, **settings):
+            middleware = SQLProfilerMiddleware(self.n_plus_one_view)
+        return middleware(RequestFactory().get('/api/products/'))
+
+    def test_inactive_unless_enabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            SQLProfilerMiddleware(self.n_plus_one_view)
+        response = self.client.get('/api/products/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('X-DB-Queries', response)
+
+    def test_headers(self):
+        with self.assertLogs('freshmart.sql', 'WARNING'):
+            response = self.profile()
+        self.assertEqual(response['X-DB-Queries'], '6')
+        self.assertRegex(response['X-DB-Time'], r'^\d+\.\d{2}ms$')
+
+    def test_query_shape_normalises_literals(self):
+        self.assertEqual(
+            query_shape('SELECT * FROM "product" WHERE "id" IN (%s, %s, %s) AND "stock" > 10 LIMIT 21'),
+            'SELECT * FROM "product" WHERE "id" IN (...) AND "stock" > N LIMIT N',
+        )
+        self.assertEqual(
+            query_shape("SELECT 1 FROM \"brand\" WHERE \"name\" = 'Farm''s' AND \"id\" IN (%s)"),
+            'SELECT N FROM "brand" WHERE "name" = S AND "id" IN (...)',
+        )
+        self.assertEqual(query_shape('SELECT "t1"."id" FROM "t1"'), 'SELECT "t1"."id" FROM "t1"')
+
+    def test_repeated_shape_reported_with_call_site(self):
+        with self.assertLogs('freshmart.sql', 'WARNING') as logs:
+            self.profile(SQL_PROFILER_DUPLICATE_THRESHOLD=5)
+        [record] = logs.records
+        [duplicate] = record.duplicates
+        self.assertEqual(duplicate['count'], 6)
+        self.assertIn('FROM "products_product"', duplicate['sql'])
+        self.assertEqual(len(duplicate['call_sites']), 1)
+        self.assertRegex(duplicate['call_sites'][0], r'^freshmart_project/tests\.py:\d+ in n_plus_one_view$')
+
+    def test_below_thresholds_not_reported(self):
+        with self.assertNoLogs('freshmart.sql', 'WARNING'):
+            response = self.profile(SQL_PROFILER_DUPLICATE_THRESHOLD=7)
+        self.assertEqual(response['X-DB-Queries'], '6')
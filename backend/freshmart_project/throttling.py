@@ -0,0 +1,204 @@
+"""
+Shared sliding-window throttling for FreshMart API
+
+DRF's SimpleRateThrottle keeps a list of request timestamps per client in the
+default cache. With no shared cache configured every worker process has its
+own locmem copy, and each check is O(n) in the history length.
+
+The throttles here keep two fixed-window counters per key (current and
+previous window) in a store shared by all workers on the host, and estimate
+the sliding-window rate as:
+
+    previous * (1 - elapsed / duration) + current
+
+Each check is a single-row read and write, i.e. O(1).
+"""
+import random
+import sqlite3
+import threading
+import time
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.throttling import AnonRateThrottle, UserRateThrottle
+
+
+class SlidingWindowStore:
+    """Base class for throttle stores"""
+
+    def hit(self, key, limit, duration, now=None):
+        """
+        Record a request for `key` if it fits under `limit` per `duration`.
+
+        Returns (allowed, wait_seconds).
+        """
+        raise NotImplementedError
+
+    @staticmethod
+    def evaluate(state, limit, duration, now):
+        """
+        Apply one request to a (window_start, current, previous) state.
+
+        Returns (allowed, wait_seconds, new_state).
+        """
+        window_start = int(now // duration) * duration
+        if state is None:
+            current, previous = 0, 0
+        else:
+            stored_start, current, previous = state
+            if stored_start == window_start:
+                pass
+            elif stored_start == window_start - duration:
+                current, previous = 0, current
+            else:
+                current, previous = 0, 0
+
+        elapsed = now - window_start
+        estimate = previous * (1 - elapsed / duration) + current
+
+        if estimate + 1 > limit:
+            remaining = duration - elapsed
+            if previous and current + 1 <= limit:
+                wait = min(remaining, (estimate + 1 - limit) * duration / previous)
+            else:
+                wait = remaining
+            return False, wait, None
+
+        return True, 0, (window_start, current + 1, previous)
+
+
+class LocMemThrottleStore(SlidingWindowStore):
+    """Per-process store; only suitable for development and tests"""
+
+    def __init__(self, location=None):
+        self._lock = threading.Lock()
+        self._state = {}
+
+    def hit(self, key, limit, duration, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            allowed, wait, state = self.evaluate(self._state.get(key), limit, duration, now)
+            if allowed:
+                self._state[key] = state
+        return allowed, wait
+
+    def clear(self):
+        with self._lock:
+            self._state.clear()
+
+
+class SQLiteThrottleStore(SlidingWindowStore):
+    """
+    Store backed by a standalone SQLite file, shared by every worker process
+    on the host. It never touches the application database.
+    """
+    PURGE_PROBABILITY = 0.001
+
+    def __init__(self, location):
+        self.location = str(location)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_window ('
+                ' key TEXT PRIMARY KEY,'
+                ' window_start INTEGER NOT NULL,'
+                ' current INTEGER NOT NULL,'
+                ' previous INTEGER NOT NULL,'
+                ' expires_at REAL NOT NULL'
+                ') WITHOUT ROWID'
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.location, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def hit(self, key, limit, duration, now=None):
+        now = time.time() if now is None else now
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                'SELECT window_start, current, previous FROM throttle_window WHERE key = ?',
+                (key,)
+            ).fetchone()
+            allowed, wait, state = self.evaluate(row, limit, duration, now)
+            if allowed:
+                window_start, current, previous = state
+                conn.execute(
+                    'INSERT OR REPLACE INTO throttle_window VALUES (?, ?, ?, ?, ?)',
+                    (key, window_start, current, previous, window_start + 2 * duration)
+                )
+            if random.random() < self.PURGE_PROBABILITY:
+                conn.execute('DELETE FROM throttle_window WHERE expires_at < ?', (now,))
+            conn.execute('COMMIT')
+        except Exception:
+            # Only roll back a transaction that is still open: a failed
+            # COMMIT or statement may already have ended it, and a second
+            # error here would hide the first
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+            raise
+        return allowed, wait
+
+    def clear(self):
+        self._connect().execute('DELETE FROM throttle_window')
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_throttle_store():
+    """Return the process-wide store configured by settings.THROTTLE_STORE"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                config = getattr(settings, 'THROTTLE_STORE', {})
+                backend = import_string(config.get(
+                    'BACKEND', 'freshmart_project.throttling.LocMemThrottleStore'
+                ))
+                _store = backend(config.get('LOCATION'))
+    return _store
+
+
+@receiver(setting_changed)
+def reset_throttle_store(setting, **kwargs):
+    """Pick up THROTTLE_STORE changes made by override_settings"""
+    global _store
+    if setting == 'THROTTLE_STORE':
+        with _store_lock:
+            _store = None
+
+
+class SlidingWindowThrottleMixin:
+    """Replaces SimpleRateThrottle's cache history with the shared store"""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self._wait = get_throttle_store().hit(self.key, self.num_requests, self.duration)
+        return allowed
+
+    def wait(self):
+        return self._wait
+
+
+class SharedAnonRateThrottle(SlidingWindowThrottleMixin, AnonRateThrottle):
+    """AnonRateThrottle with shared sliding-window state"""
+
+
+class SharedUserRateThrottle(SlidingWindowThrottleMixin, UserRateThrottle):
+    """UserRateThrottle with shared sliding-window state"""
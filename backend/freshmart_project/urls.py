@@ -15,11 +15,12 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from rest_framework_simplejwt.views import TokenRefreshView
-from freshmart_project.health import HealthCheckView, ReadinessCheckView, LivenessCheckView, SystemInfoView
+from freshmart_project.health import HealthCheckView, ReadinessCheckView, LivenessCheckView, SystemInfoView, MetricsView
+from freshmart_project.media import MediaView
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -28,6 +29,7 @@ urlpatterns = [
     path('health/', HealthCheckView.as_view(), name='health-check'),
     path('ready/', ReadinessCheckView.as_view(), name='readiness-check'),
     path('live/', LivenessCheckView.as_view(), name='liveness-check'),
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('api/system/info/', SystemInfoView.as_view(), name='system-info'),
     
     # API endpoints
@@ -38,12 +40,18 @@ urlpatterns = [
     path('api/kiosk/', include('kiosk.urls')),
     path('api/packages/', include('packages.urls')),
     
+    # Async-native read endpoints (same responses; serve these under ASGI)
+    path('api/async/products/', include('products.async_urls')),
+    path('api/async/kiosk/', include('kiosk.async_urls')),
+    
     # JWT token refresh
     path('api/token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    
+    # Uploaded media (cache headers, ranges, X-Accel-Redirect; see freshmart_project.media)
+    re_path(r'^%s(?P<path>.+)$' % settings.MEDIA_URL.lstrip('/'), MediaView.as_view(), name='media'),
 ]
 
-# Serve media files in development
+# Serve static files in development
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
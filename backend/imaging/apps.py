@@ -0,0 +1,8 @@
+from django.apps import AppConfig
+
+
+class ImagingConfig(AppConfig):
+    name = 'imaging'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,168 @@
+"""
+Image derivatives for FreshMart
+
+Uploaded images are stored at full size. For every registered image field
+a background worker renders downscaled copies (IMAGE_VARIANT_WIDTHS) as
+WebP plus a JPEG fallback (PNG when the source has transparency) and
+records them in the model's `*_variants` JSON field:
+
+    {'source': 'products/apple.jpg', 'sha256': '...', 'width': 1600,
+     'formats': {'webp': {'100': 'derivatives/ab/ab12.../100w.webp', ...},
+                 'jpeg': {'100': 'derivatives/ab/ab12.../100w.jpeg', ...}}}
+
+Derivatives are stored by the SHA-256 of the source bytes, so the same
+picture uploaded for several products is only rendered once.
+"""
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.apps import apps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connections, router, transaction
+from PIL import Image, ImageOps
+
+from .signals import variants_generated
+
+logger = logging.getLogger('freshmart')
+
+# (model, image field, variants field)
+VARIANT_FIELDS = (
+    ('products.Product', 'image', 'image_variants'),
+    ('products.Category', 'image', 'image_variants'),
+    ('products.Brand', 'logo', 'logo_variants'),
+    ('accounts.Customer', 'profile_picture', 'profile_picture_variants'),
+)
+
+DERIVATIVE_DIR = 'derivatives'
+
+
+def variant_fields():
+    """{model class: (image field, variants field)} for VARIANT_FIELDS"""
+    return {
+        apps.get_model(label): (source_field, variants_field)
+        for label, source_field, variants_field in VARIANT_FIELDS
+    }
+
+
+def source_digest(field_file):
+    digest = hashlib.sha256()
+    field_file.open('rb')
+    try:
+        for chunk in field_file.chunks():
+            digest.update(chunk)
+    finally:
+        field_file.close()
+    return digest.hexdigest()
+
+
+def derivative_name(digest, width, fmt):
+    return f'{DERIVATIVE_DIR}/{digest[:2]}/{digest}/{width}w.{fmt}'
+
+
+def variant_widths(source_width):
+    """Configured widths below the source width; never upscales"""
+    widths = [w for w in settings.IMAGE_VARIANT_WIDTHS if w < source_width]
+    return widths or [source_width]
+
+
+def render_variant(image, width, fmt):
+    """Encode `image` scaled to `width` pixels wide as `fmt`"""
+    height = max(1, round(image.height * width / image.width))
+    resized = image.resize((width, height), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    buffer = BytesIO()
+    quality = settings.IMAGE_VARIANT_QUALITY
+    if fmt == 'webp':
+        resized.save(buffer, 'WEBP', quality=quality, method=4)
+    elif fmt == 'jpeg':
+        resized.convert('RGB').save(buffer, 'JPEG', quality=quality, optimize=True, progressive=True)
+    else:
+        resized.save(buffer, 'PNG', optimize=True)
+    return buffer.getvalue()
+
+
+def generate_variants(field_file, overwrite=False):
+    """Render and store all derivatives of `field_file`; returns the variants map"""
+    storage = default_storage
+    digest = source_digest(field_file)
+    field_file.open('rb')
+    try:
+        with Image.open(field_file) as original:
+            image = ImageOps.exif_transpose(original)
+            has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+    finally:
+        field_file.close()
+
+    formats = {'webp': {}, 'png' if has_alpha else 'jpeg': {}}
+    for width in variant_widths(image.width):
+        for fmt, names in formats.items():
+            name = derivative_name(digest, width, fmt)
+            if overwrite and storage.exists(name):
+                storage.delete(name)
+            if not storage.exists(name):
+                storage.save(name, ContentFile(render_variant(image, width, fmt)))
+            names[str(width)] = name
+    return {'source': field_file.name, 'sha256': digest, 'width': image.width, 'formats': formats}
+
+
+def process(model, pk, overwrite=False):
+    """
+    Generate variants for one row and save them, unless the image changed
+    again meanwhile. Returns True when variants were saved.
+    """
+    source_field, variants_field = variant_fields()[model]
+    # Always the primary: the row was just written, and a worker thread has
+    # no request routing state to pin reads to it
+    rows = model._default_manager.using(router.db_for_write(model))
+    try:
+        instance = rows.only(source_field).filter(pk=pk).first()
+        field_file = getattr(instance, source_field, None)
+        if not field_file:
+            return False
+        variants = generate_variants(field_file, overwrite=overwrite)
+        saved = rows.filter(
+            pk=pk, **{source_field: field_file.name}
+        ).update(**{variants_field: variants})
+        if saved:
+            variants_generated.send(sender=model, pk=pk, field=source_field, variants=variants)
+        return bool(saved)
+    except Exception:
+        logger.exception(f"Image variants failed for {model._meta.label} {pk}")
+        return False
+
+
+def process_in_worker(model, pk, overwrite=False):
+    try:
+        return process(model, pk, overwrite=overwrite)
+    finally:
+        # Worker threads outlive the job; do not leave connections open
+        connections.close_all()
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANT_WORKERS, thread_name_prefix='image-variants'
+            )
+    return _executor
+
+
+def queue_depth():
+    """Jobs waiting for a worker"""
+    return _executor._work_queue.qsize() if _executor is not None else 0
+
+
+def schedule(model, pk):
+    """Generate variants in the worker pool once the current transaction commits"""
+    transaction.on_commit(lambda: executor().submit(process_in_worker, model, pk))
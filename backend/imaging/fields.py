@@ -0,0 +1,28 @@
+"""
+Serializer fields for image derivatives
+"""
+from django.core.files.storage import default_storage
+from rest_framework import serializers
+
+
+def variant_urls(variants, request=None):
+    """
+    srcset-style map of a variants field: {'webp': {'100w': url, ...}, ...}.
+    Empty until the derivatives have been generated.
+    """
+    if not variants:
+        return {}
+    urls = {}
+    for fmt, names in variants['formats'].items():
+        urls[fmt] = {}
+        for width, name in names.items():
+            url = default_storage.url(name)
+            urls[fmt][f'{width}w'] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+class ImageVariantsField(serializers.ReadOnlyField):
+    """Read-only srcset map of a `*_variants` JSON field"""
+
+    def to_representation(self, value):
+        return variant_urls(value, self.context.get('request'))
@@ -0,0 +1,51 @@
+"""
+Management command to generate image derivatives for existing media
+Usage: python manage.py backfill_image_variants [--model products.Product] [--force] [--workers 4]
+"""
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from imaging.derivatives import VARIANT_FIELDS, process, process_in_worker, variant_fields
+
+
+class Command(BaseCommand):
+    help = 'Render missing or stale WebP/JPEG derivatives for all registered image fields'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--model', action='append', choices=[label for label, _, _ in VARIANT_FIELDS],
+            help='Only this model (repeatable; default: all)'
+        )
+        parser.add_argument('--force', action='store_true', help='Re-render derivatives that are up to date')
+        parser.add_argument('--workers', type=int, default=settings.IMAGE_VARIANT_WORKERS)
+
+    def handle(self, *args, **options):
+        labels = options['model']
+        workers = options['workers']
+        if workers > 1:
+            pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='image-backfill')
+            run, map_jobs = process_in_worker, pool.map
+        else:
+            pool = nullcontext()
+            run, map_jobs = process, map
+
+        with pool:
+            for model, (source_field, variants_field) in variant_fields().items():
+                if labels and model._meta.label not in labels:
+                    continue
+                rows = model._default_manager.exclude(**{source_field: ''}).exclude(
+                    **{f'{source_field}__isnull': True}
+                ).values_list('pk', source_field, variants_field)
+                pks = [
+                    pk for pk, name, variants in rows.iterator()
+                    if options['force'] or (variants or {}).get('source') != name
+                ]
+                results = list(map_jobs(lambda pk: run(model, pk, overwrite=options['force']), pks))
+                self.stdout.write(
+                    f"{model._meta.label}.{source_field}: {sum(results)} generated, "
+                    f"{len(results) - sum(results)} failed"
+                )
+        self.stdout.write(self.style.SUCCESS('Image variants backfilled'))
@@ -0,0 +1,41 @@
+"""
+Signal handlers for the imaging app
+"""
+from django.db.models.signals import post_save
+from django.dispatch import Signal
+
+# Sent after a row's variants field is updated (by queryset.update(), so
+# post_save does not fire): sender=model, pk, field, variants
+variants_generated = Signal()
+
+
+def schedule_image_variants(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Queue derivatives when an image is uploaded or replaced; drop stale ones"""
+    from .derivatives import schedule, variant_fields
+
+    source_field, variants_field = variant_fields()[sender]
+    if raw or (update_fields is not None and source_field not in update_fields):
+        return
+    name = getattr(instance, source_field).name or ''
+    variants = getattr(instance, variants_field) or {}
+    if variants.get('source', '') == name:
+        return
+
+    if variants:
+        # Never serve derivatives of the previous image
+        sender._default_manager.filter(pk=instance.pk).update(**{variants_field: {}})
+        setattr(instance, variants_field, {})
+    if name:
+        schedule(sender, instance.pk)
+
+
+def connect_variant_fields():
+    from .derivatives import variant_fields
+
+    for model in variant_fields():
+        post_save.connect(
+            schedule_image_variants, sender=model, dispatch_uid=f'image-variants-{model._meta.label}'
+        )
+
+
+connect_variant_fields()
@@ -0,0 +1,42 @@
+import shutil
+import tempfile
+from decimal import Decimal
+from io import BytesIO
+from unittest import mock
+
+from django.core.files.base import ContentFile
+from django.db import router
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from products.models import Category, Product
+from .derivatives import process
+
+
+class VariantGenerationTests(TestCase):
+    """Variant workers read the row they render from the primary"""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root, IMAGE_VARIANT_WIDTHS=[100])
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        buffer = BytesIO()
+        Image.new('RGB', (300, 200), 'orange').save(buffer, 'JPEG')
+        self.product = Product.objects.create(
+            name='Orange', description='', category=Category.objects.create(name='Fruit'),
+            price=Decimal('1.00'), stock_quantity=5,
+        )
+        self.product.image.save('orange.jpg', ContentFile(buffer.getvalue()))
+
+    def test_reads_source_from_primary(self):
+        # A just-created row may not have reached the replica yet
+        with mock.patch.object(router, 'db_for_read', side_effect=AssertionError('read routed to the replica')):
+            self.assertTrue(process(Product, self.product.pk))
+
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_variants['source'], self.product.image.name)
+        self.assertEqual(sorted(self.product.image_variants['formats']), ['jpeg', 'webp'])
+        self.assertIn('100', self.product.image_variants['formats']['webp'])
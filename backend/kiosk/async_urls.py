@@ -0,0 +1,13 @@
+from django.urls import path
+from .async_views import (
+    AsyncKioskProductSearchView, AsyncKioskProductDetailView,
+    AsyncKioskProductLocationView
+)
+
+app_name = 'kiosk-async'
+
+urlpatterns = [
+    path('<str:session_id>/search/', AsyncKioskProductSearchView.as_view(), name='product-search'),
+    path('<str:session_id>/products/<int:product_id>/', AsyncKioskProductDetailView.as_view(), name='product-detail'),
+    path('<str:session_id>/products/<int:product_id>/location/', AsyncKioskProductLocationView.as_view(), name='product-location'),
+]
@@ -0,0 +1,128 @@
+"""
+Async kiosk read endpoints (served under ASGI at /api/async/kiosk/)
+
+Responses match the synchronous views in kiosk.views. The session check,
+product lookup and interaction tracking each await the async ORM, so a
+kiosk burst holds no worker threads while it waits on the database.
+"""
+from datetime import timedelta
+
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+
+from freshmart_project.async_views import AsyncAPIView, json_response
+from products.models import Product
+from products.pricing import price_index
+from products.serializers import ProductListSerializer, ProductSerializer
+from .models import KioskInteraction, KioskSession
+from .views import KioskRateThrottle
+
+
+def product_not_found():
+    return json_response(
+        {'success': False, 'error': 'Product not found'},
+        status=status.HTTP_404_NOT_FOUND
+    )
+
+
+class AsyncKioskView(AsyncAPIView):
+    """Base for kiosk endpoints - Valid session required"""
+    throttle_classes = [KioskRateThrottle]
+
+    async def get_session(self, session_id):
+        """The active session, as checked by kiosk.views.HasValidKioskSession"""
+        session = await KioskSession.objects.filter(
+            session_id=session_id,
+            ended_at__isnull=True,
+            started_at__gte=timezone.now() - timedelta(minutes=30),
+        ).afirst()
+        if session is None:
+            self.permission_denied(self.request)
+        return session
+
+
+class AsyncKioskProductSearchView(AsyncKioskView):
+    """Search products from kiosk - Valid session required"""
+
+    async def get(self, request, session_id):
+        session = await self.get_session(session_id)
+        search_query = request.GET.get('q', '').strip()
+
+        if not search_query or len(search_query) < 2:
+            return json_response(
+                {'success': False, 'error': 'Search query must be at least 2 characters'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        products = Product.objects.filter(
+            Q(name__icontains=search_query)
+            | Q(category__name__icontains=search_query)
+            | Q(brand__name__icontains=search_query),
+            is_active=True,
+        ).select_related('category', 'brand').prefetch_related('reviews').distinct()[:20]
+        products = [product async for product in products]
+
+        await KioskInteraction.objects.acreate(
+            session=session,
+            interaction_type='product_search',
+            search_query=search_query
+        )
+
+        context = {'request': request, 'prices': await price_index.asnapshot()}
+        return json_response({
+            'success': True,
+            'products': ProductListSerializer(products, many=True, context=context).data
+        })
+
+
+class AsyncKioskProductDetailView(AsyncKioskView):
+    """Get product details from kiosk - Valid session required"""
+
+    async def get(self, request, session_id, product_id):
+        session = await self.get_session(session_id)
+        product = await Product.objects.select_related('category', 'brand').prefetch_related(
+            'reviews__customer'
+        ).filter(id=product_id, is_active=True).afirst()
+        if product is None:
+            return product_not_found()
+
+        await KioskInteraction.objects.acreate(
+            session=session,
+            interaction_type='product_view',
+            product_id=product_id
+        )
+
+        context = {'request': request, 'prices': await price_index.asnapshot()}
+        return json_response({
+            'success': True,
+            'product': ProductSerializer(product, context=context).data
+        })
+
+
+class AsyncKioskProductLocationView(AsyncKioskView):
+    """Get product location in store - Valid session required"""
+
+    async def get(self, request, session_id, product_id):
+        session = await self.get_session(session_id)
+        product = await Product.objects.only(
+            'name', 'aisle_location', 'stock_quantity'
+        ).filter(id=product_id, is_active=True).afirst()
+        if product is None:
+            return product_not_found()
+
+        await KioskInteraction.objects.acreate(
+            session=session,
+            interaction_type='location_lookup',
+            product_id=product_id
+        )
+
+        return json_response({
+            'success': True,
+            'location': {
+                'product_name': product.name,
+                'aisle_location': product.aisle_location or 'Location not available',
+                'in_stock': product.in_stock,
+                'stock_quantity': product.stock_quantity
+            }
+        })
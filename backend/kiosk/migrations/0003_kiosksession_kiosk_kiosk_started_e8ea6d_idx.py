@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('kiosk', '0002_otpverification'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='kiosksession',
+            index=models.Index(fields=['-started_at', '-id'], name='kiosk_kiosk_started_e8ea6d_idx'),
+        ),
+    ]
@@ -61,6 +61,9 @@ class KioskSession(models.Model):
         verbose_name = 'Kiosk Session'
         verbose_name_plural = 'Kiosk Sessions'
         ordering = ['-started_at']
+        indexes = [
+            models.Index(fields=['-started_at', '-id']),
+        ]
     
     def __str__(self):
         customer_info = self.customer.username if self.customer else self.email or self.loyalty_card
@@ -1,3 +1,43 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import AsyncClient, TestCase
+from django.utils import timezone
+
+from freshmart_project.throttling import get_throttle_store
+from products.models import Category, Product, Promotion
+from products.pricing import price_index
+from .models import KioskSession
+
+
+class AsyncKioskTests(TestCase):
+    """Async kiosk endpoints serialize prices without querying from the event loop"""
+
+    def setUp(self):
+        cache.clear()
+        get_throttle_store().clear()
+        now = timezone.now()
+        category = Category.objects.create(name='Fruit')
+        self.product = Product.objects.create(name='Apple', description='', category=category,
+                                              price=Decimal('3.00'), stock_quantity=5)
+        promotion = Promotion.objects.create(
+            title='Apple deal', description='', discount_percentage=Decimal('10'),
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        promotion.products.add(self.product)
+        self.session = KioskSession.objects.create(session_id='kiosk-1')
+        # Cold index: the first price lookup has to load it
+        price_index.invalidate()
+
+    async def test_search(self):
+        response = await AsyncClient().get(f'/api/async/kiosk/{self.session.session_id}/search/?q=apple')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['products'][0]['effective_price'], '2.70')
+
+    async def test_product_detail(self):
+        response = await AsyncClient().get(
+            f'/api/async/kiosk/{self.session.session_id}/products/{self.product.pk}/'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['product']['effective_price'], '2.70')
@@ -4,7 +4,8 @@ from .views import (
     KioskLoginView, KioskRecommendationsView,
     KioskProductSearchView, KioskProductDetailView,
     KioskProductLocationView, KioskLogoutView,
-    AdminKioskSessionListView, AdminKioskStatsView
+    AdminKioskSessionListView, AdminKioskStatsView,
+    AdminKioskSessionExportView
 )
 
 app_name = 'kiosk'
@@ -26,5 +27,6 @@ urlpatterns = [
     
     # Admin routes
     path('admin/sessions/', AdminKioskSessionListView.as_view(), name='admin-session-list'),
+    path('admin/sessions/export/<str:export_format>/', AdminKioskSessionExportView.as_view(), name='admin-session-export'),
     path('admin/stats/', AdminKioskStatsView.as_view(), name='admin-stats'),
 ]
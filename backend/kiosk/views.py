@@ -1,7 +1,6 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.throttling import AnonRateThrottle
 from django.utils import timezone
 from datetime import timedelta
 import uuid
@@ -12,12 +11,17 @@ from .email_service import send_otp_email
 from accounts.models import Customer
 from products.models import Product
 from products.serializers import ProductListSerializer
-from recommendations.models import Recommendation
-from recommendations.serializers import RecommendationSerializer
+from recommendations.events import event_buffer
+from recommendations.storage import get_store
+from freshmart_project.pagination import StartedAtCursorPagination
+from freshmart_project.db_router import read_from_replica
+from freshmart_project.exports import StreamingExportView
+from freshmart_project.throttling import SharedAnonRateThrottle
 
 
-class KioskRateThrottle(AnonRateThrottle):
+class KioskRateThrottle(SharedAnonRateThrottle):
     """Rate limiting for kiosk access"""
+    scope = 'kiosk'
     rate = '60/minute'
 
 
@@ -246,12 +250,8 @@ class KioskRecommendationsView(APIView):
                 )
             
             # Get recommendations
-            recommendations = Recommendation.objects.filter(
-                customer=session.customer,
-                is_active=True,
-                product__is_active=True,
-                product__stock_quantity__gt=0
-            ).select_related('product', 'product__category', 'product__brand')[:10]
+            recommendations = get_store().read(session.customer, {})
+            event_buffer.add_impressions(recommendations)
             
             # Track interaction
             KioskInteraction.objects.create(
@@ -261,7 +261,7 @@ class KioskRecommendationsView(APIView):
             
             return Response({
                 'success': True,
-                'recommendations': RecommendationSerializer(recommendations, many=True).data
+                'recommendations': recommendations
             })
         
         except KioskSession.DoesNotExist:
@@ -432,15 +432,38 @@ class KioskLogoutView(APIView):
 # Admin views
 class AdminKioskSessionListView(generics.ListAPIView):
     """List all kiosk sessions - Admin only"""
-    queryset = KioskSession.objects.all().order_by('-started_at')
+    queryset = KioskSession.objects.select_related('customer').prefetch_related('interactions')
     serializer_class = KioskSessionSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = StartedAtCursorPagination
+
+
+class AdminKioskSessionExportView(StreamingExportView):
+    """Stream kiosk sessions with their interactions as CSV or NDJSON - Admin only"""
+    filename = 'kiosk-sessions'
+    date_field = 'started_at'
+    columns = (
+        'session_pk', 'session_id', 'customer_id', 'loyalty_card', 'email',
+        'started_at', 'ended_at', 'duration_seconds',
+        'interaction_id', 'interaction_type', 'product_id', 'search_query',
+        'interaction_at',
+    )
+    fields = (
+        'id', 'session_id', 'customer_id', 'loyalty_card', 'email',
+        'started_at', 'ended_at', 'duration_seconds',
+        'interactions__id', 'interactions__interaction_type',
+        'interactions__product_id', 'interactions__search_query',
+        'interactions__created_at',
+    )
+    queryset = KioskSession.objects.all()
+    ordering = ('started_at', 'id', 'interactions__id')
 
 
 class AdminKioskStatsView(APIView):
     """Get kiosk usage statistics - Admin only"""
     permission_classes = [permissions.IsAdminUser]
     
+    @read_from_replica()
     def get(self, request):
         from django.db.models import Count, Avg
         from datetime import timedelta
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Category, Brand, Product, ProductReview, Promotion
+from .models import Category, Brand, Product, ProductReview, ProductSimilarity, Promotion
 
 
 @admin.register(Category)
@@ -58,6 +58,14 @@ class ProductReviewAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(ProductSimilarity)
+class ProductSimilarityAdmin(admin.ModelAdmin):
+    """Admin configuration for ProductSimilarity model"""
+    list_display = ['product', 'updated_at']
+    search_fields = ['product__name']
+    readonly_fields = ['product', 'neighbors', 'signature', 'updated_at']
+
+
 @admin.register(Promotion)
 class PromotionAdmin(admin.ModelAdmin):
     """Admin configuration for Promotion model"""
@@ -0,0 +1,10 @@
+from django.urls import path
+from .async_views import AsyncProductDetailView, AsyncFeaturedProductsView, AsyncPromotionListView
+
+app_name = 'products-async'
+
+urlpatterns = [
+    path('<int:pk>/', AsyncProductDetailView.as_view(), name='product-detail'),
+    path('featured/', AsyncFeaturedProductsView.as_view(), name='featured-products'),
+    path('promotions/', AsyncPromotionListView.as_view(), name='promotion-list'),
+]
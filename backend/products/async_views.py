@@ -0,0 +1,73 @@
+"""
+Async catalog read endpoints (served under ASGI at /api/async/products/)
+
+Responses match the synchronous views in products.views and are cached by
+catalog version (see products.cache). Serializers run with every relation
+they touch already loaded and with a price snapshot taken off the event
+loop, so no query is issued from it.
+"""
+from django.utils import timezone
+from rest_framework import exceptions
+
+from freshmart_project.async_views import AsyncAPIView, json_response
+from .cache import aget_or_build
+from .models import Product
+from .pricing import price_index
+from .serializers import ProductListSerializer, ProductSerializer, PromotionSerializer
+from .views import product_list_queryset, promotion_list_queryset
+
+
+class AsyncProductDetailView(AsyncAPIView):
+    """Retrieve a product - Public access"""
+
+    async def get(self, request, pk):
+        async def build():
+            product = await Product.objects.select_related('category', 'brand').prefetch_related(
+                'reviews__customer'
+            ).filter(pk=pk).afirst()
+            if product is None:
+                return None
+            context = {'request': request, 'prices': await price_index.asnapshot()}
+            return ProductSerializer(product, context=context).data
+
+        data = await aget_or_build(('product', pk, request.get_host()), build)
+        if data is None:
+            raise exceptions.NotFound('No Product matches the given query.')
+        return json_response(data)
+
+
+class AsyncFeaturedProductsView(AsyncAPIView):
+    """Get featured products - Public access"""
+
+    async def get(self, request):
+        queryset = product_list_queryset().filter(is_active=True, featured=True)
+
+        async def build():
+            context = {'request': request, 'prices': await price_index.asnapshot()}
+            return await self.paginate(
+                request, queryset,
+                lambda products: ProductListSerializer(products, many=True, context=context).data
+            )
+
+        return json_response(await aget_or_build(('featured', request.build_absolute_uri()), build))
+
+
+class AsyncPromotionListView(AsyncAPIView):
+    """List active promotions - Public access (admins see all)"""
+
+    async def get(self, request):
+        queryset = promotion_list_queryset()
+        if not request.user.is_staff:
+            now = timezone.now()
+            queryset = queryset.filter(is_active=True, start_date__lte=now, end_date__gte=now)
+
+        async def build():
+            context = {'request': request, 'prices': await price_index.asnapshot()}
+            return await self.paginate(
+                request, queryset,
+                lambda promotions: PromotionSerializer(promotions, many=True, context=context).data
+            )
+
+        if request.user.is_staff:
+            return json_response(await build())
+        return json_response(await aget_or_build(('promotions', request.build_absolute_uri()), build))
@@ -0,0 +1,115 @@
+"""
+Versioned catalog cache for FreshMart API
+
+Cached catalog payloads are keyed by a catalog version number. Any change
+to products, categories, brands, reviews or promotions bumps the version
+(see products.signals), which orphans every older entry at once instead of
+tracking which keys a change touches. Stock-only saves (checkout) do not,
+so cached stock levels can trail by up to CATALOG_CACHE_TIMEOUT. Promotion edits made by other
+processes are noticed by the price index (products.pricing) when the
+version is read, and bump it then. Entries also expire after
+CATALOG_CACHE_TIMEOUT seconds, which bounds staleness where each process
+has its own cache.
+
+Hits and misses are counted per payload kind (the first key part) for
+/metrics/ (see `lookup_counts`).
+"""
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+VERSION_KEY = 'catalog:version'
+
+# kind -> [hits, misses]
+lookups = {}
+_lookups_lock = threading.Lock()
+
+
+def _initial_version():
+    # Never reuse a number from before the version key was evicted
+    return time.time_ns()
+
+
+def record_lookups(kind, hits, misses):
+    with _lookups_lock:
+        counts = lookups.setdefault(kind, [0, 0])
+        counts[0] += hits
+        counts[1] += misses
+
+
+def lookup_counts():
+    """{kind: (hits, misses)} so far in this process"""
+    with _lookups_lock:
+        return {kind: tuple(counts) for kind, counts in lookups.items()}
+
+
+def catalog_key(version, *parts):
+    return ':'.join(['catalog', str(version), *(str(part) for part in parts)])
+
+
+def catalog_version(key=VERSION_KEY):
+    if key == VERSION_KEY:
+        # Cached payloads embed prices: a promotion edit made by another
+        # process bumps the version when the price index notices it
+        from .pricing import price_index
+        price_index.snapshot()
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, _initial_version(), None)
+        version = cache.get(key)
+    return version
+
+
+async def acatalog_version():
+    from .pricing import price_index
+    if price_index.check_due():
+        await price_index.asnapshot()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, _initial_version(), None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version(key=VERSION_KEY):
+    """Invalidate every cached catalog payload (or whatever `key` versions)"""
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = _initial_version()
+        cache.set(key, version, None)
+        return version
+
+
+def get_or_build(parts, build):
+    """
+    Return the cached payload for `parts` at the current catalog version,
+    calling `build()` to produce (and cache) it on a miss. A `None` payload
+    is returned but not cached.
+    """
+    key = catalog_key(catalog_version(), *parts)
+    payload = cache.get(key)
+    record_lookups(parts[0], payload is not None, payload is None)
+    if payload is None:
+        payload = build()
+        if payload is not None:
+            cache.set(key, payload, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60))
+    return payload
+
+
+async def aget_or_build(parts, build):
+    """
+    Return the cached payload for `parts` at the current catalog version,
+    awaiting `build()` to produce (and cache) it on a miss. A `None` payload
+    is returned but not cached.
+    """
+    key = catalog_key(await acatalog_version(), *parts)
+    payload = await cache.aget(key)
+    record_lookups(parts[0], payload is not None, payload is None)
+    if payload is None:
+        payload = await build()
+        if payload is not None:
+            await cache.aset(key, payload, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60))
+    return payload
@@ -0,0 +1,21 @@
+"""
+Management command to rebuild the similar-product lists
+Usage: python manage.py build_product_similarity [--count 10]
+       (after bulk imports or queryset updates, which skip the save signals)
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from products.similarity import rebuild
+
+
+class Command(BaseCommand):
+    help = 'Recompute the most similar products of every active product'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--count', type=int, default=settings.SIMILAR_PRODUCTS_COUNT,
+                            help='Neighbors kept per product')
+
+    def handle(self, *args, **options):
+        count = rebuild(options['count'])
+        self.stdout.write(self.style.SUCCESS(f'{count} similar-product list(s) rebuilt'))
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 17:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0006_productsimilarity'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='promotion',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
@@ -10,6 +10,7 @@ class Category(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='categories/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -26,6 +27,7 @@ class Brand(models.Model):
     name = models.CharField(max_length=100, unique=True)
     description = models.TextField(blank=True)
     logo = models.ImageField(upload_to='brands/', null=True, blank=True)
+    logo_variants = models.JSONField(default=dict, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -46,6 +48,7 @@ class Product(models.Model):
     price = models.DecimalField(max_digits=10, decimal_places=2, validators=[MinValueValidator(0)])
     stock_quantity = models.IntegerField(default=0, validators=[MinValueValidator(0)])
     image = models.ImageField(upload_to='products/', null=True, blank=True)
+    image_variants = models.JSONField(default=dict, blank=True, editable=False)
     image_url = models.URLField(max_length=500, null=True, blank=True, help_text="External URL for product image")
     qr_code = models.ImageField(upload_to='qr_codes/', blank=True)
     aisle_location = models.CharField(max_length=50, blank=True, help_text="Store aisle location (e.g., A-12)")
@@ -71,6 +74,9 @@ class Product(models.Model):
         verbose_name = 'Product'
         verbose_name_plural = 'Products'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+        ]
     
     def __str__(self):
         return self.name
@@ -99,6 +105,12 @@ class Product(models.Model):
     def in_stock(self):
         return self.stock_quantity > 0
     
+    @property
+    def effective_price(self):
+        """Price after the best running promotion (see products.pricing)"""
+        from .pricing import price_index
+        return price_index.effective_price(self)
+    
     @property
     def average_rating(self):
         reviews = self.reviews.all()
@@ -107,6 +119,23 @@ class Product(models.Model):
         return 0
 
 
+class ProductSimilarity(models.Model):
+    """Precomputed most similar products of one product (products.similarity)"""
+    product = models.OneToOneField(Product, on_delete=models.CASCADE, primary_key=True, related_name='similarity')
+    # [[product_id, score], ...], most similar first
+    neighbors = models.JSONField(default=list)
+    # Hash of the features the neighbors were computed from
+    signature = models.CharField(max_length=32)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Product Similarity'
+        verbose_name_plural = 'Product Similarities'
+    
+    def __str__(self):
+        return f"{self.product_id}: {len(self.neighbors)} similar products"
+
+
 class ProductReview(models.Model):
     """Customer reviews for products"""
     product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='reviews')
@@ -137,6 +166,9 @@ class Promotion(models.Model):
     end_date = models.DateTimeField()
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Part of the promotions version (products.pricing); product and
+    # category link changes touch it too
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = 'Promotion'
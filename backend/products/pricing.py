@@ -0,0 +1,210 @@
+"""
+Effective prices for FreshMart products
+
+A product's effective price is its list price less the largest discount
+among the promotions running now (`is_active`, start_date <= now <=
+end_date) that include the product directly or through its category.
+Discounts do not stack.
+
+`price_index` keeps every current and future promotion as an interval and
+turns them into two maps, {product_id: discount} and {category_id:
+discount}, valid until the next promotion starts or ends. Between those
+boundaries a price is two dict lookups; at a boundary the maps are
+recomputed from the intervals in memory. This process's own promotion edits
+call invalidate() directly. Edits made by other processes are found by
+comparing the promotions version (count and latest `updated_at`, one
+aggregate query) at most every PRICING_VERSION_CHECK_SECONDS, or on every
+call with `snapshot(fresh=True)`, which checkout uses. A version change
+reloads the intervals and drops this process's cached catalog payloads.
+The snapshot also carries the ids of the running promotions, which
+products.scheduler keeps current across boundaries.
+"""
+import threading
+import time
+from bisect import bisect_right
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import router
+from django.db.models import Count, Max
+from django.dispatch import Signal
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .models import Promotion
+
+ZERO = Decimal('0')
+HUNDRED = Decimal('100')
+CENT = Decimal('0.01')
+# end_date is inclusive: a promotion stops applying just after it
+END_OFFSET = timedelta(microseconds=1)
+
+# Sent when the promotion intervals are reloaded or dropped
+intervals_changed = Signal()
+
+
+def apply_discount(price, discount):
+    """`price` less `discount` percent, to the cent"""
+    discount = min(discount, HUNDRED)
+    return (price * (HUNDRED - discount) / HUNDRED).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class PriceSnapshot:
+    """Active discounts between two promotion boundaries"""
+    __slots__ = ('promotion_ids', 'products', 'categories', 'valid_from', 'valid_until')
+
+    def __init__(self, promotion_ids, products, categories, valid_from, valid_until):
+        self.promotion_ids = promotion_ids
+        self.products = products
+        self.categories = categories
+        self.valid_from = valid_from
+        self.valid_until = valid_until
+
+    def valid_at(self, now):
+        return self.valid_from <= now and (self.valid_until is None or now < self.valid_until)
+
+    def discount(self, product_id, category_id):
+        return max(self.products.get(product_id, ZERO), self.categories.get(category_id, ZERO))
+
+    def price(self, price, product_id, category_id):
+        discount = self.discount(product_id, category_id)
+        if not discount:
+            return price
+        return apply_discount(price, discount)
+
+
+def promotions_version(using):
+    """Changes with every promotion saved, deleted or relinked (see products.signals)"""
+    version = Promotion.objects.using(using).aggregate(count=Count('pk'), changed=Max('updated_at'))
+    return version['count'], version['changed']
+
+
+class PromotionIntervals:
+    """Current and future promotions of one promotions version"""
+
+    def __init__(self, promotions):
+        # [(pk, start, end, discount, product_ids, category_ids)]
+        self.promotions = promotions
+        self.boundaries = sorted(
+            {start for _, start, _, _, _, _ in promotions} | {end + END_OFFSET for _, _, end, _, _, _ in promotions}
+        )
+
+    @classmethod
+    def load(cls, now, using):
+        rows = Promotion.objects.using(using).filter(is_active=True, end_date__gte=now).values_list(
+            'pk', 'start_date', 'end_date', 'discount_percentage'
+        )
+        promotions = {pk: (pk, start, end, discount, set(), set()) for pk, start, end, discount in rows}
+        if promotions:
+            product_links = Promotion.products.through.objects.using(using).filter(promotion_id__in=promotions)
+            for promotion_id, product_id in product_links.values_list('promotion_id', 'product_id'):
+                promotions[promotion_id][4].add(product_id)
+            category_links = Promotion.categories.through.objects.using(using).filter(promotion_id__in=promotions)
+            for promotion_id, category_id in category_links.values_list('promotion_id', 'category_id'):
+                promotions[promotion_id][5].add(category_id)
+        return cls(list(promotions.values()))
+
+    def snapshot(self, now):
+        """Discounts in effect at `now`, valid until the next boundary"""
+        promotion_ids, products, categories = set(), {}, {}
+        for pk, start, end, discount, product_ids, category_ids in self.promotions:
+            if start <= now <= end:
+                promotion_ids.add(pk)
+                for product_id in product_ids:
+                    if discount > products.get(product_id, ZERO):
+                        products[product_id] = discount
+                for category_id in category_ids:
+                    if discount > categories.get(category_id, ZERO):
+                        categories[category_id] = discount
+        index = bisect_right(self.boundaries, now)
+        valid_until = self.boundaries[index] if index < len(self.boundaries) else None
+        valid_from = self.boundaries[index - 1] if index else now
+        return PriceSnapshot(frozenset(promotion_ids), products, categories, min(valid_from, now), valid_until)
+
+
+class PromotionIndex:
+    """Process-wide effective price lookup"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._intervals = None
+        self._version = None
+        self._snapshot = None
+        self._version_checked = 0.0
+
+    def invalidate(self):
+        with self._lock:
+            self._intervals = self._snapshot = self._version = None
+        intervals_changed.send(sender=self.__class__)
+
+    def _version_check_due(self):
+        # The version is a query; check it at most this often unless asked
+        interval = getattr(settings, 'PRICING_VERSION_CHECK_SECONDS', 1)
+        return time.monotonic() - self._version_checked >= interval
+
+    def _stale_version(self, fresh):
+        if not fresh and not self._version_check_due():
+            return False
+        self._version_checked = time.monotonic()
+        return promotions_version(router.db_for_write(Promotion)) != self._version
+
+    def check_due(self, now=None):
+        """Whether snapshot() would query: nothing loaded, a boundary passed or a version check due"""
+        snapshot = self._snapshot
+        return snapshot is None or not snapshot.valid_at(now or timezone.now()) or self._version_check_due()
+
+    def snapshot(self, now=None, fresh=False):
+        """
+        Discounts in effect at `now`. With `fresh`, promotion edits made by
+        other processes are seen even within PRICING_VERSION_CHECK_SECONDS.
+        """
+        now = now or timezone.now()
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot.valid_at(now) and not self._stale_version(fresh):
+            return snapshot
+        with self._lock:
+            # Always the primary: the index outlives the request that builds it
+            using = router.db_for_write(Promotion)
+            version = promotions_version(using)
+            changed_elsewhere = self._version is not None and version != self._version
+            reloaded = self._intervals is None or version != self._version
+            if reloaded:
+                self._intervals = PromotionIntervals.load(now, using)
+                self._version = version
+                self._version_checked = time.monotonic()
+            self._snapshot = snapshot = self._intervals.snapshot(now)
+        if changed_elsewhere:
+            # Cached payloads embed prices and promotion lists
+            bump_catalog_version()
+        if reloaded:
+            intervals_changed.send(sender=self.__class__)
+        return snapshot
+
+    async def asnapshot(self, now=None, fresh=False):
+        """snapshot() for async views; loading it may query the database"""
+        return await sync_to_async(self.snapshot)(now, fresh)
+
+    def next_boundary(self):
+        """When the current snapshot expires, or None if nothing is loaded or scheduled"""
+        snapshot = self._snapshot
+        return snapshot.valid_until if snapshot is not None else None
+
+    def advance(self, now=None):
+        """
+        Recompute the snapshot for `now` from the loaded intervals, without
+        querying. Returns the new snapshot, or None if nothing is loaded.
+        """
+        now = now or timezone.now()
+        with self._lock:
+            if self._intervals is None:
+                return None
+            self._snapshot = self._intervals.snapshot(now)
+            return self._snapshot
+
+    def effective_price(self, product):
+        return self.snapshot().price(product.price, product.pk, product.category_id)
+
+
+price_index = PromotionIndex()
@@ -0,0 +1,81 @@
+"""
+Promotion boundary scheduler for FreshMart
+
+The set of running promotions only changes when one starts or ends. A
+daemon thread per process sleeps until the next such boundary (known from
+products.pricing), then moves the price index to the new active set and
+bumps the catalog version, so cached promotion lists and product prices
+change within moments of a flash deal starting or ending instead of when
+their cache entries expire.
+
+The thread never queries: it only works from intervals a request has
+already loaded, and is woken whenever they are reloaded or dropped.
+"""
+import logging
+import os
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from .cache import bump_catalog_version
+from .pricing import price_index
+
+logger = logging.getLogger('freshmart')
+
+
+class PromotionScheduler:
+    """Wakes at each promotion start/end to refresh prices and catalog caches"""
+
+    def __init__(self, index):
+        self.index = index
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    def ensure_running(self):
+        # Threads do not survive fork (preloading servers); start one per process
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._wakeup = threading.Event()
+            self._thread = threading.Thread(target=self.run, name='promotion-scheduler', daemon=True)
+            self._thread.start()
+
+    def wake(self):
+        """Recompute the next boundary (intervals were reloaded or dropped)"""
+        if not getattr(settings, 'PROMOTION_SCHEDULER_ENABLED', True):
+            return
+        self.ensure_running()
+        self._wakeup.set()
+
+    def run(self):
+        while True:
+            self._wakeup.clear()
+            boundary = self.index.next_boundary()
+            timeout = None
+            if boundary is not None:
+                timeout = max(0.0, (boundary - timezone.now()).total_seconds())
+            if self._wakeup.wait(timeout):
+                continue
+            if timezone.now() < boundary:
+                # Woke early (clock adjustment); wait out the remainder
+                continue
+            try:
+                self.fire(boundary)
+            except Exception:
+                logger.exception(f"Promotion boundary at {boundary.isoformat()} failed")
+
+    def fire(self, boundary):
+        snapshot = self.index.advance()
+        bump_catalog_version()
+        if snapshot is not None:
+            logger.info(
+                f"Promotion boundary {boundary.isoformat()}: {len(snapshot.promotion_ids)} active, "
+                f"next at {snapshot.valid_until.isoformat() if snapshot.valid_until else 'never'}"
+            )
+
+
+promotion_scheduler = PromotionScheduler(price_index)
@@ -1,17 +1,38 @@
+from django.db.models import Count, Subquery, Sum
 from rest_framework import serializers
+from freshmart_project.fast_serializers import RowSerializer
+from imaging.fields import ImageVariantsField, variant_urls
 from .models import Category, Brand, Product, ProductReview, Promotion
+from .pricing import price_index
+
+
+class EffectivePriceField(serializers.DecimalField):
+    """Product price after promotions, from the context's `prices` snapshot when given"""
+    
+    def __init__(self, **kwargs):
+        super().__init__(max_digits=10, decimal_places=2, read_only=True, source='*', **kwargs)
+    
+    def get_attribute(self, product):
+        # Async views pass a snapshot: loading one may query the database
+        prices = self.context.get('prices') or price_index.snapshot()
+        return prices.price(product.price, product.pk, product.category_id)
+
 
 class CategorySerializer(serializers.ModelSerializer):
+    image_variants = ImageVariantsField()
+    
     class Meta:
         model = Category
-        fields = ['id', 'name', 'description', 'image', 'created_at']
+        fields = ['id', 'name', 'description', 'image', 'image_variants', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
 class BrandSerializer(serializers.ModelSerializer):
+    logo_variants = ImageVariantsField()
+    
     class Meta:
         model = Brand
-        fields = ['id', 'name', 'description', 'logo', 'created_at']
+        fields = ['id', 'name', 'description', 'logo', 'logo_variants', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
@@ -30,12 +51,14 @@ class ProductSerializer(serializers.ModelSerializer):
     reviews = ProductReviewSerializer(many=True, read_only=True)
     average_rating = serializers.ReadOnlyField()
     in_stock = serializers.ReadOnlyField()
+    image_variants = ImageVariantsField()
+    effective_price = EffectivePriceField()
     
     class Meta:
         model = Product
         fields = [
             'id', 'name', 'description', 'category', 'category_name',
-            'brand', 'brand_name', 'price', 'stock_quantity', 'image',
+            'brand', 'brand_name', 'price', 'effective_price', 'stock_quantity', 'image', 'image_variants',
             'qr_code', 'aisle_location', 'is_active', 'featured',
             'in_stock', 'average_rating', 'reviews',
             # Nutrition fields
@@ -59,12 +82,14 @@ class ProductListSerializer(serializers.ModelSerializer):
     brand_name = serializers.CharField(source='brand.name', read_only=True)
     average_rating = serializers.ReadOnlyField()
     in_stock = serializers.ReadOnlyField()
+    image_variants = ImageVariantsField()
+    effective_price = EffectivePriceField()
     
     class Meta:
         model = Product
         fields = [
-            'id', 'name', 'category_name', 'brand_name', 'price',
-            'stock_quantity', 'image', 'is_active', 'featured',
+            'id', 'name', 'category_name', 'brand_name', 'price', 'effective_price',
+            'stock_quantity', 'image', 'image_variants', 'is_active', 'featured',
             'in_stock', 'average_rating', 'aisle_location'
         ]
 
@@ -75,6 +100,52 @@ class ProductListSerializer(serializers.ModelSerializer):
         return data
 
 
+class ProductListRowSerializer(RowSerializer):
+    """values() fast path for ProductListSerializer"""
+    serializer_class = ProductListSerializer
+    computed_fields = {
+        'image': ('image', 'image_url'),
+        'image_variants': ('image_variants',),
+        'effective_price': ('price', 'id', 'category'),
+        'in_stock': ('stock_quantity',),
+        'average_rating': ('rating_total', 'rating_count'),
+    }
+    image_storage = Product._meta.get_field('image').storage
+    effective_price_field = ProductListSerializer._declared_fields['effective_price']
+    # Taken on first use, so one serializer prices all its rows consistently
+    prices = None
+
+    def get_annotations(self, outer_ref):
+        reviews = ProductReview.objects.filter(product=outer_ref).order_by().values('product')
+        return {
+            'rating_total': Subquery(reviews.annotate(total=Sum('rating')).values('total')),
+            'rating_count': Subquery(reviews.annotate(count=Count('id')).values('count')),
+        }
+
+    def get_image(self, image, image_url):
+        url = self.file_url(self.image_storage, image)
+        if not url and image_url:
+            return image_url
+        return url
+
+    def get_image_variants(self, image_variants):
+        return variant_urls(image_variants, self.request)
+
+    def get_effective_price(self, price, product_id, category_id):
+        if self.prices is None:
+            self.prices = self.context.get('prices') or price_index.snapshot()
+        return self.effective_price_field.to_representation(self.prices.price(price, product_id, category_id))
+
+    def get_in_stock(self, stock_quantity):
+        return stock_quantity > 0
+
+    def get_average_rating(self, total, count):
+        # Same arithmetic as Product.average_rating
+        if count:
+            return total / count
+        return 0
+
+
 class PromotionSerializer(serializers.ModelSerializer):
     products = ProductListSerializer(many=True, read_only=True)
     categories = CategorySerializer(many=True, read_only=True)
@@ -87,3 +158,8 @@ class PromotionSerializer(serializers.ModelSerializer):
             'is_active', 'created_at'
         ]
         read_only_fields = ['id', 'created_at']
+
+
+class PromotionCompactSerializer(PromotionSerializer):
+    """Promotion with product ids; the products are side-loaded once per page"""
+    products = serializers.PrimaryKeyRelatedField(many=True, read_only=True)
@@ -0,0 +1,72 @@
+"""
+Signal handlers for the products app
+"""
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from imaging.signals import variants_generated
+from .cache import bump_catalog_version
+from .pricing import intervals_changed, price_index
+from .scheduler import promotion_scheduler
+from .similarity import schedule_refresh
+from .models import Brand, Category, Product, ProductReview, Promotion
+
+CATALOG_MODELS = (Category, Brand, Product, ProductReview, Promotion)
+
+# Saves limited to these fields leave cached catalog payloads alone; stock
+# shown there may lag checkout by up to CATALOG_CACHE_TIMEOUT
+UNCACHED_FIELDS = frozenset({'stock_quantity', 'updated_at'})
+
+
+@receiver(m2m_changed, sender=Promotion.products.through)
+@receiver(m2m_changed, sender=Promotion.categories.through)
+def invalidate_catalog_cache_on_promotion_change(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    # Links are part of the promotions version other processes compare
+    if not reverse:
+        promotions = Promotion.objects.filter(pk=instance.pk)
+    elif pk_set:
+        promotions = Promotion.objects.filter(pk__in=pk_set)
+    else:
+        # Cleared from the product or category side
+        promotions = Promotion.objects.all()
+    promotions.update(updated_at=timezone.now())
+    invalidate_promotions()
+
+
+def invalidate_catalog_cache(sender, update_fields=None, **kwargs):
+    """Catalog payloads embed all of these models; drop them on any change"""
+    if update_fields and update_fields <= UNCACHED_FIELDS:
+        return
+    bump_catalog_version()
+
+
+def invalidate_promotions(sender=None, **kwargs):
+    """Promotions also feed effective prices (products.pricing)"""
+    bump_catalog_version()
+    price_index.invalidate()
+
+
+@receiver(intervals_changed)
+def reschedule_promotion_boundaries(sender, **kwargs):
+    promotion_scheduler.wake()
+
+
+@receiver(post_save, sender=Product, dispatch_uid='similarity-save-Product')
+@receiver(post_delete, sender=Product, dispatch_uid='similarity-delete-Product')
+def refresh_similar_products(sender, instance, **kwargs):
+    schedule_refresh(instance.pk)
+
+
+@receiver(variants_generated)
+def invalidate_catalog_cache_on_image_variants(sender, **kwargs):
+    if sender in CATALOG_MODELS:
+        bump_catalog_version()
+
+
+for model in CATALOG_MODELS:
+    handler = invalidate_promotions if model is Promotion else invalidate_catalog_cache
+    post_save.connect(handler, sender=model, dispatch_uid=f'catalog-save-{model.__name__}')
+    post_delete.connect(handler, sender=model, dispatch_uid=f'catalog-delete-{model.__name__}')
@@ -0,0 +1,259 @@
+"""
+Content-based product similarity for FreshMart
+
+Every active product is encoded as a numeric vector: its category and brand
+(one-hot), log2(1 + price) so that doubling the price is one unit,
+nutrition per 100g, eco_score and carbon_footprint, each divided by a fixed
+scale and weighted (see the constants below). Missing values count as 0.
+No scale depends on the rest of the catalog, so a product's vector changes
+only when the product does.
+
+Similarity is 1 / (1 + squared distance) between two vectors. Distances are
+computed with one matrix product per block of BLOCK_SIZE products
+(|a|^2 + |b|^2 - 2ab), so memory stays at BLOCK_SIZE x products. The top
+SIMILAR_PRODUCTS_COUNT neighbors of each product are stored as one
+ProductSimilarity row.
+
+`rebuild()` recomputes every list (build_product_similarity). Product saves
+and deletes schedule `refresh()` after commit, which recomputes the changed
+products' lists and only the other lists they enter or leave. Saves that do
+not change a product's features, like stock updates at checkout, are
+skipped by comparing signatures.
+"""
+import hashlib
+import logging
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import connections, router, transaction
+
+from .cache import bump_catalog_version
+from .models import Product, ProductSimilarity
+
+logger = logging.getLogger('freshmart')
+
+CATEGORY_WEIGHT = 2.0
+BRAND_WEIGHT = 1.0
+PRICE_WEIGHT = 1.0
+# field -> (scale, weight)
+NUMERIC_FEATURES = {
+    'calories': (100, 0.5),
+    'protein': (10, 0.5),
+    'carbs': (10, 0.5),
+    'fat': (10, 0.5),
+    'fiber': (5, 0.5),
+    'eco_score': (25, 0.5),
+    'carbon_footprint': (1, 0.5),
+}
+FIELDS = ('pk', 'category_id', 'brand_id', 'price', *NUMERIC_FEATURES)
+BLOCK_SIZE = 512
+
+
+def signature(row):
+    """Hash of the features in a FIELDS row"""
+    return hashlib.md5(repr(row[1:]).encode()).hexdigest()
+
+
+def score(distance):
+    return round(1.0 / (1.0 + float(distance)), 6)
+
+
+def distance(score):
+    """Inverse of `score`"""
+    return 1.0 / score - 1.0 if score > 0 else math.inf
+
+
+class FeatureMatrix:
+    """Feature vectors of the active products"""
+
+    def __init__(self, rows):
+        rows = sorted(rows)
+        self.ids = np.array([row[0] for row in rows], dtype=np.int64)
+        self.positions = {product_id: i for i, product_id in enumerate(self.ids.tolist())}
+        self.signatures = {row[0]: signature(row) for row in rows}
+
+        categories = {category_id: i for i, category_id in enumerate(sorted({row[1] for row in rows}))}
+        brands = {brand_id: i for i, brand_id in enumerate(sorted({row[2] for row in rows if row[2] is not None}))}
+        numeric = np.array(
+            [[0.0 if value is None else float(value) for value in row[3:]] for row in rows], dtype=np.float64
+        ).reshape(len(rows), 1 + len(NUMERIC_FEATURES))
+        numeric[:, 0] = np.log2(1.0 + numeric[:, 0]) * PRICE_WEIGHT
+        numeric[:, 1:] *= np.array([weight / scale for scale, weight in NUMERIC_FEATURES.values()])
+
+        one_hot = np.zeros((len(rows), len(categories) + len(brands)))
+        positions = np.arange(len(rows))
+        one_hot[positions, [categories[row[1]] for row in rows]] = CATEGORY_WEIGHT
+        branded = [i for i, row in enumerate(rows) if row[2] is not None]
+        one_hot[branded, [len(categories) + brands[rows[i][2]] for i in branded]] = BRAND_WEIGHT
+
+        self.vectors = np.hstack([one_hot, numeric])
+        self.norms = np.einsum('ij,ij->i', self.vectors, self.vectors)
+
+    @classmethod
+    def load(cls):
+        # Always the primary: refreshes run right after a product is saved
+        using = router.db_for_write(Product)
+        return cls(Product.objects.using(using).filter(is_active=True).order_by().values_list(*FIELDS))
+
+    def distances(self, positions):
+        """Squared distances from the products at `positions` (rows) to every product"""
+        product = self.vectors[positions] @ self.vectors.T
+        distances = self.norms[positions, None] + self.norms[None, :] - 2.0 * product
+        # Rounding can leave identical vectors slightly apart or below 0
+        return np.maximum(distances, 0.0, out=distances)
+
+    def neighbors(self, positions, count):
+        """{product_id: [[product_id, score], ...]} for the products at `positions`"""
+        count = min(count, len(self.ids) - 1)
+        result = {}
+        for start in range(0, len(positions), BLOCK_SIZE):
+            block = np.asarray(positions[start:start + BLOCK_SIZE], dtype=np.int64)
+            if count <= 0:
+                result.update((product_id, []) for product_id in self.ids[block].tolist())
+                continue
+            distances = self.distances(block)
+            distances[np.arange(len(block)), block] = np.inf
+            nearest = np.argpartition(distances, count - 1, axis=1)[:, :count]
+            nearest_distances = np.take_along_axis(distances, nearest, axis=1)
+            # Closest first, ties by product id
+            order = np.lexsort((self.ids[nearest], nearest_distances), axis=-1)
+            nearest = np.take_along_axis(nearest, order, axis=1)
+            nearest_distances = np.take_along_axis(nearest_distances, order, axis=1)
+            for product_id, ids, row_distances in zip(
+                self.ids[block].tolist(), self.ids[nearest].tolist(), nearest_distances.tolist()
+            ):
+                result[product_id] = [[neighbor, score(d)] for neighbor, d in zip(ids, row_distances)]
+        return result
+
+
+def _store(matrix, neighbors):
+    ProductSimilarity.objects.bulk_create(
+        [
+            ProductSimilarity(product_id=product_id, neighbors=items, signature=matrix.signatures[product_id])
+            for product_id, items in neighbors.items()
+        ],
+        batch_size=1000,
+        update_conflicts=True,
+        unique_fields=['product'],
+        update_fields=['neighbors', 'signature', 'updated_at'],
+    )
+
+
+@transaction.atomic
+def rebuild(count=None):
+    """Recompute every product's neighbors; returns the number of lists stored"""
+    count = count or settings.SIMILAR_PRODUCTS_COUNT
+    matrix = FeatureMatrix.load()
+    neighbors = matrix.neighbors(list(range(len(matrix.ids))), count)
+    _store(matrix, neighbors)
+    ProductSimilarity.objects.exclude(product_id__in=matrix.positions).delete()
+    transaction.on_commit(bump_catalog_version)
+    return len(neighbors)
+
+
+@transaction.atomic
+def refresh(product_ids, count=None):
+    """
+    Update the stored neighbors after `product_ids` were saved or deleted;
+    returns the number of lists rewritten
+    """
+    count = count or settings.SIMILAR_PRODUCTS_COUNT
+    using = router.db_for_write(Product)
+    # Two small queries settle the common case: nothing the vectors use changed
+    current = {
+        row[0]: signature(row)
+        for row in Product.objects.using(using).filter(pk__in=product_ids, is_active=True).values_list(*FIELDS)
+    }
+    signatures = dict(ProductSimilarity.objects.using(using).filter(product_id__in=product_ids).values_list(
+        'product_id', 'signature'
+    ))
+    changed = {product_id for product_id in product_ids if current.get(product_id) != signatures.get(product_id)}
+    if not changed:
+        return 0
+
+    matrix = FeatureMatrix.load()
+    stored = list(ProductSimilarity.objects.using(using).values_list('product_id', 'neighbors'))
+
+    # Lists that contain a changed product
+    affected = {
+        matrix.positions[product_id] for product_id, items in stored
+        if product_id in matrix.positions and any(neighbor in changed for neighbor, _ in items)
+    }
+    present = [matrix.positions[product_id] for product_id in changed if product_id in matrix.positions]
+    if present:
+        affected.update(present)
+        # Lists a changed product now enters: closer than their last neighbor
+        # (every list shorter than `count` may grow)
+        thresholds = np.full(len(matrix.ids), np.inf)
+        for product_id, items in stored:
+            if product_id in matrix.positions and len(items) >= count:
+                thresholds[matrix.positions[product_id]] = distance(items[count - 1][1])
+        closer = np.zeros(len(matrix.ids), dtype=bool)
+        for start in range(0, len(present), BLOCK_SIZE):
+            # (block x products) transposed: rows are the changed products
+            closer |= (matrix.distances(present[start:start + BLOCK_SIZE]) < thresholds[None, :]).any(axis=0)
+        affected.update(np.flatnonzero(closer).tolist())
+
+    neighbors = matrix.neighbors(sorted(affected), count)
+    _store(matrix, neighbors)
+    ProductSimilarity.objects.filter(product_id__in=changed - matrix.positions.keys()).delete()
+    transaction.on_commit(bump_catalog_version)
+    return len(neighbors)
+
+
+def similar_product_ids(product_id, limit=None):
+    """[(product_id, score)] most similar to `product_id`, computed now if not stored yet"""
+    items = ProductSimilarity.objects.filter(product_id=product_id).values_list('neighbors', flat=True).first()
+    if items is None:
+        matrix = FeatureMatrix.load()
+        if product_id not in matrix.positions:
+            return []
+        items = matrix.neighbors([matrix.positions[product_id]], settings.SIMILAR_PRODUCTS_COUNT)[product_id]
+    return [(neighbor, neighbor_score) for neighbor, neighbor_score in items[:limit]]
+
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _refresh_in_worker():
+    with _lock:
+        product_ids = set(_pending)
+        _pending.clear()
+    try:
+        refresh(product_ids)
+    except Exception:
+        logger.exception(f"Similarity refresh failed for products {sorted(product_ids)}")
+    finally:
+        # The worker thread outlives the job; do not leave connections open
+        connections.close_all()
+
+
+def _submit(product_id):
+    global _executor
+    with _lock:
+        queued = bool(_pending)
+        _pending.add(product_id)
+        if _executor is None:
+            # One worker: refreshes must not interleave
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='similarity')
+    if not queued:
+        _executor.submit(_refresh_in_worker)
+
+
+def queue_depth():
+    """Products waiting for the next refresh"""
+    return len(_pending)
+
+
+def schedule_refresh(product_id):
+    """
+    Refresh similarity lists for `product_id` in the background once the
+    current transaction commits. Changes made while a refresh is queued
+    join it.
+    """
+    transaction.on_commit(lambda: _submit(product_id))
@@ -1,3 +1,304 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from django.test import AsyncClient
+from rest_framework.test import APIClient
+
+from accounts.models import Customer
+from freshmart_project.throttling import get_throttle_store
+from .models import Brand, Category, Product, ProductReview, ProductSimilarity, Promotion
+from .cache import catalog_version
+from .pricing import price_index
+from .scheduler import promotion_scheduler
+from .similarity import FeatureMatrix, rebuild, refresh
+
+
+class PromotionListQueryTests(TestCase):
+    """The promotion list issues the same queries however many promotions and products it nests"""
+
+    def setUp(self):
+        # None of these survives the test rollback on its own; the throttle
+        # store lasts the whole run, and anonymous requests are capped per hour
+        cache.clear()
+        price_index.invalidate()
+        get_throttle_store().clear()
+        self.client = APIClient()
+        self.customer = Customer.objects.create_user(username='reviewer', email='reviewer@example.com',
+                                                     password='password123')
+        self.now = timezone.now()
+
+    def create_promotion(self, index, products=3):
+        category = Category.objects.create(name=f'Category {index}')
+        brand = Brand.objects.create(name=f'Brand {index}')
+        promotion = Promotion.objects.create(
+            title=f'Deal {index}', description='', discount_percentage=Decimal('10'),
+            start_date=self.now - timedelta(days=1), end_date=self.now + timedelta(days=1),
+        )
+        for number in range(products):
+            product = Product.objects.create(
+                name=f'Product {index}-{number}', description='', category=category, brand=brand,
+                price=Decimal('4.99'), stock_quantity=10,
+            )
+            ProductReview.objects.create(product=product, customer=self.customer, rating=4)
+            promotion.products.add(product)
+        promotion.categories.add(category)
+        return promotion
+
+    def uncached(self):
+        # Load the price index up front (shared by every request in the
+        # process) and drop cached pages, so only the list's own queries count
+        price_index.snapshot()
+        cache.clear()
+
+    def get(self, query=''):
+        response = self.client.get(f'/api/products/promotions/{query}')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_query_count_is_constant(self):
+        self.create_promotion(1)
+        # count, promotions, products (with category and brand), reviews, categories
+        self.uncached()
+        with self.assertNumQueries(5):
+            self.get()
+
+        for index in range(2, 6):
+            self.create_promotion(index)
+        self.uncached()
+        with self.assertNumQueries(5):
+            data = self.get()
+        self.assertEqual(data['count'], 5)
+        product = data['results'][0]['products'][0]
+        self.assertEqual(product['category_name'], 'Category 5')
+        self.assertEqual(product['brand_name'], 'Brand 5')
+        self.assertEqual(product['average_rating'], 4)
+
+    def test_compact_side_loads_products(self):
+        promotion = self.create_promotion(1)
+        shared = promotion.products.first()
+        other = self.create_promotion(2, products=1)
+        other.products.add(shared)
+
+        self.uncached()
+        with self.assertNumQueries(5):
+            data = self.get('?compact=true')
+        self.uncached()
+        full = self.get()
+
+        results = {result['id']: result for result in data['results']}
+        self.assertIn(shared.pk, results[other.pk]['products'])
+        self.assertEqual(len(data['products']), 4)
+        for result in full['results']:
+            self.assertEqual(result['categories'], results[result['id']]['categories'])
+            for product in result['products']:
+                self.assertEqual(data['products'][str(product['id'])], product)
+
+
+class SimilarProductsTests(TestCase):
+    """Incremental similarity refreshes leave the same lists as a full rebuild"""
+
+    def setUp(self):
+        cache.clear()
+        price_index.invalidate()
+        get_throttle_store().clear()
+        self.fruit = Category.objects.create(name='Fruit')
+        self.dairy = Category.objects.create(name='Dairy')
+        brand = Brand.objects.create(name='Farm')
+        self.products = [
+            Product.objects.create(
+                name=f'Product {index}', description='', category=self.fruit if index % 2 else self.dairy,
+                brand=brand if index % 3 else None, price=Decimal(index + 1), stock_quantity=10,
+                calories=index * 40, protein=Decimal(index), eco_score=50 + index,
+            )
+            for index in range(12)
+        ]
+
+    def stored(self):
+        return dict(ProductSimilarity.objects.values_list('product_id', 'neighbors'))
+
+    def expected(self):
+        matrix = FeatureMatrix.load()
+        return matrix.neighbors(list(range(len(matrix.ids))), 10)
+
+    def test_neighbors_prefer_same_category_and_close_price(self):
+        rebuild()
+        response = APIClient().get(f'/api/products/{self.products[5].pk}/similar/?limit=3')
+        self.assertEqual(response.status_code, 200)
+        similar = response.json()['products']
+        self.assertEqual(len(similar), 3)
+        self.assertEqual([product['category_name'] for product in similar], ['Fruit'] * 3)
+        self.assertEqual(similar[0]['id'], self.products[7].pk)
+        self.assertGreaterEqual(similar[0]['similarity'], similar[1]['similarity'])
+
+    def test_refresh_matches_rebuild(self):
+        rebuild()
+        moved, retired = self.products[2], self.products[7]
+        moved.category = self.fruit
+        moved.price = Decimal('9.50')
+        moved.save()
+        retired.is_active = False
+        retired.save()
+        added = Product.objects.create(name='New', description='', category=self.dairy, price=Decimal('4.00'),
+                                       stock_quantity=5, calories=150)
+
+        refresh({moved.pk, retired.pk, added.pk})
+        self.assertEqual(self.stored(), self.expected())
+
+        # Stock changes do not touch the vectors
+        moved.stock_quantity = 3
+        moved.save()
+        self.assertEqual(refresh({moved.pk}), 0)
+
+    def test_unknown_product(self):
+        self.assertEqual(APIClient().get('/api/products/999999/similar/').status_code, 404)
+
+
+class PromotionPricingTests(TestCase):
+    """Effective prices follow promotion edits, from this process and others"""
+
+    def setUp(self):
+        cache.clear()
+        price_index.invalidate()
+        get_throttle_store().clear()
+        now = timezone.now()
+        category = Category.objects.create(name='Bakery')
+        self.product = Product.objects.create(name='Bread', description='', category=category,
+                                              price=Decimal('10.00'), stock_quantity=10)
+        self.promotion = Promotion.objects.create(
+            title='Deal', description='', discount_percentage=Decimal('10'),
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        self.promotion.products.add(self.product)
+
+    def effective_price(self):
+        response = APIClient().get(f'/api/products/{self.product.pk}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()['effective_price']
+
+    def test_edit_changes_price(self):
+        self.assertEqual(self.effective_price(), '9.00')
+        self.promotion.discount_percentage = Decimal('25')
+        self.promotion.save()
+        self.assertEqual(self.effective_price(), '7.50')
+        self.promotion.products.remove(self.product)
+        self.assertEqual(self.effective_price(), '10.00')
+
+    @override_settings(PRICING_VERSION_CHECK_SECONDS=0)
+    def test_edit_in_another_process_changes_price(self):
+        self.assertEqual(self.effective_price(), '9.00')
+        # A queryset update sends no signals, like a save in another worker
+        Promotion.objects.filter(pk=self.promotion.pk).update(
+            discount_percentage=Decimal('50'), updated_at=timezone.now()
+        )
+        self.assertEqual(self.effective_price(), '5.00')
+        Promotion.objects.filter(pk=self.promotion.pk).delete()
+        self.assertEqual(self.effective_price(), '10.00')
+
+    def test_fresh_snapshot_ignores_check_interval(self):
+        self.assertEqual(price_index.snapshot().discount(self.product.pk, None), Decimal('10'))
+        Promotion.objects.filter(pk=self.promotion.pk).update(
+            discount_percentage=Decimal('30'), updated_at=timezone.now()
+        )
+        with override_settings(PRICING_VERSION_CHECK_SECONDS=3600):
+            self.assertEqual(price_index.snapshot().discount(self.product.pk, None), Decimal('10'))
+            self.assertEqual(price_index.snapshot(fresh=True).discount(self.product.pk, None), Decimal('30'))
+
+
+class AsyncCatalogTests(TestCase):
+    """Async endpoints serialize prices without querying from the event loop"""
+
+    def setUp(self):
+        cache.clear()
+        get_throttle_store().clear()
+        now = timezone.now()
+        category = Category.objects.create(name='Dairy')
+        self.product = Product.objects.create(name='Milk', description='', category=category,
+                                              price=Decimal('2.00'), stock_quantity=5, featured=True)
+        promotion = Promotion.objects.create(
+            title='Milk deal', description='', discount_percentage=Decimal('50'),
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        promotion.categories.add(category)
+        promotion.products.add(self.product)
+        # Cold index: the first price lookup has to load it
+        price_index.invalidate()
+
+    async def test_product_detail(self):
+        response = await AsyncClient().get(f'/api/async/products/{self.product.pk}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['effective_price'], '1.00')
+
+    async def test_featured_products(self):
+        response = await AsyncClient().get('/api/async/products/featured/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['effective_price'], '1.00')
+
+    async def test_promotions(self):
+        response = await AsyncClient().get('/api/async/products/promotions/')
+        self.assertEqual(response.status_code, 200)
+        promotion = response.json()['results'][0]
+        self.assertEqual(promotion['title'], 'Milk deal')
+        self.assertEqual(promotion['products'][0]['effective_price'], '1.00')
+
+
+class PromotionBoundaryTests(TestCase):
+    """Promotion lists change when a promotion starts, without a promotion edit"""
+
+    def setUp(self):
+        cache.clear()
+        price_index.invalidate()
+        get_throttle_store().clear()
+        self.category = Category.objects.create(name='Frozen')
+
+    def create_promotion(self, start, end):
+        return Promotion.objects.create(
+            title='Flash deal', description='', discount_percentage=Decimal('20'),
+            start_date=start, end_date=end,
+        )
+
+    def titles(self):
+        response = APIClient().get('/api/products/promotions/')
+        self.assertEqual(response.status_code, 200)
+        return [promotion['title'] for promotion in response.json()['results']]
+
+    def test_fire_at_boundary_bumps_catalog_and_lists_promotion(self):
+        now = timezone.now()
+        start = now + timedelta(hours=1)
+        self.create_promotion(start, start + timedelta(hours=1))
+        self.assertEqual(self.titles(), [])
+        self.assertEqual(price_index.next_boundary(), start)
+
+        version = catalog_version()
+        later = start + timedelta(seconds=1)
+        with mock.patch('django.utils.timezone.now', return_value=later):
+            promotion_scheduler.fire(start)
+            self.assertNotEqual(catalog_version(), version)
+            self.assertEqual(self.titles(), ['Flash deal'])
+            self.assertEqual(price_index.next_boundary(), start + timedelta(hours=1, microseconds=1))
+
+    @override_settings(PROMOTION_SCHEDULER_ENABLED=True)
+    def test_scheduler_thread_crosses_boundary(self):
+        start = timezone.now() + timedelta(milliseconds=300)
+        self.create_promotion(start, start + timedelta(hours=1))
+        self.assertEqual(self.titles(), [])
+        version = catalog_version()
+
+        deadline = time.monotonic() + 5
+        while catalog_version() == version and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertNotEqual(catalog_version(), version)
+        self.assertEqual(self.titles(), ['Flash deal'])
+
+    @override_settings(PRICING_VERSION_CHECK_SECONDS=0)
+    def test_edit_in_another_process_changes_list(self):
+        now = timezone.now()
+        promotion = self.create_promotion(now - timedelta(hours=1), now + timedelta(hours=1))
+        self.assertEqual(self.titles(), ['Flash deal'])
+        # No signals: the cached page must go because the version changed
+        Promotion.objects.filter(pk=promotion.pk).update(is_active=False, updated_at=timezone.now())
+        self.assertEqual(self.titles(), [])
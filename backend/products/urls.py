@@ -7,7 +7,7 @@ from .views import (
     ProductReviewDetailView, PromotionListView,
     PromotionDetailView, FeaturedProductsView,
     AdminProductListView, AdminProductBulkUpdateView,
-    CheckPurchaseView, FrequentlyBoughtTogetherView
+    CheckPurchaseView, FrequentlyBoughtTogetherView, SimilarProductsView
 )
 
 app_name = 'products'
@@ -38,6 +38,9 @@ urlpatterns = [
     # Frequently bought together
     path('<int:product_id>/frequently_bought_together/', FrequentlyBoughtTogetherView.as_view(), name='frequently-bought-together'),
     
+    # Similar products (content-based)
+    path('<int:product_id>/similar/', SimilarProductsView.as_view(), name='similar-products'),
+    
     # Promotions
     path('promotions/', PromotionListView.as_view(), name='promotion-list'),
     path('promotions/<int:pk>/', PromotionDetailView.as_view(), name='promotion-detail'),
@@ -1,12 +1,19 @@
 from rest_framework import generics, filters, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from django.db.models import Q, Avg, Count
+from django.conf import settings
+from django.db.models import Q, Avg, Count, Prefetch
+from .cache import get_or_build
 from .models import Category, Brand, Product, ProductReview, Promotion
+from .pricing import price_index
+from .similarity import similar_product_ids
 from .serializers import (
     CategorySerializer, BrandSerializer, ProductSerializer,
-    ProductListSerializer, ProductReviewSerializer, PromotionSerializer
+    ProductListSerializer, ProductListRowSerializer, ProductReviewSerializer, PromotionSerializer,
+    PromotionCompactSerializer
 )
+from freshmart_project.fast_serializers import RowListMixin
+from freshmart_project.pagination import CreatedAtCursorPagination
 
 
 class IsAdminOrReadOnly(permissions.BasePermission):
@@ -17,6 +24,22 @@ class IsAdminOrReadOnly(permissions.BasePermission):
         return request.user and request.user.is_staff
 
 
+def product_list_queryset():
+    """Products with everything ProductListSerializer reads loaded up front"""
+    return Product.objects.select_related('category', 'brand').prefetch_related(
+        # average_rating only needs the ratings
+        Prefetch('reviews', queryset=ProductReview.objects.only('id', 'product_id', 'rating'))
+    )
+
+
+def promotion_list_queryset():
+    """Promotions with their products and categories in a constant number of queries"""
+    return Promotion.objects.prefetch_related(
+        Prefetch('products', queryset=product_list_queryset()),
+        'categories',
+    )
+
+
 class CategoryListView(generics.ListCreateAPIView):
     """List all categories (public) or create a new one (admin only)"""
     queryset = Category.objects.all()
@@ -45,10 +68,11 @@ class BrandDetailView(generics.RetrieveUpdateDestroyAPIView):
     permission_classes = [IsAdminOrReadOnly]
 
 
-class ProductListView(generics.ListCreateAPIView):
+class ProductListView(RowListMixin, generics.ListCreateAPIView):
     """List all products (public) with filtering and search, create (admin only)"""
     queryset = Product.objects.filter(is_active=True)
     serializer_class = ProductListSerializer
+    row_serializer_class = ProductListRowSerializer
     permission_classes = [IsAdminOrReadOnly]
     filter_backends = [filters.SearchFilter, filters.OrderingFilter]
     search_fields = ['name', 'description', 'category__name', 'brand__name']
@@ -214,41 +238,72 @@ class ProductReviewDetailView(generics.RetrieveUpdateDestroyAPIView):
 
 
 class PromotionListView(generics.ListCreateAPIView):
-    """List active promotions (public) or create (admin only)"""
+    """
+    List active promotions (public) or create (admin only).
+    `?compact=true` lists product ids per promotion and returns each product
+    once, in a top-level `products` dictionary keyed by id.
+    """
     serializer_class = PromotionSerializer
     permission_classes = [IsAdminOrReadOnly]
     
     def get_queryset(self):
-        from django.utils import timezone
         if self.request.user.is_staff:
-            return Promotion.objects.all()
-        return Promotion.objects.filter(
-            is_active=True,
-            start_date__lte=timezone.now(),
-            end_date__gte=timezone.now()
-        )
+            return promotion_list_queryset()
+        # The running set is precomputed until the next promotion boundary
+        return promotion_list_queryset().filter(pk__in=price_index.snapshot().promotion_ids)
+    
+    def list(self, request, *args, **kwargs):
+        if request.user.is_staff:
+            return Response(self.build_list())
+        # Cached until the catalog version changes, which the promotion
+        # scheduler also bumps at every boundary
+        return Response(get_or_build(('promotions', request.build_absolute_uri()), self.build_list))
+    
+    def build_list(self):
+        if self.request.query_params.get('compact') != 'true':
+            return super().list(self.request).data
+        
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        promotions = page if page is not None else list(queryset)
+        context = self.get_serializer_context()
+        data = PromotionCompactSerializer(promotions, many=True, context=context).data
+        
+        products = {}
+        for promotion in promotions:
+            for product in promotion.products.all():
+                products.setdefault(product.pk, product)
+        side_loaded = ProductListSerializer(list(products.values()), many=True, context=context).data
+        
+        data = self.get_paginated_response(data).data if page is not None else {'results': data}
+        data['products'] = {str(product['id']): product for product in side_loaded}
+        return data
 
 
 class PromotionDetailView(generics.RetrieveUpdateDestroyAPIView):
     """Retrieve (public), update, or delete (admin only) a promotion"""
-    queryset = Promotion.objects.all()
+    queryset = promotion_list_queryset()
     serializer_class = PromotionSerializer
     permission_classes = [IsAdminOrReadOnly]
 
 
-class FeaturedProductsView(generics.ListAPIView):
+class FeaturedProductsView(RowListMixin, generics.ListAPIView):
     """Get featured products - Public access"""
     queryset = Product.objects.filter(is_active=True, featured=True)
     serializer_class = ProductListSerializer
+    row_serializer_class = ProductListRowSerializer
     permission_classes = [permissions.AllowAny]
 
 
 # Admin-only views for product management
 class AdminProductListView(generics.ListAPIView):
     """List all products including inactive ones - Admin only"""
-    queryset = Product.objects.all().order_by('-created_at')
+    queryset = Product.objects.select_related(
+        'category', 'brand'
+    ).prefetch_related('reviews__customer')
     serializer_class = ProductSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = CreatedAtCursorPagination
 
 
 class AdminProductBulkUpdateView(APIView):
@@ -397,3 +452,52 @@ class FrequentlyBoughtTogetherView(APIView):
                 'error': str(e),
                 'products': []
             })
+
+
+class SimilarProductsView(APIView):
+    """Get the products most similar to a given product by content (products.similarity)"""
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request, product_id):
+        try:
+            limit = min(int(request.query_params.get('limit', 6)), settings.SIMILAR_PRODUCTS_COUNT)
+        except ValueError:
+            return Response(
+                {'success': False, 'error': 'limit must be a number'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        
+        # Cached until the catalog version changes, which rewritten
+        # neighbor lists also bump
+        payload = get_or_build(
+            ('similar', request.build_absolute_uri()), lambda: self.build(product_id, limit)
+        )
+        if payload is None:
+            return Response(
+                {'success': False, 'error': 'Product not found', 'products': []},
+                status=status.HTTP_404_NOT_FOUND
+            )
+        return Response(payload)
+    
+    def build(self, product_id, limit):
+        if not Product.objects.filter(pk=product_id, is_active=True).exists():
+            return None
+        
+        similar = similar_product_ids(product_id)
+        serializer = ProductListRowSerializer(context={'request': self.request})
+        rows = serializer.rows(Product.objects.filter(
+            pk__in=[similar_id for similar_id, _ in similar],
+            is_active=True,
+            stock_quantity__gt=0
+        ).order_by())
+        products = {product['id']: product for product in serializer.serialize(rows)}
+        
+        results = [
+            {**products[similar_id], 'similarity': score}
+            for similar_id, score in similar if similar_id in products
+        ][:max(limit, 0)]
+        return {
+            'success': True,
+            'products': results,
+            'count': len(results)
+        }
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:31
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('purchases', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['customer', '-created_at', '-id'], name='purchases_p_custome_2ea1e7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='purchase',
+            index=models.Index(fields=['-created_at', '-id'], name='purchases_p_created_b53507_idx'),
+        ),
+    ]
@@ -22,6 +22,10 @@ class Purchase(models.Model):
         verbose_name = 'Purchase'
         verbose_name_plural = 'Purchases'
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['customer', '-created_at', '-id']),
+            models.Index(fields=['-created_at', '-id']),
+        ]
     
     def __str__(self):
         return f"Purchase #{self.id} - {self.customer.username} - ${self.total_amount}"
@@ -81,4 +85,4 @@ class CartItem(models.Model):
     
     @property
     def subtotal(self):
-        return self.quantity * self.product.price
+        return self.quantity * self.product.effective_price
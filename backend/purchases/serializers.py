@@ -1,6 +1,8 @@
 from rest_framework import serializers
 from .models import Purchase, PurchaseItem, Cart, CartItem
 from products.serializers import ProductListSerializer
+from freshmart_project.fast_serializers import RowSerializer
+from imaging.fields import ImageVariantsField
 
 class PurchaseItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
@@ -27,11 +29,30 @@ class PurchaseSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'customer', 'created_at', 'updated_at']
 
 
+class PurchaseItemRowSerializer(RowSerializer):
+    """values() fast path for PurchaseItemSerializer"""
+    serializer_class = PurchaseItemSerializer
+    computed_fields = {'subtotal': ('quantity', 'price_at_purchase')}
+
+    def get_subtotal(self, quantity, price_at_purchase):
+        return quantity * price_at_purchase
+
+
+class PurchaseRowSerializer(RowSerializer):
+    """values() fast path for PurchaseSerializer"""
+    serializer_class = PurchaseSerializer
+    many = {'items': (PurchaseItemRowSerializer, 'purchase')}
+
+
 class CartItemSerializer(serializers.ModelSerializer):
     product_name = serializers.CharField(source='product.name', read_only=True)
     product_image = serializers.SerializerMethodField()
+    product_image_variants = ImageVariantsField(source='product.image_variants')
     product_brand = serializers.CharField(source='product.brand.name', read_only=True)
     price = serializers.DecimalField(source='product.price', max_digits=10, decimal_places=2, read_only=True)
+    effective_price = serializers.DecimalField(
+        source='product.effective_price', max_digits=10, decimal_places=2, read_only=True
+    )
     subtotal = serializers.ReadOnlyField()
     
     # Include full product data with nutrition & eco info
@@ -39,7 +60,10 @@ class CartItemSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = CartItem
-        fields = ['id', 'product', 'product_name', 'product_image', 'product_brand', 'price', 'quantity', 'subtotal', 'added_at']
+        fields = [
+            'id', 'product', 'product_name', 'product_image', 'product_image_variants',
+            'product_brand', 'price', 'effective_price', 'quantity', 'subtotal', 'added_at'
+        ]
         read_only_fields = ['id', 'added_at']
     
     def get_product(self, obj):
@@ -1,3 +1,149 @@
-from django.test import TestCase
+import csv
+import io
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
 
-# Create your tests here.
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from accounts.models import Customer
+from products.cache import catalog_version
+from products.models import Category, Product, Promotion
+from products.pricing import price_index
+from .models import Cart, CartItem, Purchase, PurchaseItem
+
+
+class CheckoutPricingTests(TestCase):
+    """Checkout charges the prices of the promotions running at checkout"""
+
+    def setUp(self):
+        cache.clear()
+        price_index.invalidate()
+        now = timezone.now()
+        category = Category.objects.create(name='Pantry')
+        self.product = Product.objects.create(name='Rice', description='', category=category,
+                                              price=Decimal('20.00'), stock_quantity=10)
+        self.promotion = Promotion.objects.create(
+            title='Rice deal', description='', discount_percentage=Decimal('10'),
+            start_date=now - timedelta(days=1), end_date=now + timedelta(days=1),
+        )
+        self.promotion.categories.add(category)
+        self.customer = Customer.objects.create_user(username='shopper', email='shopper@example.com',
+                                                     password='password123')
+        cart = Cart.objects.create(customer=self.customer)
+        CartItem.objects.create(cart=cart, product=self.product, quantity=2)
+        self.client = APIClient()
+        self.client.force_authenticate(self.customer)
+
+    def checkout(self):
+        response = self.client.post('/api/purchases/checkout/', {'payment_method': 'card'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        return Purchase.objects.get(pk=response.json()['purchase']['id'])
+
+    def test_charges_promotion_price(self):
+        purchase = self.checkout()
+        self.assertEqual(purchase.total_amount, Decimal('36.00'))
+        self.assertEqual(purchase.items.get().price_at_purchase, Decimal('18.00'))
+
+    @override_settings(PRICING_VERSION_CHECK_SECONDS=3600)
+    def test_promotion_ended_in_another_process(self):
+        # Warm the index, then end the promotion without signals, as another
+        # worker's save would look to this process
+        self.assertEqual(price_index.snapshot().discount(self.product.pk, self.product.category_id), Decimal('10'))
+        Promotion.objects.filter(pk=self.promotion.pk).update(
+            end_date=timezone.now() - timedelta(minutes=1), updated_at=timezone.now()
+        )
+        purchase = self.checkout()
+        self.assertEqual(purchase.total_amount, Decimal('40.00'))
+
+    def test_stock_update_keeps_catalog_cache(self):
+        version = catalog_version()
+        self.checkout()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.stock_quantity, 8)
+        self.assertEqual(catalog_version(), version)
+        self.product.price = Decimal('21.00')
+        self.product.save()
+        self.assertNotEqual(catalog_version(), version)
+
+
+class PurchaseExportTests(TestCase):
+    """Admin purchase exports stream one row per line item, within the requested dates"""
+
+    def setUp(self):
+        category = Category.objects.create(name='Pantry')
+        self.rice = Product.objects.create(name='Rice', description='', category=category,
+                                           price=Decimal('20.00'), stock_quantity=10)
+        self.beans = Product.objects.create(name='Beans, dried', description='', category=category,
+                                            price=Decimal('3.50'), stock_quantity=10)
+        self.customer = Customer.objects.create_user(username='shopper', email='shopper@example.com',
+                                                     password='password123')
+        self.january = self.purchase(datetime(2025, 1, 10, 12, 0, tzinfo=dt_timezone.utc),
+                                     (self.rice, 1, '20.00'), (self.beans, 2, '3.50'))
+        self.february = self.purchase(datetime(2025, 2, 10, 23, 59, 59, 500000, tzinfo=dt_timezone.utc),
+                                      (self.beans, 1, '3.50'))
+        admin = Customer.objects.create_user(username='admin', email='admin@example.com',
+                                             password='password123', is_staff=True)
+        self.client = APIClient()
+        self.client.force_authenticate(admin)
+
+    def purchase(self, created_at, *items):
+        purchase = Purchase.objects.create(customer=self.customer, status='completed', payment_method='card',
+                                           total_amount=sum(Decimal(price) * quantity for _, quantity, price in items))
+        for product, quantity, price in items:
+            PurchaseItem.objects.create(purchase=purchase, product=product, quantity=quantity,
+                                        price_at_purchase=Decimal(price))
+        Purchase.objects.filter(pk=purchase.pk).update(created_at=created_at)
+        return purchase
+
+    def export(self, export_format, **params):
+        response = self.client.get(f'/api/purchases/admin/export/{export_format}/', params)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'filename="purchases-', response['Content-Disposition'])
+        return response['Content-Type'], b''.join(response.streaming_content).decode()
+
+    def test_csv(self):
+        content_type, body = self.export('csv')
+        self.assertEqual(content_type, 'text/csv')
+        rows = list(csv.reader(io.StringIO(body)))
+        self.assertEqual(rows[0][:3], ['purchase_id', 'created_at', 'customer_id'])
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1][rows[0].index('product_name')], 'Rice')
+        self.assertEqual(rows[2][rows[0].index('product_name')], 'Beans, dried')
+        self.assertEqual(rows[3][:2], [str(self.february.pk), '2025-02-10T23:59:59.500000+00:00'])
+
+    def test_ndjson(self):
+        content_type, body = self.export('ndjson')
+        self.assertEqual(content_type, 'application/x-ndjson')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row['purchase_id'] for row in rows], [self.january.pk, self.january.pk, self.february.pk])
+        self.assertEqual(rows[0]['created_at'], '2025-01-10T12:00:00+00:00')
+        self.assertEqual((rows[1]['quantity'], rows[1]['price_at_purchase']), (2, '3.50'))
+        self.assertEqual(rows[1]['customer_username'], 'shopper')
+
+    def test_date_bounds(self):
+        def purchase_ids(**params):
+            _, body = self.export('ndjson', **params)
+            return sorted({json.loads(line)['purchase_id'] for line in body.splitlines()})
+
+        self.assertEqual(purchase_ids(start='2025-02-01'), [self.february.pk])
+        self.assertEqual(purchase_ids(end='2025-01-31'), [self.january.pk])
+        # A date as `end` covers that whole day
+        self.assertEqual(purchase_ids(start='2025-02-10', end='2025-02-10'), [self.february.pk])
+        self.assertEqual(purchase_ids(start='2025-01-10T12:00:01Z', end='2025-02-10T23:00:00Z'), [])
+
+    def test_invalid_requests(self):
+        response = self.client.get('/api/purchases/admin/export/xml/')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'success': False, 'error': 'Export format must be csv or ndjson'})
+
+        response = self.client.get('/api/purchases/admin/export/csv/', {'start': 'last tuesday'})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'success': False, 'error': 'Invalid date: last tuesday'})
+
+    def test_admin_only(self):
+        self.client.force_authenticate(self.customer)
+        self.assertEqual(self.client.get('/api/purchases/admin/export/csv/').status_code, 403)
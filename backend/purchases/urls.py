@@ -2,7 +2,8 @@ from django.urls import path
 from .views import (
     PurchaseListView, PurchaseDetailView,
     CartView, CartItemView, CheckoutView,
-    AdminPurchaseListView, AdminPurchaseDetailView, AdminPurchaseStatsView
+    AdminPurchaseListView, AdminPurchaseDetailView, AdminPurchaseStatsView,
+    AdminPurchaseExportView
 )
 
 app_name = 'purchases'
@@ -24,4 +25,5 @@ urlpatterns = [
     path('admin/all/', AdminPurchaseListView.as_view(), name='admin-purchase-list'),
     path('admin/<int:pk>/', AdminPurchaseDetailView.as_view(), name='admin-purchase-detail'),
     path('admin/stats/', AdminPurchaseStatsView.as_view(), name='admin-purchase-stats'),
+    path('admin/export/<str:export_format>/', AdminPurchaseExportView.as_view(), name='admin-purchase-export'),
 ]
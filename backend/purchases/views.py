@@ -1,21 +1,32 @@
 from rest_framework import generics, permissions, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
+from decimal import ROUND_HALF_UP, Decimal
 from django.db import transaction
 from .models import Purchase, PurchaseItem, Cart, CartItem
 from .serializers import (
-    PurchaseSerializer, CartSerializer, CartItemSerializer, CheckoutSerializer
+    PurchaseSerializer, PurchaseRowSerializer, CartSerializer, CartItemSerializer, CheckoutSerializer
 )
 from products.models import Product
+from products.pricing import price_index
+from accounts.models import Customer
+from freshmart_project.pagination import CreatedAtCursorPagination
+from freshmart_project.db_router import read_from_replica
+from freshmart_project.exports import StreamingExportView
+from freshmart_project.fast_serializers import RowListMixin
 
 
-class PurchaseListView(generics.ListAPIView):
+class PurchaseListView(RowListMixin, generics.ListAPIView):
     """List customer's purchase history - Authenticated users only"""
     serializer_class = PurchaseSerializer
+    row_serializer_class = PurchaseRowSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = CreatedAtCursorPagination
     
     def get_queryset(self):
-        return Purchase.objects.filter(customer=self.request.user).order_by('-created_at')
+        return Purchase.objects.filter(
+            customer=self.request.user
+        ).select_related('customer').prefetch_related('items__product')
 
 
 class PurchaseDetailView(generics.RetrieveAPIView):
@@ -179,7 +190,7 @@ class CheckoutView(APIView):
         
         try:
             cart = Cart.objects.get(customer=request.user)
-            cart_items = cart.items.all()
+            cart_items = cart.items.select_related('product')
             
             if not cart_items:
                 return Response(
@@ -187,15 +198,19 @@ class CheckoutView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            # Calculate total and check stock
-            total_amount = 0
+            # Calculate total at current promotion prices and check stock
+            # Fresh: a promotion edited in another process applies at once
+            prices = price_index.snapshot(fresh=True)
+            line_prices = {}
+            total_amount = Decimal('0')
             for item in cart_items:
                 if item.product.stock_quantity < item.quantity:
                     return Response(
                         {'success': False, 'error': f'Insufficient stock for {item.product.name}'},
                         status=status.HTTP_400_BAD_REQUEST
                     )
-                total_amount += item.subtotal
+                line_prices[item.pk] = prices.price(item.product.price, item.product_id, item.product.category_id)
+                total_amount += item.quantity * line_prices[item.pk]
             
             # Create purchase
             purchase = Purchase.objects.create(
@@ -211,16 +226,17 @@ class CheckoutView(APIView):
                     purchase=purchase,
                     product=item.product,
                     quantity=item.quantity,
-                    price_at_purchase=item.product.price
+                    price_at_purchase=line_prices[item.pk]
                 )
                 
-                # Update stock
+                # Update stock; a stock-only save keeps the catalog cache
                 item.product.stock_quantity -= item.quantity
-                item.product.save()
+                item.product.save(update_fields=['stock_quantity', 'updated_at'])
             
             # Award rewards for $60+ orders
             MINIMUM_BASKET = 60
-            customer = request.user
+            # Lock the current row; request.user may come from the auth cache
+            customer = Customer.objects.select_for_update().get(pk=request.user.pk)
             
             # Update loyalty points (2 points per dollar spent)
             points_earned = int(total_amount * 2)
@@ -228,7 +244,7 @@ class CheckoutView(APIView):
             
             # Award cashback for orders $45+
             if total_amount >= MINIMUM_BASKET:
-                cashback_earned = round(total_amount * 0.05, 2)  # 5% cashback
+                cashback_earned = (total_amount * Decimal('0.05')).quantize(Decimal('0.01'), ROUND_HALF_UP)  # 5% cashback
                 customer.cashback_balance += cashback_earned
                 customer.total_cashback_earned += cashback_earned
                 customer.orders_over_minimum += 1
@@ -263,11 +279,13 @@ class CheckoutView(APIView):
 
 
 # Admin views for purchase management
-class AdminPurchaseListView(generics.ListAPIView):
+class AdminPurchaseListView(RowListMixin, generics.ListAPIView):
     """List all purchases - Admin only"""
-    queryset = Purchase.objects.all().order_by('-created_at')
+    queryset = Purchase.objects.select_related('customer').prefetch_related('items__product')
     serializer_class = PurchaseSerializer
+    row_serializer_class = PurchaseRowSerializer
     permission_classes = [permissions.IsAdminUser]
+    pagination_class = CreatedAtCursorPagination
 
 
 class AdminPurchaseDetailView(generics.RetrieveUpdateAPIView):
@@ -277,10 +295,29 @@ class AdminPurchaseDetailView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAdminUser]
 
 
+class AdminPurchaseExportView(StreamingExportView):
+    """Stream purchases with their line items as CSV or NDJSON - Admin only"""
+    filename = 'purchases'
+    columns = (
+        'purchase_id', 'created_at', 'customer_id', 'customer_username',
+        'status', 'payment_method', 'total_amount',
+        'item_id', 'product_id', 'product_name', 'quantity', 'price_at_purchase',
+    )
+    fields = (
+        'id', 'created_at', 'customer_id', 'customer__username',
+        'status', 'payment_method', 'total_amount',
+        'items__id', 'items__product_id', 'items__product__name',
+        'items__quantity', 'items__price_at_purchase',
+    )
+    queryset = Purchase.objects.all()
+    ordering = ('created_at', 'id', 'items__id')
+
+
 class AdminPurchaseStatsView(APIView):
     """Get purchase statistics - Admin only"""
     permission_classes = [permissions.IsAdminUser]
     
+    @read_from_replica()
     def get(self, request):
         from django.db.models import Sum, Count
         from django.db.models.functions import TruncDay, TruncMonth
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Recommendation, RecommendationClick
+from .models import PackedRecommendation, Recommendation, RecommendationClick, RecommendationDailyStats
 
 
 @admin.register(Recommendation)
@@ -13,6 +13,15 @@ class RecommendationAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
 
 
+@admin.register(PackedRecommendation)
+class PackedRecommendationAdmin(admin.ModelAdmin):
+    """Admin configuration for PackedRecommendation model"""
+    list_display = ['customer', 'size', 'updated_at']
+    search_fields = ['customer__username']
+    ordering = ['-updated_at']
+    readonly_fields = ['updated_at']
+
+
 @admin.register(RecommendationClick)
 class RecommendationClickAdmin(admin.ModelAdmin):
     """Admin configuration for RecommendationClick model"""
@@ -21,3 +30,12 @@ class RecommendationClickAdmin(admin.ModelAdmin):
     search_fields = ['recommendation__customer__username', 'recommendation__product__name']
     ordering = ['-clicked_at']
     readonly_fields = ['clicked_at']
+
+
+@admin.register(RecommendationDailyStats)
+class RecommendationDailyStatsAdmin(admin.ModelAdmin):
+    """Admin configuration for RecommendationDailyStats model"""
+    list_display = ['date', 'product', 'reason_code', 'impressions', 'clicks']
+    list_filter = ['date', 'reason_code']
+    search_fields = ['product__name']
+    ordering = ['-date', '-clicks']
@@ -0,0 +1,191 @@
+"""
+Cold-start recommendations for FreshMart
+
+Customers without personalized recommendations get a precomputed list of
+popular products for the segments they belong to, most specific first:
+their preferred categories, their store branch, their city, then the whole
+store. Each segment's list is built with one aggregate query over completed
+purchases and cached for RECOMMENDATION_COLD_START_TIMEOUT seconds;
+`build_cold_start_recommendations` rebuilds every segment ahead of expiry
+(run it from cron where the cache is shared between processes), and a
+missing segment is built on first use.
+
+Only product ids, scores and reasons are cached. Product data is read at
+request time, so prices and stock are current.
+"""
+from collections import defaultdict
+from urllib.parse import quote
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework import serializers
+
+from accounts.models import Customer, CustomerPreference
+from products.models import Category, Product
+from products.serializers import ProductListRowSerializer
+from purchases.models import PurchaseItem
+
+GLOBAL = 'global'
+# segment kind -> PurchaseItem lookup the segment is grouped by
+SEGMENTS = {
+    'category': 'product__category__name',
+    'store_branch': 'purchase__customer__store_branch',
+    'city': 'purchase__customer__city',
+    GLOBAL: None,
+}
+REASONS = {
+    'category': 'Popular in {}',
+    'store_branch': 'Popular at the {} store',
+    'city': 'Popular in {}',
+    GLOBAL: 'Popular at FreshMart',
+}
+# Preferred categories consulted per customer
+PREFERRED_CATEGORIES = 2
+
+
+def segment_key(kind, value=''):
+    return f'recommendations:cold-start:{kind}:{quote(value)}'
+
+
+def build_segments(kind, values=None):
+    """
+    {segment value: {'built_at', 'items': [(product_id, score, reason)]}} of
+    `kind`, for `values` or every value with purchases
+    """
+    size = settings.RECOMMENDATION_COLD_START_SIZE
+    field = SEGMENTS[kind]
+    items = PurchaseItem.objects.filter(
+        purchase__status='completed', product__is_active=True, product__stock_quantity__gt=0
+    )
+    if field and values is not None:
+        items = items.filter(**{f'{field}__in': values})
+    group = [field, 'product_id'] if field else ['product_id']
+    rows = items.values(*group).annotate(units=Sum('quantity')).order_by('-units', 'product_id')
+
+    ranked = defaultdict(list)
+    for row in rows.iterator():
+        value = row[field] if field else ''
+        if value is None or len(ranked[value]) >= size:
+            continue
+        ranked[value].append((row['product_id'], float(row['units'])))
+
+    if kind == GLOBAL and len(ranked['']) < size:
+        # A new store has no sales yet: pad with featured, then newest products
+        seen = {product_id for product_id, _ in ranked['']}
+        padding = Product.objects.filter(is_active=True, stock_quantity__gt=0).exclude(
+            pk__in=seen
+        ).order_by('-featured', '-created_at').values_list('pk', flat=True)[:size - len(seen)]
+        ranked[''].extend((product_id, 0.0) for product_id in padding)
+
+    built_at = timezone.now()
+    segments = {value: {'built_at': built_at, 'items': []} for value in (values or [])}
+    for value, products in ranked.items():
+        reason = REASONS[kind].format(value)
+        segments[value] = {
+            'built_at': built_at,
+            'items': [(product_id, score, reason) for product_id, score in products],
+        }
+    return segments
+
+
+def store_segments(kind, segments):
+    cache.set_many(
+        {segment_key(kind, value): segment for value, segment in segments.items()},
+        settings.RECOMMENDATION_COLD_START_TIMEOUT
+    )
+
+
+def rebuild_all():
+    """Rebuild every segment; returns {kind: number of segments}"""
+    values = {
+        'category': list(Category.objects.values_list('name', flat=True)),
+        'store_branch': list(
+            Customer.objects.exclude(store_branch__isnull=True).exclude(store_branch='')
+            .values_list('store_branch', flat=True).distinct()
+        ),
+        'city': list(
+            Customer.objects.exclude(city__isnull=True).exclude(city='')
+            .values_list('city', flat=True).distinct()
+        ),
+        GLOBAL: [''],
+    }
+    built = {}
+    for kind in SEGMENTS:
+        segments = build_segments(kind, values[kind])
+        store_segments(kind, segments)
+        built[kind] = len(segments)
+    return built
+
+
+def customer_segments(customer):
+    """[(kind, value)] for `customer`, most specific first"""
+    segments = [
+        ('category', category) for category in CustomerPreference.objects.filter(
+            customer=customer
+        ).order_by('-preference_score').values_list('category', flat=True)[:PREFERRED_CATEGORIES]
+    ]
+    if customer.store_branch:
+        segments.append(('store_branch', customer.store_branch))
+    if customer.city:
+        segments.append(('city', customer.city))
+    segments.append((GLOBAL, ''))
+    return segments
+
+
+def get_segments(segments):
+    """Cached lists for `segments`, building (and caching) any that are missing"""
+    keys = {segment: segment_key(*segment) for segment in segments}
+    found = cache.get_many(keys.values())
+    missing = defaultdict(list)
+    for (kind, value), key in keys.items():
+        if key not in found:
+            missing[kind].append(value)
+    result = {segment: found[key] for segment, key in keys.items() if key in found}
+    for kind, values in missing.items():
+        built = build_segments(kind, values)
+        store_segments(kind, built)
+        result.update({(kind, value): built[value] for value in values})
+    return result
+
+
+def cold_start_recommendations(customer, context, limit=10):
+    """
+    Recommendation payloads for a customer without personalized rows, shaped
+    like RecommendationSerializer data (without an id: nothing is stored)
+    """
+    segments = customer_segments(customer)
+    lists = get_segments(segments)
+    picked = {}
+    built_at = None
+    for segment in segments:
+        built_at = built_at or lists[segment]['built_at']
+        for product_id, score, reason in lists[segment]['items']:
+            picked.setdefault(product_id, (score, reason))
+    if not picked:
+        return []
+
+    serializer = ProductListRowSerializer(context=context)
+    rows = serializer.rows(
+        Product.objects.filter(pk__in=picked, is_active=True, stock_quantity__gt=0).order_by()
+    )
+    products = {product['id']: product for product in serializer.serialize(rows)}
+    created_at = serializers.DateTimeField().to_representation(built_at)
+    recommendations = []
+    for product_id, (score, reason) in picked.items():
+        if product_id not in products:
+            continue
+        recommendations.append({
+            'id': None,
+            'customer': customer.pk,
+            'product': products[product_id],
+            'score': round(score, 2),
+            'reason': reason,
+            'is_active': True,
+            'created_at': created_at,
+            'updated_at': created_at,
+        })
+        if len(recommendations) == limit:
+            break
+    return recommendations
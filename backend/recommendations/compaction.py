@@ -0,0 +1,83 @@
+"""
+Recommendation table compaction for FreshMart
+
+The engine replaces a customer's whole set on every run (see
+storage.replace_recommendations), but rows written before that, rows for
+products or customers that were deactivated since, and rows of customers
+the engine has not revisited still accumulate. `compact()` applies the
+retention rules in order:
+
+1. `unavailable`: active rows whose product or customer is inactive are
+   deactivated;
+2. `over_limit`: active rows beyond a customer's best RECOMMENDATION_MAX_ACTIVE
+   (by score) are deactivated;
+3. `expired`: inactive rows without clicks, untouched for
+   RECOMMENDATION_RETENTION_DAYS, are deleted.
+
+Clicked rows are never deleted; their clicks are the analytics history.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q, Window
+from django.db.models.functions import RowNumber
+from django.utils import timezone
+
+from .models import Recommendation
+
+
+def _in_batches(queryset, batch_size):
+    """Primary keys of `queryset` in lists of `batch_size`"""
+    batch = []
+    for pk in queryset.values_list('pk', flat=True).iterator(chunk_size=batch_size):
+        batch.append(pk)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _deactivate(queryset, batch_size, dry_run):
+    if dry_run:
+        return queryset.count()
+    now = timezone.now()
+    total = 0
+    # Collect first: updating while iterating the same rows is not portable
+    for pks in list(_in_batches(queryset, batch_size)):
+        total += Recommendation.objects.filter(pk__in=pks, is_active=True).update(is_active=False, updated_at=now)
+    return total
+
+
+def _delete(queryset, batch_size, dry_run):
+    if dry_run:
+        return queryset.count()
+    total = 0
+    for pks in list(_in_batches(queryset, batch_size)):
+        with transaction.atomic():
+            # Re-check the rules: a row may have been clicked or revived meanwhile
+            _, deleted = queryset.filter(pk__in=pks).delete()
+        total += deleted.get(Recommendation._meta.label, 0)
+    return total
+
+
+def compact(max_active=None, retention_days=None, batch_size=1000, dry_run=False):
+    """Apply the retention rules; returns {rule: rows affected}"""
+    max_active = max_active if max_active is not None else settings.RECOMMENDATION_MAX_ACTIVE
+    retention_days = retention_days if retention_days is not None else settings.RECOMMENDATION_RETENTION_DAYS
+    active = Recommendation.objects.filter(is_active=True)
+    report = {}
+
+    unavailable = Q(product__is_active=False) | Q(customer__is_active=False)
+    report['unavailable'] = _deactivate(active.filter(unavailable), batch_size, dry_run)
+
+    ranked = active.exclude(unavailable).annotate(
+        rank=Window(RowNumber(), partition_by=[F('customer_id')], order_by=[F('score').desc(), F('created_at').desc()])
+    ).filter(rank__gt=max_active)
+    report['over_limit'] = _deactivate(ranked, batch_size, dry_run)
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    expired = Recommendation.objects.filter(is_active=False, updated_at__lt=cutoff, clicks__isnull=True)
+    report['expired'] = _delete(expired, batch_size, dry_run)
+    return report
@@ -5,15 +5,24 @@ Generates personalized product recommendations based on:
 - Purchase history
 - Product ratings
 - Collaborative filtering (similar customers)
+- Content similarity to purchased products (products.similarity)
 """
 
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
 from django.db.models import Count, Q, Avg
 from collections import defaultdict
-from .models import Recommendation
-from products.models import Product
+from .storage import get_store, reason_text
+from products.models import Product, ProductSimilarity
 from purchases.models import Purchase, PurchaseItem
 from accounts.models import CustomerPreference
 
+logger = logging.getLogger('freshmart')
+
 
 class RecommendationEngine:
     """Main recommendation engine class"""
@@ -31,56 +40,58 @@ class RecommendationEngine:
         preference_products = self._get_preference_based_products()
         for product, score in preference_products:
             scores[product.id] += score * 3.0  # High weight for preferences
-            reasons[product.id] = f"Matches your interest in {product.category.name}"
+            reasons[product.id] = 'preference'
         
         # 2. Purchase history-based recommendations
         history_products = self._get_purchase_history_based_products()
         for product, score in history_products:
             scores[product.id] += score * 2.0  # Medium weight
             if product.id not in reasons:
-                reasons[product.id] = "Based on your purchase history"
+                reasons[product.id] = 'history'
         
         # 3. Popular products in preferred categories
         popular_products = self._get_popular_products()
         for product, score in popular_products:
             scores[product.id] += score * 1.5  # Lower weight
             if product.id not in reasons:
-                reasons[product.id] = "Popular in your favorite categories"
+                reasons[product.id] = 'popular'
         
         # 4. Collaborative filtering (similar customers)
         collaborative_products = self._get_collaborative_filtering_products()
         for product, score in collaborative_products:
             scores[product.id] += score * 1.0
             if product.id not in reasons:
-                reasons[product.id] = "Customers like you also bought this"
+                reasons[product.id] = 'collaborative'
         
-        # 5. Featured products
+        # 5. Products similar to recent purchases
+        similar_products = self._get_similar_products()
+        for product_id, score in similar_products:
+            scores[product_id] += score * 1.0
+            if product_id not in reasons:
+                reasons[product_id] = 'similar'
+        
+        # 6. Featured products
         featured_products = self._get_featured_products()
         for product, score in featured_products:
             scores[product.id] += score * 0.5  # Lowest weight
             if product.id not in reasons:
-                reasons[product.id] = "Featured product"
+                reasons[product.id] = 'featured'
         
         # Sort by score and get top products
         sorted_products = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:limit]
+        available = dict(Product.objects.filter(
+            id__in=[product_id for product_id, _ in sorted_products],
+            is_active=True,
+            stock_quantity__gt=0
+        ).values_list('id', 'category__name'))
         
-        # Create or update recommendations
+        # Replace the customer's recommendations with the new top products
+        ranked = []
         for product_id, score in sorted_products:
-            try:
-                product = Product.objects.get(id=product_id, is_active=True, stock_quantity__gt=0)
-                recommendation, created = Recommendation.objects.update_or_create(
-                    customer=self.customer,
-                    product=product,
-                    defaults={
-                        'score': round(score, 2),
-                        'reason': reasons.get(product_id, "Recommended for you"),
-                        'is_active': True
-                    }
-                )
-                self.recommendations.append(recommendation)
-            except Product.DoesNotExist:
-                continue
-        
+            if product_id in available:
+                code = reasons.get(product_id, 'default')
+                ranked.append((product_id, round(score, 2), code, reason_text(code, available[product_id])))
+        self.recommendations = get_store().save(self.customer, ranked)
         return self.recommendations
     
     def _get_preference_based_products(self):
@@ -196,6 +207,26 @@ class RecommendationEngine:
         
         return [(prod, 1.0) for prod in products]
     
+    def _get_similar_products(self, recent=5):
+        """[(product_id, similarity)] nearest to the customer's most recent purchases"""
+        purchased = list(
+            PurchaseItem.objects.filter(
+                purchase__customer=self.customer,
+                purchase__status='completed'
+            ).order_by('-purchase__created_at').values_list('product_id', flat=True)
+        )
+        if not purchased:
+            return []
+        
+        recent_ids = list(dict.fromkeys(purchased))[:recent]
+        purchased = set(purchased)
+        best = {}
+        for neighbors in ProductSimilarity.objects.filter(product_id__in=recent_ids).values_list('neighbors', flat=True):
+            for product_id, score in neighbors:
+                if product_id not in purchased and score > best.get(product_id, 0.0):
+                    best[product_id] = score
+        return sorted(best.items(), key=lambda item: item[1], reverse=True)[:5]
+    
     def _get_featured_products(self):
         """Get featured products"""
         products = Product.objects.filter(
@@ -215,6 +246,54 @@ def update_recommendations_for_customer(customer):
     return engine.generate_recommendations()
 
 
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+def _generate_in_worker(customer_id):
+    from accounts.models import Customer
+    try:
+        customer = Customer.objects.filter(pk=customer_id, is_active=True).first()
+        if customer is not None:
+            update_recommendations_for_customer(customer)
+    except Exception:
+        logger.exception(f"Recommendations failed for customer {customer_id}")
+    finally:
+        with _lock:
+            _pending.discard(customer_id)
+        # Worker threads outlive the job; do not leave connections open
+        connections.close_all()
+
+
+def _submit(customer_id):
+    global _executor
+    with _lock:
+        if customer_id in _pending:
+            return
+        _pending.add(customer_id)
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECOMMENDATION_WORKERS, thread_name_prefix='recommendations'
+            )
+    _executor.submit(_generate_in_worker, customer_id)
+
+
+def queue_depth():
+    """Customers whose recommendations are queued or being generated"""
+    return len(_pending)
+
+
+def schedule_recommendations_for_customer(customer):
+    """
+    Generate recommendations for `customer` in the worker pool once the
+    current transaction commits. Repeated calls while one is pending are
+    dropped.
+    """
+    customer_id = customer.pk
+    transaction.on_commit(lambda: _submit(customer_id))
+
+
 def update_all_recommendations():
     """Update recommendations for all customers (can be run as a cron job)"""
     from accounts.models import Customer
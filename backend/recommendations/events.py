@@ -0,0 +1,269 @@
+"""
+Recommendation click and impression ingestion for FreshMart
+
+Clicks and impressions are recorded in memory by `event_buffer` and written
+in batches: a daemon thread per process flushes every
+RECOMMENDATION_EVENT_FLUSH_SECONDS, or sooner once
+RECOMMENDATION_EVENT_BUFFER_SIZE clicks are waiting. A flush validates all
+buffered clicks with one query, bulk-inserts them as RecommendationClick
+rows and adds the clicks and impressions to the RecommendationDailyStats
+rollup (per day, product and reason code), which the admin stats read.
+
+A batch that fails to write goes back into the buffer and is retried by
+the next flush, with the flush thread backing off exponentially while the
+failures last; after RECOMMENDATION_EVENT_FLUSH_ATTEMPTS failed flushes in
+a row the buffered events are dropped (and logged).
+
+Impressions are only counted, never stored individually. Events still in
+memory are lost if the process is killed; they are flushed at normal exit,
+and by `event_buffer.stop()` before a database goes away (benchmarks).
+With RECOMMENDATION_EVENT_FLUSH_SECONDS = 0 every event is written at once,
+as under the test runner. Clicks recorded before the rollup existed are
+counted by migration 0005; rebuild_recommendation_stats recounts them.
+"""
+import atexit
+import logging
+import os
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+from django.db.models import Count, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from accounts.models import Customer
+from .models import Recommendation, RecommendationClick, RecommendationDailyStats
+from .storage import get_store, reason_code
+
+logger = logging.getLogger('freshmart')
+
+# Longest pause between flushes while writes keep failing
+MAX_FLUSH_BACKOFF_SECONDS = 60
+
+# recommendation_id is None for clicks tracked by product
+Click = namedtuple('Click', 'customer_id recommendation_id product_id clicked_at')
+
+
+def resolve_clicks(clicks):
+    """[(recommendation_id, product_id, reason_code, clicked_at)] for the clicks on the customer's own recommendations"""
+    ids = {click.recommendation_id for click in clicks if click.recommendation_id is not None}
+    recommendations = {
+        pk: (customer_id, product_id, reason)
+        for pk, customer_id, product_id, reason in Recommendation.objects.filter(pk__in=ids).values_list(
+            'pk', 'customer_id', 'product_id', 'reason'
+        )
+    }
+    store = get_store()
+    resolved = []
+    for click in clicks:
+        if click.recommendation_id is None:
+            # Rare (packed storage); resolving may create the click anchor row
+            try:
+                recommendation = store.click_target(Customer(pk=click.customer_id), click.product_id)
+            except Recommendation.DoesNotExist:
+                continue
+            row = (recommendation.pk, recommendation.customer_id, recommendation.product_id, recommendation.reason)
+        else:
+            row = (click.recommendation_id, *recommendations.get(click.recommendation_id, (None, None, None)))
+        recommendation_id, customer_id, product_id, reason = row
+        if customer_id != click.customer_id:
+            continue
+        resolved.append((recommendation_id, product_id, reason_code(reason), click.clicked_at))
+    return resolved
+
+
+def add_daily_stats(counts):
+    """Add {(date, product_id, reason_code): [impressions, clicks]} to the rollup"""
+    if not counts:
+        return
+    for attempt in (1, 2):
+        try:
+            with transaction.atomic():
+                existing = set(RecommendationDailyStats.objects.filter(
+                    date__in={date for date, _, _ in counts},
+                    product_id__in={product_id for _, product_id, _ in counts},
+                ).values_list('date', 'product_id', 'reason_code'))
+                for (date, product_id, code), (impressions, clicks) in counts.items():
+                    if (date, product_id, code) in existing:
+                        RecommendationDailyStats.objects.filter(
+                            date=date, product_id=product_id, reason_code=code
+                        ).update(impressions=F('impressions') + impressions, clicks=F('clicks') + clicks)
+                RecommendationDailyStats.objects.bulk_create([
+                    RecommendationDailyStats(date=date, product_id=product_id, reason_code=code,
+                                             impressions=impressions, clicks=clicks)
+                    for (date, product_id, code), (impressions, clicks) in counts.items()
+                    if (date, product_id, code) not in existing
+                ])
+            return
+        except IntegrityError:
+            # Another process created one of the new rows first; those are updates now
+            if attempt == 2:
+                raise
+
+
+def write_events(clicks, impressions):
+    """Write buffered clicks and {(date, product_id, reason_code): count} impressions"""
+    counts = {key: [count, 0] for key, count in impressions.items()}
+    resolved = resolve_clicks(clicks) if clicks else []
+    for _, product_id, code, clicked_at in resolved:
+        key = (timezone.localdate(clicked_at), product_id, code)
+        counts.setdefault(key, [0, 0])[1] += 1
+    with transaction.atomic():
+        RecommendationClick.objects.bulk_create([
+            RecommendationClick(recommendation_id=recommendation_id, clicked_at=clicked_at)
+            for recommendation_id, _, _, clicked_at in resolved
+        ])
+        add_daily_stats(counts)
+    return len(resolved)
+
+
+@transaction.atomic
+def rebuild_click_stats():
+    """
+    Recount the rollup's clicks from RecommendationClick (impressions are kept,
+    they exist nowhere else); returns the number of clicks counted
+    """
+    RecommendationDailyStats.objects.exclude(clicks=0).update(clicks=0)
+    rows = RecommendationClick.objects.annotate(
+        date=TruncDate('clicked_at', tzinfo=timezone.get_current_timezone())
+    ).values('date', 'recommendation__product_id', 'recommendation__reason').annotate(
+        count=Count('id')
+    ).order_by()
+    counts = {}
+    for row in rows.iterator():
+        key = (row['date'], row['recommendation__product_id'], reason_code(row['recommendation__reason']))
+        counts.setdefault(key, [0, 0])[1] += row['count']
+    add_daily_stats(counts)
+    return sum(clicks for _, clicks in counts.values())
+
+
+class EventBuffer:
+    """Clicks and impression counts waiting to be written"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clicks = []
+        self._impressions = {}
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._flusher_pid = None
+        # Failed flushes in a row
+        self.failures = 0
+
+    @property
+    def interval(self):
+        return getattr(settings, 'RECOMMENDATION_EVENT_FLUSH_SECONDS', 2)
+
+    def backoff(self):
+        """Seconds until the next flush attempt"""
+        if not self.failures:
+            return self.interval
+        return min(self.interval * 2 ** self.failures, MAX_FLUSH_BACKOFF_SECONDS)
+
+    def add_click(self, customer_id, recommendation_id=None, product_id=None):
+        click = Click(customer_id, recommendation_id, product_id, timezone.now())
+        with self._lock:
+            self._clicks.append(click)
+            full = len(self._clicks) >= settings.RECOMMENDATION_EVENT_BUFFER_SIZE
+        self._flush_soon(full)
+        return click
+
+    def add_impressions(self, recommendations):
+        """Count one impression per served recommendation payload"""
+        if not recommendations:
+            return
+        date = timezone.localdate()
+        with self._lock:
+            for recommendation in recommendations:
+                key = (date, recommendation['product']['id'], reason_code(recommendation['reason']))
+                self._impressions[key] = self._impressions.get(key, 0) + 1
+        self._flush_soon(False)
+
+    def _flush_soon(self, full):
+        if not self.interval:
+            self.flush()
+            return
+        if self._flusher_pid != os.getpid():
+            self.ensure_flusher()
+        if full:
+            self._wakeup.set()
+
+    def ensure_flusher(self):
+        """Start the flush thread once per process (again after a fork)"""
+        with self._lock:
+            if self._flusher_pid == os.getpid():
+                return
+            self._flusher_pid = os.getpid()
+            self._wakeup = wakeup = threading.Event()
+            self._stopped = stopped = threading.Event()
+        threading.Thread(
+            target=self._flush_forever, args=(wakeup, stopped), name='recommendation-events', daemon=True
+        ).start()
+
+    def _flush_forever(self, wakeup, stopped):
+        while not stopped.is_set():
+            if self.failures:
+                # A full buffer does not cut the backoff short
+                stopped.wait(self.backoff())
+            else:
+                wakeup.wait(self.interval)
+            wakeup.clear()
+            if stopped.is_set():
+                break
+            try:
+                self.flush()
+            finally:
+                # The thread outlives each flush; do not leave connections open
+                connections.close_all()
+
+    def stop(self):
+        """
+        Write what is buffered and end the flush thread, e.g. before the
+        database goes away; the next event starts a new one
+        """
+        with self._lock:
+            self._flusher_pid = None
+            self._stopped.set()
+            self._wakeup.set()
+        return self.flush()
+
+    def pending(self):
+        """(clicks, impression counters) waiting to be written"""
+        with self._lock:
+            return len(self._clicks), len(self._impressions)
+
+    def flush(self):
+        """Write everything buffered so far; returns the number of clicks stored"""
+        with self._lock:
+            clicks, self._clicks = self._clicks, []
+            impressions, self._impressions = self._impressions, {}
+        if not clicks and not impressions:
+            return 0
+        try:
+            written = write_events(clicks, impressions)
+        except Exception as e:
+            self._failed(clicks, impressions, e)
+            return 0
+        self.failures = 0
+        return written
+
+    def _failed(self, clicks, impressions, error):
+        """Put a batch that failed to write back in front of newer events, or drop it"""
+        self.failures += 1
+        summary = f"{len(clicks)} recommendation clicks and {sum(impressions.values())} impressions"
+        if self.failures >= getattr(settings, 'RECOMMENDATION_EVENT_FLUSH_ATTEMPTS', 5):
+            self.failures = 0
+            logger.exception(f"Dropped {summary} after repeated write failures")
+            return
+        logger.warning(f"Writing {summary} failed ({self.failures} in a row, "
+                       f"retrying in {self.backoff()}s): {error}")
+        with self._lock:
+            self._clicks[:0] = clicks
+            for key, count in impressions.items():
+                self._impressions[key] = self._impressions.get(key, 0) + count
+
+
+event_buffer = EventBuffer()
+atexit.register(event_buffer.flush)
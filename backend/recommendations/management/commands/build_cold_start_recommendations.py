@@ -0,0 +1,16 @@
+"""
+Management command to rebuild the cold-start recommendation lists
+Usage: python manage.py build_cold_start_recommendations  (e.g. hourly from cron)
+"""
+from django.core.management.base import BaseCommand
+
+from recommendations.cold_start import rebuild_all
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the popular-product lists served to customers without personalized recommendations'
+
+    def handle(self, *args, **options):
+        for kind, count in rebuild_all().items():
+            self.stdout.write(f"{kind}: {count} segment(s)")
+        self.stdout.write(self.style.SUCCESS('Cold-start recommendations rebuilt'))
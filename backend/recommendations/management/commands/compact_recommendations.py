@@ -0,0 +1,33 @@
+"""
+Management command to compact the recommendation table
+Usage: python manage.py compact_recommendations [--max-active 10] [--retention-days 30] [--dry-run]
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from recommendations.compaction import compact
+
+
+class Command(BaseCommand):
+    help = 'Deactivate stale recommendations and delete expired unclicked ones'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-active', type=int, default=settings.RECOMMENDATION_MAX_ACTIVE,
+                            help='Active recommendations kept per customer')
+        parser.add_argument('--retention-days', type=int, default=settings.RECOMMENDATION_RETENTION_DAYS,
+                            help='Days an inactive, unclicked recommendation is kept')
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows each rule affects')
+
+    def handle(self, *args, **options):
+        report = compact(
+            max_active=options['max_active'],
+            retention_days=options['retention_days'],
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'would be' if options['dry_run'] else 'were'
+        self.stdout.write(f"Unavailable: {report['unavailable']} row(s) {verb} deactivated")
+        self.stdout.write(f"Over limit: {report['over_limit']} row(s) {verb} deactivated")
+        self.stdout.write(f"Expired: {report['expired']} row(s) {verb} deleted")
+        self.stdout.write(self.style.SUCCESS(f"{report['expired']} row(s) reclaimed"))
@@ -0,0 +1,16 @@
+"""
+Management command to recount recommendation clicks in the daily rollup
+Usage: python manage.py rebuild_recommendation_stats
+"""
+from django.core.management.base import BaseCommand
+
+from recommendations.events import event_buffer, rebuild_click_stats
+
+
+class Command(BaseCommand):
+    help = 'Recount the clicks in RecommendationDailyStats from the stored clicks (impressions are kept)'
+
+    def handle(self, *args, **options):
+        event_buffer.flush()
+        clicks = rebuild_click_stats()
+        self.stdout.write(self.style.SUCCESS(f'{clicks} click(s) counted'))
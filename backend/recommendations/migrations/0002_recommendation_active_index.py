@@ -0,0 +1,20 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_image_variants'),
+        ('recommendations', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='recommendation',
+            index=models.Index(fields=['customer', 'is_active', '-score', '-created_at'], name='recommendat_custome_157660_idx'),
+        ),
+    ]
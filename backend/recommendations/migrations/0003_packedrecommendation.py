@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_customer_profile_picture_variants'),
+        ('recommendations', '0002_recommendation_active_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PackedRecommendation',
+            fields=[
+                ('customer', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='packed_recommendations', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('items', models.JSONField(default=list, help_text='[[product_id, score, reason_code], ...], best first')),
+                ('size', models.PositiveSmallIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Packed Recommendation',
+                'verbose_name_plural': 'Packed Recommendations',
+            },
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 16:56
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0005_image_variants'),
+        ('recommendations', '0003_packedrecommendation'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recommendationclick',
+            name='clicked_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+        migrations.CreateModel(
+            name='RecommendationDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('reason_code', models.CharField(max_length=20)),
+                ('impressions', models.PositiveIntegerField(default=0)),
+                ('clicks', models.PositiveIntegerField(default=0)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recommendation_stats', to='products.product')),
+            ],
+            options={
+                'verbose_name': 'Recommendation Daily Stats',
+                'verbose_name_plural': 'Recommendation Daily Stats',
+                'ordering': ['-date'],
+                'unique_together': {('date', 'product', 'reason_code')},
+            },
+        ),
+    ]
@@ -0,0 +1,46 @@
+from django.db import migrations
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+def backfill_clicks(apps, schema_editor):
+    """Count the clicks recorded before the rollup existed (as rebuild_recommendation_stats does)"""
+    from recommendations.storage import reason_code
+
+    RecommendationClick = apps.get_model('recommendations', 'RecommendationClick')
+    RecommendationDailyStats = apps.get_model('recommendations', 'RecommendationDailyStats')
+    db = schema_editor.connection.alias
+
+    counts = {}
+    rows = RecommendationClick.objects.using(db).annotate(
+        date=TruncDate('clicked_at', tzinfo=timezone.get_current_timezone())
+    ).values('date', 'recommendation__product_id', 'recommendation__reason').annotate(
+        count=Count('id')
+    ).order_by()
+    for row in rows.iterator():
+        key = (row['date'], row['recommendation__product_id'], reason_code(row['recommendation__reason']))
+        counts[key] = counts.get(key, 0) + row['count']
+
+    stats = RecommendationDailyStats.objects.using(db)
+    stats.exclude(clicks=0).update(clicks=0)
+    existing = set(stats.values_list('date', 'product_id', 'reason_code'))
+    for (date, product_id, code), clicks in counts.items():
+        if (date, product_id, code) in existing:
+            stats.filter(date=date, product_id=product_id, reason_code=code).update(clicks=clicks)
+    stats.bulk_create([
+        RecommendationDailyStats(date=date, product_id=product_id, reason_code=code, clicks=clicks)
+        for (date, product_id, code), clicks in counts.items()
+        if (date, product_id, code) not in existing
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recommendations', '0004_recommendation_daily_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_clicks, migrations.RunPython.noop),
+    ]
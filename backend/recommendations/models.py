@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from accounts.models import Customer
 from products.models import Product
 
@@ -17,15 +18,37 @@ class Recommendation(models.Model):
         verbose_name = 'Recommendation'
         verbose_name_plural = 'Recommendations'
         ordering = ['-score', '-created_at']
+        indexes = [
+            # Active set per customer, in list order
+            models.Index(fields=['customer', 'is_active', '-score', '-created_at']),
+        ]
     
     def __str__(self):
         return f"{self.customer.username} - {self.product.name} (Score: {self.score})"
 
 
+class PackedRecommendation(models.Model):
+    """A customer's recommendations as one ordered list (RECOMMENDATION_STORAGE = 'packed')"""
+    customer = models.OneToOneField(
+        Customer, on_delete=models.CASCADE, primary_key=True, related_name='packed_recommendations'
+    )
+    items = models.JSONField(default=list, help_text="[[product_id, score, reason_code], ...], best first")
+    size = models.PositiveSmallIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Packed Recommendation'
+        verbose_name_plural = 'Packed Recommendations'
+    
+    def __str__(self):
+        return f"{self.customer.username} - {self.size} recommendations"
+
+
 class RecommendationClick(models.Model):
     """Track when customers click on recommendations"""
     recommendation = models.ForeignKey(Recommendation, on_delete=models.CASCADE, related_name='clicks')
-    clicked_at = models.DateTimeField(auto_now_add=True)
+    # Set when the click happens; clicks are written later, in batches
+    clicked_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         verbose_name = 'Recommendation Click'
@@ -33,3 +56,21 @@ class RecommendationClick(models.Model):
     
     def __str__(self):
         return f"{self.recommendation.customer.username} clicked {self.recommendation.product.name}"
+
+
+class RecommendationDailyStats(models.Model):
+    """Recommendation impressions and clicks per day, product and reason (recommendations.events)"""
+    date = models.DateField()
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='recommendation_stats')
+    reason_code = models.CharField(max_length=20)
+    impressions = models.PositiveIntegerField(default=0)
+    clicks = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        unique_together = ['date', 'product', 'reason_code']
+        verbose_name = 'Recommendation Daily Stats'
+        verbose_name_plural = 'Recommendation Daily Stats'
+        ordering = ['-date']
+    
+    def __str__(self):
+        return f"{self.date} {self.product_id} {self.reason_code}: {self.clicks}/{self.impressions}"
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 from .models import Recommendation, RecommendationClick
-from products.serializers import ProductListSerializer
+from products.serializers import ProductListSerializer, ProductListRowSerializer
+from freshmart_project.fast_serializers import RowSerializer
 
 class RecommendationSerializer(serializers.ModelSerializer):
     product = ProductListSerializer(read_only=True)
@@ -11,6 +12,12 @@ class RecommendationSerializer(serializers.ModelSerializer):
         read_only_fields = ['id', 'customer', 'created_at', 'updated_at']
 
 
+class RecommendationRowSerializer(RowSerializer):
+    """values() fast path for RecommendationSerializer"""
+    serializer_class = RecommendationSerializer
+    nested = {'product': ProductListRowSerializer}
+
+
 class RecommendationClickSerializer(serializers.ModelSerializer):
     class Meta:
         model = RecommendationClick
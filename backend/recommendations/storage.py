@@ -0,0 +1,215 @@
+"""
+Recommendation storage for FreshMart
+
+RECOMMENDATION_STORAGE selects how each customer's recommendations are kept:
+
+* 'rows' (default): one Recommendation per (customer, product). A read is a
+  filtered sort joined to Product, Category and Brand.
+* 'packed': one PackedRecommendation per customer holding the ordered list
+  [[product_id, score, reason_code], ...]. A read is a primary-key lookup
+  plus product payloads from the catalog cache; a write replaces one row.
+
+Both stores return the same payloads (RecommendationSerializer data).
+Packed entries have no Recommendation id: clicks are tracked by product
+(`click_target`), which materializes an inactive Recommendation row the
+first time, so RecommendationClick and its analytics are unchanged.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Avg, Prefetch, Sum
+from django.utils import timezone
+from rest_framework import serializers
+
+from products.cache import catalog_key, catalog_version, record_lookups
+from products.models import Product, ProductReview
+from products.serializers import ProductListRowSerializer
+from .models import PackedRecommendation, Recommendation
+from .serializers import RecommendationRowSerializer
+
+REASONS = {
+    'preference': 'Matches your interest in {category}',
+    'history': 'Based on your purchase history',
+    'popular': 'Popular in your favorite categories',
+    'collaborative': 'Customers like you also bought this',
+    'similar': 'Similar to products you bought',
+    'featured': 'Featured product',
+    'default': 'Recommended for you',
+}
+
+
+def reason_text(code, category_name):
+    return REASONS.get(code, REASONS['default']).format(category=category_name)
+
+
+def reason_code(reason):
+    """Code of a rendered reason (row storage keeps only the text)"""
+    for code, template in REASONS.items():
+        prefix, placeholder, _ = template.partition('{')
+        if reason == template or (placeholder and reason.startswith(prefix)):
+            return code
+    return 'default'
+
+
+@transaction.atomic
+def replace_recommendations(customer, ranked):
+    """
+    Make `ranked` [(product_id, score, reason)] the customer's recommendations:
+    upsert them in one statement and prune every other row. Pruned rows that
+    were clicked are kept, deactivated, for click analytics.
+    Returns the new recommendations, best first.
+    """
+    now = timezone.now()
+    product_ids = [product_id for product_id, _, _ in ranked]
+    Recommendation.objects.bulk_create(
+        [
+            Recommendation(customer=customer, product_id=product_id, score=score, reason=reason,
+                           is_active=True, created_at=now, updated_at=now)
+            for product_id, score, reason in ranked
+        ],
+        update_conflicts=True,
+        unique_fields=['customer', 'product'],
+        update_fields=['score', 'reason', 'is_active', 'updated_at'],
+    )
+
+    stale = Recommendation.objects.filter(customer=customer).exclude(product_id__in=product_ids)
+    stale.filter(clicks__isnull=True).delete()
+    stale.filter(is_active=True).update(is_active=False, updated_at=now)
+
+    return list(Recommendation.objects.filter(customer=customer, is_active=True).select_related(
+        'product__category', 'product__brand'
+    ).prefetch_related(
+        Prefetch('product__reviews', queryset=ProductReview.objects.only('id', 'product_id', 'rating'))
+    ))
+
+
+def product_payloads(product_ids, context):
+    """
+    {product_id: ProductListSerializer data} from the catalog cache, which
+    any catalog change invalidates; misses are serialized in one query
+    """
+    request = context.get('request')
+    origin = request.build_absolute_uri('/') if request is not None else ''
+    version = catalog_version()
+    keys = {product_id: catalog_key(version, 'product-list', origin, product_id) for product_id in product_ids}
+    cached = cache.get_many(keys.values())
+    payloads = {product_id: cached[key] for product_id, key in keys.items() if key in cached}
+
+    missing = [product_id for product_id in product_ids if product_id not in payloads]
+    record_lookups('product-list', len(payloads), len(missing))
+    if missing:
+        serializer = ProductListRowSerializer(context=context)
+        built = serializer.serialize(serializer.rows(Product.objects.filter(pk__in=missing).order_by()))
+        payloads.update((payload['id'], payload) for payload in built)
+        cache.set_many(
+            {keys[payload['id']]: payload for payload in built},
+            getattr(settings, 'CATALOG_CACHE_TIMEOUT', 60)
+        )
+    return payloads
+
+
+class RowStore:
+    """One Recommendation row per (customer, product)"""
+
+    def save(self, customer, ranked):
+        """Replace the customer's set with `ranked` [(product_id, score, reason_code, reason)]"""
+        return replace_recommendations(
+            customer, [(product_id, score, reason) for product_id, score, _, reason in ranked]
+        )
+
+    def read(self, customer, context, limit=10):
+        queryset = Recommendation.objects.filter(
+            customer=customer,
+            is_active=True,
+            product__is_active=True,
+            product__stock_quantity__gt=0
+        )
+        serializer = RecommendationRowSerializer(context=context)
+        return serializer.serialize(serializer.rows(queryset)[:limit])
+
+    def click_target(self, customer, product_id):
+        return Recommendation.objects.get(customer=customer, product_id=product_id)
+
+    def totals(self):
+        """(active recommendations, average per customer with any)"""
+        # Both counts are answered from the (customer, is_active, ...) index
+        active = Recommendation.objects.filter(is_active=True)
+        total = active.count()
+        customers = active.values('customer').distinct().count()
+        return total, total / customers if customers else 0.0
+
+
+class PackedStore:
+    """One PackedRecommendation per customer"""
+
+    def save(self, customer, ranked):
+        """Replace the customer's set with `ranked` [(product_id, score, reason_code, reason)]"""
+        items = [[product_id, score, code] for product_id, score, code, _ in ranked]
+        packed = PackedRecommendation(customer=customer, items=items, size=len(items))
+        PackedRecommendation.objects.bulk_create(
+            [packed],
+            update_conflicts=True,
+            unique_fields=['customer'],
+            update_fields=['items', 'size', 'updated_at'],
+        )
+        return items
+
+    def items(self, customer):
+        return PackedRecommendation.objects.filter(customer=customer).values_list(
+            'items', 'updated_at'
+        ).first() or ([], None)
+
+    def read(self, customer, context, limit=10):
+        items, updated_at = self.items(customer)
+        if not items:
+            return []
+        products = product_payloads([product_id for product_id, _, _ in items], context)
+        timestamp = serializers.DateTimeField().to_representation(updated_at)
+        recommendations = []
+        for product_id, score, code in items:
+            product = products.get(product_id)
+            # Same filter as the row store: active and in stock now
+            if product is None or not product['is_active'] or not product['in_stock']:
+                continue
+            recommendations.append({
+                'id': None,
+                'customer': customer.pk,
+                'product': product,
+                'score': score,
+                'reason': reason_text(code, product['category_name']),
+                'is_active': True,
+                'created_at': timestamp,
+                'updated_at': timestamp,
+            })
+            if len(recommendations) == limit:
+                break
+        return recommendations
+
+    def click_target(self, customer, product_id):
+        items, _ = self.items(customer)
+        for item_product_id, score, code in items:
+            if item_product_id == product_id:
+                break
+        else:
+            raise Recommendation.DoesNotExist
+        category_name = Product.objects.filter(pk=product_id).values_list('category__name', flat=True).first()
+        if category_name is None:
+            raise Recommendation.DoesNotExist
+        # Only an anchor for clicks: inactive, so the row store never lists it
+        recommendation, _ = Recommendation.objects.get_or_create(
+            customer=customer, product_id=product_id,
+            defaults={'score': score, 'reason': reason_text(code, category_name), 'is_active': False}
+        )
+        return recommendation
+
+    def totals(self):
+        """(recommendations, average per customer with any)"""
+        totals = PackedRecommendation.objects.filter(size__gt=0).aggregate(total=Sum('size'), avg=Avg('size'))
+        return totals['total'] or 0, float(totals['avg'] or 0)
+
+
+STORES = {'rows': RowStore, 'packed': PackedStore}
+
+
+def get_store():
+    return STORES[getattr(settings, 'RECOMMENDATION_STORAGE', 'rows')]()
@@ -1,3 +1,406 @@
-from django.test import TestCase
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIClient
+
+from accounts.models import Customer, CustomerPreference
+from products.models import Category, Product
+from products.pricing import price_index
+from purchases.models import Purchase, PurchaseItem
+from . import engine, events
+from .cold_start import GLOBAL, build_segments, cold_start_recommendations
+from .compaction import compact
+from .events import Click, add_daily_stats, event_buffer, write_events
+from .models import PackedRecommendation, Recommendation, RecommendationClick, RecommendationDailyStats
+from .storage import PackedStore, RowStore, reason_text
+
+
+class RecommendationTestCase(TestCase):
+    """Customers, products and recommendations shared by the tests below"""
+
+    def setUp(self):
+        # Neither survives the test rollback on its own
+        cache.clear()
+        price_index.invalidate()
+        self.category = Category.objects.create(name='Fruit')
+        self.products = [
+            Product.objects.create(name=f'Fruit {index}', description='', category=self.category,
+                                   price=Decimal('2.00'), stock_quantity=10)
+            for index in range(4)
+        ]
+        self.customer = Customer.objects.create_user(username='shopper', email='shopper@example.com',
+                                                     password='password123')
+        self.other = Customer.objects.create_user(username='other', email='other@example.com',
+                                                  password='password123')
+
+    def recommend(self, customer, product, score=1.0, reason='Based on your purchase history', **kwargs):
+        return Recommendation.objects.create(customer=customer, product=product, score=score, reason=reason, **kwargs)
+
+    def stats(self):
+        return {
+            (row.product_id, row.reason_code): (row.impressions, row.clicks)
+            for row in RecommendationDailyStats.objects.all()
+        }
+
+
+class EventWriteTests(RecommendationTestCase):
+    """Clicks and impressions reach RecommendationClick and the daily rollup"""
+
+    def test_write_events(self):
+        mine = self.recommend(self.customer, self.products[0])
+        theirs = self.recommend(self.other, self.products[1])
+        now = timezone.now()
+        clicks = [
+            Click(self.customer.pk, mine.pk, None, now),
+            Click(self.customer.pk, theirs.pk, None, now),
+            Click(self.customer.pk, 999999, None, now),
+        ]
+        impressions = {(timezone.localdate(now), self.products[0].pk, 'history'): 3}
+
+        self.assertEqual(write_events(clicks, impressions), 1)
+        self.assertEqual(list(RecommendationClick.objects.values_list('recommendation', flat=True)), [mine.pk])
+        self.assertEqual(self.stats(), {(self.products[0].pk, 'history'): (3, 1)})
+
+    def test_add_daily_stats_accumulates(self):
+        key = (timezone.localdate(), self.products[0].pk, 'popular')
+        add_daily_stats({key: [2, 0]})
+        add_daily_stats({key: [1, 1], (key[0], self.products[1].pk, 'popular'): [1, 0]})
+        self.assertEqual(self.stats(), {
+            (self.products[0].pk, 'popular'): (3, 1),
+            (self.products[1].pk, 'popular'): (1, 0),
+        })
+
+    def test_add_daily_stats_retries_when_row_created_concurrently(self):
+        key = (timezone.localdate(), self.products[0].pk, 'popular')
+        add_daily_stats({key: [1, 0]})
+        real_filter = RecommendationDailyStats.objects.filter
+        calls = []
+
+        def first_misses_existing(*args, **kwargs):
+            # As if another process inserted the row after this one looked
+            calls.append(kwargs)
+            if len(calls) == 1:
+                return RecommendationDailyStats.objects.none()
+            return real_filter(*args, **kwargs)
+
+        with mock.patch.object(events.RecommendationDailyStats.objects, 'filter', side_effect=first_misses_existing):
+            add_daily_stats({key: [2, 1]})
+        self.assertGreater(len(calls), 1)
+        self.assertEqual(self.stats(), {(self.products[0].pk, 'popular'): (3, 1)})
+
+    def test_click_view_and_admin_stats(self):
+        recommendation = self.recommend(self.customer, self.products[0])
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        listed = client.get('/api/recommendations/').json()
+        self.assertTrue(listed['personalized'])
+        response = client.post(f'/api/recommendations/{recommendation.pk}/click/')
+        self.assertEqual(response.status_code, 202)
+
+        admin = Customer.objects.create_user(username='admin', email='admin@example.com',
+                                             password='password123', is_staff=True)
+        client.force_authenticate(admin)
+        stats = client.get('/api/recommendations/admin/stats/').json()['stats']
+        self.assertEqual(stats['total_clicks'], 1)
+        self.assertEqual(stats['impressions_last_30_days'], 1)
+        self.assertEqual(stats['ctr_by_reason'], [{'reason': 'history', 'impressions': 1, 'clicks': 1, 'ctr': 1.0}])
+
+    @override_settings(RECOMMENDATION_EVENT_FLUSH_SECONDS=60)
+    def test_buffered_events_written_on_stop(self):
+        recommendation = self.recommend(self.customer, self.products[0])
+        event_buffer.add_click(self.customer.pk, recommendation_id=recommendation.pk)
+        self.assertFalse(RecommendationClick.objects.exists())
+        self.assertEqual(event_buffer.stop(), 1)
+        self.assertEqual(RecommendationClick.objects.count(), 1)
+
+    @override_settings(RECOMMENDATION_EVENT_FLUSH_SECONDS=60)
+    def test_failed_batch_retried(self):
+        self.addCleanup(setattr, event_buffer, 'failures', 0)
+        recommendation = self.recommend(self.customer, self.products[0])
+        event_buffer.add_click(self.customer.pk, recommendation_id=recommendation.pk)
+        with mock.patch.object(events, 'write_events', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('freshmart', 'WARNING'):
+                self.assertEqual(event_buffer.flush(), 0)
+        self.assertEqual(event_buffer.pending(), (1, 0))
+        self.assertEqual(event_buffer.backoff(), min(120, events.MAX_FLUSH_BACKOFF_SECONDS))
+        event_buffer.add_click(self.customer.pk, recommendation_id=recommendation.pk)
+        self.assertEqual(event_buffer.stop(), 2)
+        self.assertEqual(event_buffer.failures, 0)
+        self.assertEqual(RecommendationClick.objects.count(), 2)
+
+    @override_settings(RECOMMENDATION_EVENT_FLUSH_SECONDS=60, RECOMMENDATION_EVENT_FLUSH_ATTEMPTS=2)
+    def test_failed_batch_dropped_after_attempts(self):
+        self.addCleanup(setattr, event_buffer, 'failures', 0)
+        recommendation = self.recommend(self.customer, self.products[0])
+        event_buffer.add_click(self.customer.pk, recommendation_id=recommendation.pk)
+        with mock.patch.object(events, 'write_events', side_effect=OperationalError('database is locked')):
+            with self.assertLogs('freshmart', 'WARNING'):
+                event_buffer.flush()
+            self.assertEqual(event_buffer.pending(), (1, 0))
+            with self.assertLogs('freshmart', 'ERROR'):
+                event_buffer.stop()
+        self.assertEqual(event_buffer.pending(), (0, 0))
+        self.assertEqual(event_buffer.failures, 0)
+        self.assertFalse(RecommendationClick.objects.exists())
+
+    def test_rebuild_click_stats(self):
+        recommendation = self.recommend(self.customer, self.products[0], reason='Featured product')
+        RecommendationClick.objects.create(recommendation=recommendation)
+        RecommendationClick.objects.create(recommendation=recommendation)
+        call_command('rebuild_recommendation_stats', stdout=mock.Mock())
+        self.assertEqual(self.stats(), {(self.products[0].pk, 'featured'): (0, 2)})
+
+
+class QueuedExecutor:
+    """Stands in for the worker pool: keeps submitted jobs until `run()` calls them in this thread"""
+
+    def __init__(self):
+        self.jobs = []
+
+    def submit(self, func, *args):
+        self.jobs.append((func, args))
+
+    def run(self):
+        jobs, self.jobs = self.jobs, []
+        for func, args in jobs:
+            func(*args)
+
+
+class ColdStartTests(RecommendationTestCase):
+    """Segment lists for customers without personalized recommendations"""
+
+    def product(self, name, category, **kwargs):
+        kwargs.setdefault('stock_quantity', 10)
+        return Product.objects.create(name=name, description='', category=category, price=Decimal('2.00'), **kwargs)
+
+    def buy(self, product, quantity, **customer_fields):
+        buyer = Customer.objects.create_user(username=f'buyer{Customer.objects.count()}', password='password123',
+                                             email=f'buyer{Customer.objects.count()}@example.com', **customer_fields)
+        purchase = Purchase.objects.create(customer=buyer, total_amount=Decimal('2.00') * quantity, status='completed')
+        PurchaseItem.objects.create(purchase=purchase, product=product, quantity=quantity,
+                                    price_at_purchase=Decimal('2.00'))
+
+    def test_segments_most_specific_first(self):
+        dairy = Category.objects.create(name='Dairy')
+        bakery = Category.objects.create(name='Bakery')
+        milk = self.product('Milk', dairy)
+        bread = self.product('Bread', bakery)
+        branch_pick = self.product('Branch pick', bakery)
+        city_pick = self.product('City pick', bakery)
+        self.buy(branch_pick, 5, store_branch='Downtown', city='Elsewhere')
+        self.buy(city_pick, 5, store_branch='Uptown', city='Springfield')
+        self.buy(milk, 1)
+        self.buy(self.products[0], 2)
+        self.buy(bread, 20)
+
+        self.customer.store_branch = 'Downtown'
+        self.customer.city = 'Springfield'
+        self.customer.save()
+        CustomerPreference.objects.create(customer=self.customer, category='Dairy', preference_score=2.0)
+        CustomerPreference.objects.create(customer=self.customer, category='Fruit', preference_score=1.0)
+        CustomerPreference.objects.create(customer=self.customer, category='Bakery', preference_score=0.5)
+
+        recommendations = cold_start_recommendations(self.customer, {}, limit=5)
+        self.assertEqual(
+            [(item['product']['id'], item['reason']) for item in recommendations],
+            [
+                (milk.pk, 'Popular in Dairy'),
+                (self.products[0].pk, 'Popular in Fruit'),
+                (branch_pick.pk, 'Popular at the Downtown store'),
+                (city_pick.pk, 'Popular in Springfield'),
+                (bread.pk, 'Popular at FreshMart'),
+            ]
+        )
+        self.assertTrue(all(item['id'] is None for item in recommendations))
+
+    def test_empty_store_pads_with_featured_then_newest(self):
+        now = timezone.now()
+        for age, product in enumerate(self.products):
+            Product.objects.filter(pk=product.pk).update(created_at=now - timedelta(days=age))
+        Product.objects.filter(pk=self.products[3].pk).update(featured=True)
+        Product.objects.filter(pk=self.products[1].pk).update(stock_quantity=0)
+
+        items = build_segments(GLOBAL, [''])['']['items']
+        self.assertEqual(
+            [product_id for product_id, _, _ in items],
+            [self.products[3].pk, self.products[0].pk, self.products[2].pk]
+        )
+        self.assertEqual({score for _, score, _ in items}, {0.0})
+
+
+@mock.patch.object(engine, 'connections', mock.Mock())  # the jobs run on the test's connection
+class ScheduleRecommendationsTests(RecommendationTestCase):
+    """Personalized recommendations are generated in the worker pool, once per pending customer"""
+
+    def setUp(self):
+        super().setUp()
+        Product.objects.filter(pk=self.products[0].pk).update(featured=True)
+        self.executor = QueuedExecutor()
+        patcher = mock.patch.object(engine, '_executor', self.executor)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(engine._pending.clear)
+
+    def test_pending_customer_is_scheduled_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            engine.schedule_recommendations_for_customer(self.customer)
+            engine.schedule_recommendations_for_customer(self.customer)
+            engine.schedule_recommendations_for_customer(self.other)
+        self.assertEqual(len(self.executor.jobs), 2)
+        self.assertEqual(engine.queue_depth(), 2)
+
+        self.executor.run()
+        self.assertEqual(engine.queue_depth(), 0)
+        self.assertTrue(Recommendation.objects.filter(customer=self.customer, product=self.products[0]).exists())
+
+        with self.captureOnCommitCallbacks(execute=True):
+            engine.schedule_recommendations_for_customer(self.customer)
+        self.assertEqual(len(self.executor.jobs), 1)
+
+    def test_nothing_scheduled_before_commit(self):
+        with self.captureOnCommitCallbacks(execute=False) as callbacks:
+            engine.schedule_recommendations_for_customer(self.customer)
+        self.assertEqual(self.executor.jobs, [])
+        self.assertEqual(len(callbacks), 1)
+
+    def test_cold_start_view_schedules_personalized_generation(self):
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = client.get('/api/recommendations/').json()
+        self.assertFalse(response['personalized'])
+        self.assertEqual(response['recommendations'][0]['product']['id'], self.products[0].pk)
+        self.assertEqual(len(self.executor.jobs), 1)
+
+        self.executor.run()
+        response = client.get('/api/recommendations/').json()
+        self.assertTrue(response['personalized'])
+        self.assertEqual(response['recommendations'][0]['product']['id'], self.products[0].pk)
+
+
+class CompactionTests(RecommendationTestCase):
+    """compact() retention rules and the compact_recommendations command"""
+
+    def setUp(self):
+        super().setUp()
+        # Four active rows, best first
+        self.active = [
+            self.recommend(self.customer, product, score=4 - index)
+            for index, product in enumerate(self.products)
+        ]
+        old = timezone.now() - timedelta(days=31)
+        self.expired = self.recommend(self.other, self.products[0], is_active=False)
+        self.clicked = self.recommend(self.other, self.products[1], is_active=False)
+        self.recent = self.recommend(self.other, self.products[2], is_active=False)
+        RecommendationClick.objects.create(recommendation=self.clicked)
+        Recommendation.objects.filter(pk__in=[self.expired.pk, self.clicked.pk]).update(updated_at=old)
+
+    def rows(self):
+        return list(Recommendation.objects.order_by('pk').values_list('pk', 'is_active', 'updated_at'))
+
+    def test_compact(self):
+        Product.objects.filter(pk=self.products[0].pk).update(is_active=False)
+        report = compact(max_active=2, retention_days=30)
+        self.assertEqual(report, {'unavailable': 1, 'over_limit': 1, 'expired': 1})
+        self.assertEqual(
+            set(Recommendation.objects.filter(customer=self.customer, is_active=True).values_list('product', flat=True)),
+            {self.products[1].pk, self.products[2].pk}
+        )
+        self.assertFalse(Recommendation.objects.filter(pk=self.expired.pk).exists())
+        self.assertTrue(Recommendation.objects.filter(pk=self.recent.pk).exists())
+
+    def test_clicked_rows_are_never_deleted(self):
+        compact(retention_days=0)
+        self.assertTrue(Recommendation.objects.filter(pk=self.clicked.pk).exists())
+        self.assertEqual(RecommendationClick.objects.filter(recommendation=self.clicked).count(), 1)
+        self.assertFalse(Recommendation.objects.filter(pk__in=[self.expired.pk, self.recent.pk]).exists())
+
+    def test_ranks_above_max_active_are_deactivated(self):
+        self.assertEqual(compact(max_active=1)['over_limit'], 3)
+        self.assertEqual(
+            list(Recommendation.objects.filter(customer=self.customer, is_active=True).values_list('pk', flat=True)),
+            [self.active[0].pk]
+        )
+        # Deactivated, not deleted
+        self.assertEqual(Recommendation.objects.filter(customer=self.customer).count(), 4)
+
+    def test_dry_run_writes_nothing(self):
+        before = self.rows()
+        out = StringIO()
+        call_command('compact_recommendations', '--max-active', '2', '--retention-days', '30', '--dry-run', stdout=out)
+        self.assertEqual(self.rows(), before)
+        self.assertIn('Over limit: 2 row(s) would be deactivated', out.getvalue())
+        self.assertIn('Expired: 1 row(s) would be deleted', out.getvalue())
+
+
+class StorageTests(RecommendationTestCase):
+    """The 'rows' and 'packed' stores are interchangeable"""
+
+    def setUp(self):
+        super().setUp()
+        dairy = Category.objects.create(name='Dairy')
+        self.products.append(Product.objects.create(name='Milk', description='', category=dairy,
+                                                    price=Decimal('1.50'), stock_quantity=5, featured=True))
+        self.context = {'request': Request(RequestFactory().get('/api/recommendations/'))}
+        self.ranked = [
+            (product.pk, score, code, reason_text(code, product.category.name))
+            for product, score, code in zip(
+                self.products, [5.5, 4.25, 3.0, 2.0, 1.0], ['preference', 'history', 'popular', 'similar', 'featured']
+            )
+        ]
+
+    def test_stores_return_identical_payloads(self):
+        Product.objects.filter(pk=self.products[2].pk).update(stock_quantity=0)
+        Product.objects.filter(pk=self.products[3].pk).update(is_active=False)
+        payloads = {}
+        for name, store in (('rows', RowStore()), ('packed', PackedStore())):
+            store.save(self.customer, self.ranked)
+            cache.clear()
+            payloads[name] = [
+                # Packed entries have no row of their own to take these from
+                {key: value for key, value in item.items() if key not in ('id', 'created_at', 'updated_at')}
+                for item in store.read(self.customer, self.context)
+            ]
+        self.assertEqual(
+            [item['product']['id'] for item in payloads['rows']],
+            [self.products[0].pk, self.products[1].pk, self.products[4].pk]
+        )
+        self.assertEqual(payloads['rows'], payloads['packed'])
+        limited = PackedStore().read(self.customer, self.context, limit=2)
+        self.assertEqual([item['product']['id'] for item in limited], [self.products[0].pk, self.products[1].pk])
+
+    def test_click_target_creates_inactive_anchor(self):
+        store = PackedStore()
+        store.save(self.customer, self.ranked)
+        anchor = store.click_target(self.customer, self.products[1].pk)
+        self.assertFalse(anchor.is_active)
+        self.assertEqual((anchor.product_id, anchor.score, anchor.reason),
+                         (self.products[1].pk, 4.25, 'Based on your purchase history'))
+        self.assertEqual(store.click_target(self.customer, self.products[1].pk).pk, anchor.pk)
+        self.assertEqual(Recommendation.objects.count(), 1)
+        # The row store never lists anchors
+        self.assertEqual(RowStore().read(self.customer, self.context), [])
+
+        with self.assertRaises(Recommendation.DoesNotExist):
+            store.click_target(self.other, self.products[1].pk)
+
+    @override_settings(RECOMMENDATION_STORAGE='packed')
+    def test_product_click_is_recorded_on_anchor(self):
+        PackedStore().save(self.customer, self.ranked)
+        client = APIClient()
+        client.force_authenticate(self.customer)
+        response = client.post(f'/api/recommendations/products/{self.products[0].pk}/click/')
+        self.assertEqual(response.status_code, 202)
+        click = RecommendationClick.objects.select_related('recommendation').get()
+        self.assertEqual((click.recommendation.customer_id, click.recommendation.product_id),
+                         (self.customer.pk, self.products[0].pk))
+        self.assertEqual(self.stats(), {(self.products[0].pk, 'preference'): (0, 1)})
+        self.assertTrue(PackedRecommendation.objects.filter(customer=self.customer, size=5).exists())
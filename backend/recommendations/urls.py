@@ -11,6 +11,7 @@ urlpatterns = [
     path('', RecommendationListView.as_view(), name='recommendation-list'),
     path('refresh/', RefreshRecommendationsView.as_view(), name='refresh-recommendations'),
     path('<int:recommendation_id>/click/', TrackRecommendationClickView.as_view(), name='track-click'),
+    path('products/<int:product_id>/click/', TrackRecommendationClickView.as_view(), name='track-product-click'),
     
     # Admin routes
     path('admin/stats/', AdminRecommendationStatsView.as_view(), name='admin-stats'),
@@ -1,9 +1,13 @@
-from rest_framework import generics, permissions, status
+from rest_framework import generics, permissions, serializers, status
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from .models import Recommendation, RecommendationClick
-from .serializers import RecommendationSerializer, RecommendationClickSerializer
-from .engine import update_recommendations_for_customer
+from .models import Recommendation, RecommendationDailyStats
+from .serializers import RecommendationSerializer
+from .cold_start import cold_start_recommendations
+from .engine import schedule_recommendations_for_customer, update_recommendations_for_customer
+from .events import event_buffer
+from .storage import get_store
+from freshmart_project.db_router import read_from_replica
 
 
 class RecommendationListView(generics.ListAPIView):
@@ -17,20 +21,25 @@ class RecommendationListView(generics.ListAPIView):
             is_active=True,
             product__is_active=True,
             product__stock_quantity__gt=0
-        ).select_related('product', 'product__category', 'product__brand')[:10]
+        ).select_related('product', 'product__category', 'product__brand')
     
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        
-        # If no recommendations exist, generate them
-        if not queryset.exists():
-            update_recommendations_for_customer(request.user)
-            queryset = self.get_queryset()
+        recommendations = get_store().read(request.user, self.get_serializer_context())
+        if recommendations:
+            event_buffer.add_impressions(recommendations)
+            return Response({
+                'success': True,
+                'personalized': True,
+                'recommendations': recommendations
+            })
         
-        serializer = self.get_serializer(queryset, many=True)
+        # No recommendations yet: answer from the precomputed popular lists
+        # and generate personalized ones in the background
+        schedule_recommendations_for_customer(request.user)
         return Response({
             'success': True,
-            'recommendations': serializer.data
+            'personalized': False,
+            'recommendations': cold_start_recommendations(request.user, self.get_serializer_context())
         })
 
 
@@ -40,12 +49,11 @@ class RefreshRecommendationsView(APIView):
     
     def post(self, request):
         try:
-            recommendations = update_recommendations_for_customer(request.user)
-            serializer = RecommendationSerializer(recommendations, many=True)
+            update_recommendations_for_customer(request.user)
             return Response({
                 'success': True,
                 'message': 'Recommendations updated successfully',
-                'recommendations': serializer.data
+                'recommendations': get_store().read(request.user, {})
             })
         except Exception as e:
             return Response(
@@ -55,28 +63,28 @@ class RefreshRecommendationsView(APIView):
 
 
 class TrackRecommendationClickView(APIView):
-    """Track when a user clicks on a recommendation - Authenticated users only"""
+    """
+    Track when a user clicks on a recommendation (by id, or by product) - Authenticated users only
+
+    Clicks are validated when the buffer is written, so this answers 202 for
+    any id; unknown recommendations and other customers' ones, which used to
+    get 404, are accepted and then dropped.
+    """
     permission_classes = [permissions.IsAuthenticated]
     
-    def post(self, request, recommendation_id):
-        try:
-            recommendation = Recommendation.objects.get(
-                id=recommendation_id,
-                customer=request.user
-            )
-            
-            click = RecommendationClick.objects.create(recommendation=recommendation)
-            
-            return Response({
-                'success': True,
-                'message': 'Click tracked',
-                'click': RecommendationClickSerializer(click).data
-            }, status=status.HTTP_201_CREATED)
-        except Recommendation.DoesNotExist:
-            return Response(
-                {'success': False, 'error': 'Recommendation not found'},
-                status=status.HTTP_404_NOT_FOUND
-            )
+    def post(self, request, recommendation_id=None, product_id=None):
+        # Buffered and written in bulk (recommendations.events); clicks on
+        # someone else's or unknown recommendations are dropped then
+        click = event_buffer.add_click(request.user.pk, recommendation_id=recommendation_id, product_id=product_id)
+        return Response({
+            'success': True,
+            'message': 'Click tracked',
+            'click': {
+                'recommendation': recommendation_id,
+                'product': product_id,
+                'clicked_at': serializers.DateTimeField().to_representation(click.clicked_at)
+            }
+        }, status=status.HTTP_202_ACCEPTED)
 
 
 # Admin views
@@ -84,47 +92,55 @@ class AdminRecommendationStatsView(APIView):
     """Get recommendation analytics - Admin only"""
     permission_classes = [permissions.IsAdminUser]
     
+    @read_from_replica()
     def get(self, request):
-        from django.db.models import Count, Avg
+        from django.db.models import Sum
         from django.utils import timezone
         from datetime import timedelta
         
-        today = timezone.now()
-        last_30_days = today - timedelta(days=30)
+        last_30_days = timezone.localdate() - timedelta(days=30)
         
-        # Total recommendations
-        total_recommendations = Recommendation.objects.filter(is_active=True).count()
+        # Total recommendations and average per user
+        total_recommendations, avg_per_user = get_store().totals()
         
-        # Total clicks
-        total_clicks = RecommendationClick.objects.count()
-        recent_clicks = RecommendationClick.objects.filter(
-            clicked_at__gte=last_30_days
-        ).count()
+        # Clicks and impressions come from the daily rollup
+        totals = RecommendationDailyStats.objects.aggregate(clicks=Sum('clicks'))
+        recent = RecommendationDailyStats.objects.filter(date__gt=last_30_days).aggregate(
+            clicks=Sum('clicks'), impressions=Sum('impressions')
+        )
         
         # Top clicked products
-        top_products = RecommendationClick.objects.values(
-            'recommendation__product__name'
-        ).annotate(
-            click_count=Count('id')
-        ).order_by('-click_count')[:10]
+        top_products = RecommendationDailyStats.objects.values('product__name').annotate(
+            click_count=Sum('clicks')
+        ).filter(click_count__gt=0).order_by('-click_count')[:10]
         
-        # Average recommendations per user
-        from accounts.models import Customer
-        avg_per_user = Recommendation.objects.filter(is_active=True).values(
-            'customer'
+        # Click-through rate by reason, last 30 days
+        by_reason = RecommendationDailyStats.objects.filter(date__gt=last_30_days).values(
+            'reason_code'
         ).annotate(
-            count=Count('id')
-        ).aggregate(
-            avg=Avg('count')
-        )
+            clicks=Sum('clicks'), impressions=Sum('impressions')
+        ).order_by('reason_code')
         
         return Response({
             'success': True,
             'stats': {
                 'total_recommendations': total_recommendations,
-                'total_clicks': total_clicks,
-                'clicks_last_30_days': recent_clicks,
-                'avg_recommendations_per_user': float(avg_per_user['avg'] or 0),
-                'top_clicked_products': list(top_products)
+                'total_clicks': totals['clicks'] or 0,
+                'clicks_last_30_days': recent['clicks'] or 0,
+                'impressions_last_30_days': recent['impressions'] or 0,
+                'avg_recommendations_per_user': avg_per_user,
+                'top_clicked_products': [
+                    {'recommendation__product__name': row['product__name'], 'click_count': row['click_count']}
+                    for row in top_products
+                ],
+                'ctr_by_reason': [
+                    {
+                        'reason': row['reason_code'],
+                        'impressions': row['impressions'],
+                        'clicks': row['clicks'],
+                        'ctr': round(row['clicks'] / row['impressions'], 4) if row['impressions'] else None
+                    }
+                    for row in by_reason
+                ]
             }
         })
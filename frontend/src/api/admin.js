@@ -11,20 +11,18 @@ export const fetchSystemInfo = async () => {
 
 export const fetchAdminStats = async () => {
     try {
-        // Parallel requests for stats
+        // Parallel requests for stats (admin lists use cursor pagination, so counts come from system info)
         const results = await Promise.allSettled([
-            api.get('/products/admin/all/?page_size=1'),
-            api.get('/accounts/admin/customers/?page_size=1'),
+            api.get('/system/info/'),
             api.get('/purchases/admin/stats/')
         ]);
 
-        const products = results[0].status === 'fulfilled' ? results[0].value.data : { count: 0 };
-        const customers = results[1].status === 'fulfilled' ? results[1].value.data : { count: 0 };
-        const stats = results[2].status === 'fulfilled' ? results[2].value.data.stats : {};
+        const counts = results[0].status === 'fulfilled' ? results[0].value.data.statistics || {} : {};
+        const stats = results[1].status === 'fulfilled' ? results[1].value.data.stats : {};
 
         return {
-            products_count: products.count,
-            customers_count: customers.count,
+            products_count: counts.total_products || 0,
+            customers_count: counts.total_customers || 0,
             orders_count: stats.total_orders || 0,
             revenue: stats.total_revenue || 0,
             revenue_trend: stats.revenue_trend || { categories: [], revenue: [] },
@@ -38,8 +36,8 @@ export const fetchAdminStats = async () => {
     }
 };
 
-export const adminFetchProducts = async (page = 1) => {
-    const { data } = await api.get(`/products/admin/all/?page=${page}`);
+export const adminFetchProducts = async (cursor = null) => {
+    const { data } = await api.get('/products/admin/all/', { params: cursor ? { cursor } : {} });
     return data;
 };
 
@@ -79,8 +77,8 @@ export const deleteProduct = async (id) => {
 };
 
 // Customers
-export const adminFetchCustomers = async (page = 1) => {
-    const { data } = await api.get(`/accounts/admin/customers/?page=${page}`);
+export const adminFetchCustomers = async (cursor = null) => {
+    const { data } = await api.get('/accounts/admin/customers/', { params: cursor ? { cursor } : {} });
     return data;
 };
 
@@ -94,8 +92,8 @@ export const deleteCustomer = async (id) => {
 };
 
 // Orders
-export const adminFetchOrders = async (page = 1) => {
-    const { data } = await api.get(`/purchases/admin/all/?page=${page}`);
+export const adminFetchOrders = async (cursor = null) => {
+    const { data } = await api.get('/purchases/admin/all/', { params: cursor ? { cursor } : {} });
     return data;
 };
 
@@ -57,7 +57,7 @@ export default function AdminProducts() {
 
     const { data: productsData, isLoading } = useQuery({
         queryKey: ['adminProducts'],
-        queryFn: () => adminFetchProducts(1),
+        queryFn: () => adminFetchProducts(),
     });
 
     const deleteMutation = useMutation({